@@ -8,6 +8,9 @@ import argparse
 import pandas as pd
 import scipy.stats.mstats as mstats
 import numpy.ma as ma
+import fire_footprint_cache
+import fire_mask_engine
+import fire_month_mask
 
 
 def getCmdargs():
@@ -27,68 +30,11 @@ def getCmdargs():
     return cmdargs
 
 
-def apply_annual_mask(info, inputs, outputs, otherargs):
-    """function that applies the mask to Landsat dbg image"""
+def main_routine(dbgImage, dk7Image, dbgNew, season, compute_workers=None, read_workers=None, block_size=None):
+    """Run mainRoutine
 
-    mask = (inputs.dk7_image[0] == 1) | (inputs.dk7_image[0] == 2) | (inputs.dk7_image[0] == 3) | (
-                    inputs.dk7_image[0] == 4) | (inputs.dk7_image[0] == 5) | (inputs.dk7_image[0] == 6) | (
-                           inputs.dk7_image[0] == 7) | (inputs.dk7_image[0] == 8) | (inputs.dk7_image[0] == 9) | (
-                           inputs.dk7_image[0] == 10) | (inputs.dk7_image[0] == 11) | (inputs.dk7_image[0] == 12)
-
-    #print(inputs.dk7_image[0])
-    #print("mask: ", mask)
-    outputs.outimg = inputs.dbg_image.copy()
-    nBands = len(inputs.dbg_image)
-    for i in range(nBands):
-        outputs.outimg[i][mask] = otherargs.valNull
-
-
-def apply_dry_season_mask(info, inputs, outputs, otherargs):
-    """function that applies the mask to Landsat dbg image"""
-
-    mask = (inputs.dk7_image[0] == 1) | (inputs.dk7_image[0] == 2) | (inputs.dk7_image[0] == 3) | (
-            inputs.dk7_image[0] == 4) | (inputs.dk7_image[0] == 5) | (inputs.dk7_image[0] == 6) | (
-                   inputs.dk7_image[0] == 7) | (inputs.dk7_image[0] == 8) | (inputs.dk7_image[0] == 9)
-
-    #print(inputs.dk7_image[0])
-    #print("mask: ", mask)
-    outputs.outimg = inputs.dbg_image.copy()
-    nBands = len(inputs.dbg_image)
-    for i in range(nBands):
-        outputs.outimg[i][mask] = otherargs.valNull
-
-def apply_june_aug_season_mask(info, inputs, outputs, otherargs):
-    """function that applies the mask to Landsat dbg image"""
-
-    mask = (inputs.dk7_image[0] == 1) | (inputs.dk7_image[0] == 2) | (inputs.dk7_image[0] == 3) | (
-            inputs.dk7_image[0] == 4) | (inputs.dk7_image[0] == 5) | (inputs.dk7_image[0] == 6) | (
-                   inputs.dk7_image[0] == 7) | (inputs.dk7_image[0] == 8)
-
-    #print(inputs.dk7_image[0])
-    #print("mask: ", mask)
-    outputs.outimg = inputs.dbg_image.copy()
-    nBands = len(inputs.dbg_image)
-    for i in range(nBands):
-        outputs.outimg[i][mask] = otherargs.valNull
-
-def apply_sep_nov_season_mask(info, inputs, outputs, otherargs):
-    """function that applies the mask to Landsat dbg image"""
-
-    mask = (inputs.dk7_image[0] == 1) | (inputs.dk7_image[0] == 2) | (inputs.dk7_image[0] == 3) | (
-            inputs.dk7_image[0] == 4) | (inputs.dk7_image[0] == 5) | (inputs.dk7_image[0] == 6) | (
-                   inputs.dk7_image[0] == 7) | (inputs.dk7_image[0] == 8) | (inputs.dk7_image[0] == 9) | (
-            inputs.dk7_image[0] == 10) | (inputs.dk7_image[0] == 11)
-
-    #print(inputs.dk7_image[0])
-    #print("mask: ", mask)
-    outputs.outimg = inputs.dbg_image.copy()
-    nBands = len(inputs.dbg_image)
-    for i in range(nBands):
-        outputs.outimg[i][mask] = otherargs.valNull
-
-
-def main_routine(dbgImage, dk7Image, dbgNew, season):
-    """Run mainRoutine"""
+    compute_workers, read_workers and block_size set the RIOS block processing (None uses the
+    fire_mask_engine.RIOS_CONCURRENCY settings of the run)."""
 
     # cmdargs = getCmdargs()
 
@@ -108,14 +54,24 @@ def main_routine(dbgImage, dk7Image, dbgNew, season):
 
     # Set up rios to apply images
     controls = applier.ApplierControls()
+    fire_mask_engine.configure_applier_controls_fn(controls, compute_workers, read_workers, block_size)
     infiles = applier.FilenameAssociations()
     outfiles = applier.FilenameAssociations()
 
     # read in the dbg and dk7 images to process
     infiles.dbg_image = dbgImage
-    infiles.dk7_image = dk7Image
+
+    # dk7Image can be the original fire scar raster, it is resampled (nearest neighbour) onto the grid of dbgImage
+    # block by block as the mask is applied, so no footprint copy is written to disk
+    controls.setReferenceImage(infiles.dbg_image)
 
     otherargs = applier.OtherInputs()
+    # footprints up to fire_footprint_cache.FOOTPRINT_CACHE_ENTRY_BYTES are resampled once onto the grid of dbgImage,
+    # cached and reused by every image on the same grid masked with the same fire raster, larger ones (i.e. the NT
+    # mosaics) are left to the block by block resampling
+    otherargs.footprint = fire_footprint_cache.get_footprint_fn(dk7Image, dbgImage)
+    if otherargs.footprint is None:
+        infiles.dk7_image = dk7Image
     imginfo = fileinfo.ImageInfo(infiles.dbg_image)
     # set up the nodata values
     otherargs.valNull = imginfo.nodataval[0]
@@ -123,26 +79,16 @@ def main_routine(dbgImage, dk7Image, dbgNew, season):
 
     outfiles.outimg = dbgNew
 
-    if season =="0112":
-
-        applier.apply(apply_annual_mask, infiles, outfiles, otherargs, controls=controls)
-
-    elif season == "0509":
-        applier.apply(apply_dry_season_mask, infiles, outfiles, otherargs, controls=controls)
-
-    elif season == "0608":
-        applier.apply(apply_june_aug_season_mask, infiles, outfiles, otherargs, controls=controls)
-
-    elif season == "0911":
-        applier.apply(apply_sep_nov_season_mask, infiles, outfiles, otherargs, controls=controls)
-
-    elif season == "1202":
-        applier.apply(apply_annual_mask, infiles, outfiles, otherargs, controls=controls)
-
-    else:
+    # the mask is built from a lookup table of the fire scar months up to the cutoff month of the season
+    cutoff_month = fire_month_mask.SEASON_CUTOFF_MONTHS.get(season)
+    if cutoff_month is None:
         print("Season unknown")
         import sys
         sys.exit()
+
+    print("season: ", season)
+    otherargs.month_lut = fire_month_mask.month_lut_fn(cutoff_month)
+    applier.apply(fire_mask_engine.apply_fire_mask_fn, infiles, outfiles, otherargs, controls=controls)
     print(dbgNew + ' is complete')
 
 
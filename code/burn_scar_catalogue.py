@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+"""
+burn_scar_catalogue.py
+======================
+
+Description: This script contains the burn scar (fire scar) catalogue used by the run_fire_scar_mask scripts.
+The burn scar directory is scanned once for the QLD (dka: 'dkaa2.tif') and NAFI (dkn: 'dkna2.tif') annual composites
+and the product, year, file name, path, size and modification time of each composite are stored in a dictionary keyed
+by product and year (i.e. catalogue['dkn']['2015']).
+
+The catalogue is persisted to a small json index (default: the user's home directory) and refreshed incrementally,
+only directories whose modification time has changed since the last scan are listed again. Within a run the catalogue
+is held in memory, so every fire mask call after the first looks up its year without touching the burn scar directory.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import hashlib
+import json
+import os
+import threading
+
+# burn scar products and the end of the composite file names (i.e. nt_dkn_2015_dkna2.tif)
+BURN_SCAR_PRODUCTS = {'dka': 'dkaa2.tif',
+                      'dkn': 'dkna2.tif'}
+
+# json index format version, an index written with a different version is rebuilt
+INDEX_VERSION = 1
+
+# catalogues already loaded in this process, keyed by the normalised burn scar directory
+_CATALOGUES = {}
+_CATALOGUES_LOCK = threading.Lock()
+
+
+def default_index_path_fn(burn_dir):
+    """ Return the default json index path for a burn scar directory (the user's home directory).
+
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @return index_path: string object containing the path to the json index.
+    """
+
+    dir_key = hashlib.md5(os.path.normcase(os.path.abspath(burn_dir)).encode('utf-8')).hexdigest()[:12]
+    index_path = os.path.join(os.path.expanduser("~"), "burn_scar_catalogue_{0}.json".format(dir_key))
+
+    return index_path
+
+
+def read_index_fn(index_path, burn_dir):
+    """ Read the json index, an empty index is returned if it does not exist, is unreadable or belongs to another
+    burn scar directory.
+
+    @param index_path: string object containing the path to the json index.
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @return index: dictionary object containing the burn_dir, version and the cached directory listings (dirs).
+    """
+
+    empty_index = {'burn_dir': burn_dir, 'version': INDEX_VERSION, 'dirs': {}}
+
+    if not os.path.isfile(index_path):
+        return empty_index
+
+    try:
+        with open(index_path, 'r') as index_file:
+            index = json.load(index_file)
+    except (IOError, OSError, ValueError):
+        print("Burn scar index could not be read, it will be rebuilt: ", index_path)
+        return empty_index
+
+    if index.get('version') != INDEX_VERSION or index.get('burn_dir') != burn_dir:
+        return empty_index
+
+    return index
+
+
+def write_index_fn(index, index_path):
+    """ Write the json index, the index is written to a temporary file and renamed so that a failed write does not
+    leave a partial index behind.
+
+    @param index: dictionary object containing the burn scar directory listings.
+    @param index_path: string object containing the path to the json index.
+    """
+
+    temp_path = index_path + '.tmp'
+    try:
+        with open(temp_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, index_path)
+    except (IOError, OSError):
+        print("Burn scar index could not be written: ", index_path)
+
+
+def burn_scar_record_fn(entry):
+    """ Create a catalogue record for a burn scar composite, None is returned for any other file.
+
+    @param entry: os.DirEntry object of the file.
+    @return record: dictionary object containing the product, year, name, path, size and mtime of the composite.
+    """
+
+    for product, file_end in BURN_SCAR_PRODUCTS.items():
+        if entry.name.endswith(file_end):
+            stat = entry.stat()
+            record = {'product': product,
+                      'year': str(entry.name.split("_")[2]),
+                      'name': entry.name,
+                      'path': entry.path,
+                      'size': stat.st_size,
+                      'mtime': stat.st_mtime}
+            return record
+
+    return None
+
+
+def refresh_index_fn(index, burn_dir):
+    """ Walk the burn scar directory, listing only the directories that are new or whose modification time has
+    changed since the index was last refreshed.
+
+    @param index: dictionary object returned by read_index_fn.
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @return index: dictionary object containing the refreshed directory listings.
+    @return changed: boolean object, True if any directory was (re)listed or removed.
+    """
+
+    cached_dirs = index['dirs']
+    refreshed_dirs = {}
+    changed = False
+    dir_stack = [burn_dir]
+
+    while dir_stack:
+        dir_path = dir_stack.pop()
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            continue
+
+        cached = cached_dirs.get(dir_path)
+        if cached is None or cached['mtime'] != dir_mtime:
+            changed = True
+            listing = {'mtime': dir_mtime, 'subdirs': [], 'files': []}
+            for entry in os.scandir(dir_path):
+                if entry.is_dir():
+                    listing['subdirs'].append(entry.path)
+                else:
+                    record = burn_scar_record_fn(entry)
+                    if record is not None:
+                        listing['files'].append(record)
+            cached = listing
+
+        refreshed_dirs[dir_path] = cached
+        dir_stack.extend(cached['subdirs'])
+
+    if set(refreshed_dirs) != set(cached_dirs):
+        changed = True
+
+    index['dirs'] = refreshed_dirs
+
+    return index, changed
+
+
+def build_catalogue_fn(index):
+    """ Key the burn scar records of the index by product and year.
+
+    @param index: dictionary object containing the burn scar directory listings.
+    @return catalogue: dictionary object {product: {year: [record, ...]}}, records within a year are sorted by path.
+    """
+
+    catalogue = dict((product, {}) for product in BURN_SCAR_PRODUCTS)
+    for listing in index['dirs'].values():
+        for record in listing['files']:
+            catalogue[record['product']].setdefault(record['year'], []).append(record)
+
+    for product_years in catalogue.values():
+        for records in product_years.values():
+            records.sort(key=lambda record: record['path'])
+
+    return catalogue
+
+
+def load_burn_scar_catalogue_fn(burn_dir, index_path=None, refresh=False):
+    """ Return the burn scar catalogue of a directory, the directory is scanned (incrementally) on the first call in
+    this process and the in-memory catalogue is returned for every other call.
+
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @param index_path: string object containing the path to the json index (default: default_index_path_fn).
+    @param refresh: boolean object, True forces the directory to be re-checked even if the catalogue is loaded.
+    @return catalogue: dictionary object {product: {year: [record, ...]}}.
+    """
+
+    dir_key = os.path.normcase(os.path.abspath(burn_dir))
+
+    with _CATALOGUES_LOCK:
+        if dir_key in _CATALOGUES and not refresh:
+            return _CATALOGUES[dir_key]
+
+        if index_path is None:
+            index_path = default_index_path_fn(burn_dir)
+
+        index = read_index_fn(index_path, burn_dir)
+        index, changed = refresh_index_fn(index, burn_dir)
+        if changed:
+            print("Burn scar index updated: ", index_path)
+            write_index_fn(index, index_path)
+
+        catalogue = build_catalogue_fn(index)
+        _CATALOGUES[dir_key] = catalogue
+
+    return catalogue
+
+
+def burn_scar_records_fn(catalogue, product, year):
+    """ Return the burn scar composites of a product and year (constant time dictionary lookup).
+
+    @param catalogue: dictionary object returned by load_burn_scar_catalogue_fn.
+    @param product: string object containing the burn scar product ('dka' or 'dkn').
+    @param year: string or integer object containing the fire year (i.e. '2015').
+    @return records: list object containing the catalogue records of the year (empty if there are none).
+    """
+
+    return catalogue[product].get(str(year), [])
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+"""
+fire_footprint_cache.py
+=======================
+
+Description: This script contains the fire scar footprint cache used by the apply_lsat_dk*smask scripts.
+A fire scar (dka/dkn) raster is resampled (nearest neighbour) onto the grid of a reference Landsat image in memory
+and the footprint is cached, keyed by the fire raster path and modification time and the reference grid transform,
+shape and CRS. Every other image on the same WRS2 tile grid that is masked with the same fire year reuses the cached
+footprint instead of resampling the fire raster again.
+
+Only footprints up to FOOTPRINT_CACHE_ENTRY_BYTES are resampled onto the whole reference grid. Larger grids (i.e. the
+NT wide seasonal mosaics) are never allocated whole, get_footprint_fn returns None for them and the RIOS block loop
+resamples the fire raster block by block instead.
+
+The cache is a least recently used (LRU) cache bounded by the total bytes of the cached footprints
+(FOOTPRINT_CACHE_BYTES), it is shared by every thread of the process and each footprint is resampled by one thread
+only.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import rasterio
+import rasterio.windows
+from rasterio.warp import reproject, Resampling
+
+# maximum total size (bytes) of the cached footprints, the least recently used footprints are evicted above it
+FOOTPRINT_CACHE_BYTES = 1024 * 1024 * 1024
+# maximum size (bytes) of a single footprint, larger footprints are resampled block by block and not cached
+FOOTPRINT_CACHE_ENTRY_BYTES = 256 * 1024 * 1024
+
+_FOOTPRINT_CACHE = OrderedDict()
+_FOOTPRINT_CACHE_LOCK = threading.Lock()
+_FOOTPRINT_KEY_LOCKS = {}
+_footprint_cache_state = {'bytes': 0, 'hits': 0, 'misses': 0}
+
+
+def reference_grid_fn(ref_path):
+    """ Read the grid of the reference image.
+
+    @param ref_path: string object containing the path to the reference (Landsat) image.
+    @return grid: tuple object containing the transform (6 coefficients), height, width and CRS (wkt).
+    """
+
+    with rasterio.open(ref_path) as ref_src:
+        grid = (tuple(ref_src.transform)[:6], ref_src.height, ref_src.width, ref_src.crs.to_wkt())
+
+    return grid
+
+
+def footprint_key_fn(fire_path, grid):
+    """ Return the cache key of a fire scar raster resampled onto a reference grid.
+
+    @param fire_path: string object containing the path to the fire scar raster.
+    @param grid: tuple object returned by reference_grid_fn.
+    @return key: tuple object containing the normalised fire path, fire modification time and the grid.
+    """
+
+    return (os.path.normcase(os.path.abspath(fire_path)), os.path.getmtime(fire_path)) + grid
+
+
+def footprint_nbytes_fn(fire_path, grid):
+    """ Return the size of a fire scar raster footprint on a grid without resampling it.
+
+    @param fire_path: string object containing the path to the fire scar raster.
+    @param grid: tuple object returned by reference_grid_fn or window_grid_fn.
+    @return nbytes: integer object containing the size (bytes) of the footprint array.
+    """
+
+    _, height, width, _ = grid
+
+    with rasterio.open(fire_path) as fire_src:
+        itemsize = np.dtype(fire_src.dtypes[0]).itemsize
+
+    return int(height) * int(width) * itemsize
+
+
+def resample_footprint_fn(fire_path, grid):
+    """ Resample the first band of a fire scar raster onto a reference grid (nearest neighbour) in memory.
+
+    @param fire_path: string object containing the path to the fire scar raster.
+    @param grid: tuple object returned by reference_grid_fn.
+    @return footprint: numpy array object (height, width) of the fire scar values on the reference grid, pixels
+    outside the fire scar raster are set to its no data value (0 if it has none).
+    """
+
+    transform, height, width, crs = grid
+
+    with rasterio.open(fire_path) as fire_src:
+        fill_value = fire_src.nodata if fire_src.nodata is not None else 0
+        footprint = np.full((height, width), fill_value, dtype=fire_src.dtypes[0])
+        reproject(source=rasterio.band(fire_src, 1),
+                  destination=footprint,
+                  src_nodata=fire_src.nodata,
+                  dst_transform=rasterio.Affine(*transform),
+                  dst_crs=crs,
+                  dst_nodata=fill_value,
+                  resampling=Resampling.nearest)
+
+    return footprint
+
+
+def window_grid_fn(transform, window, crs):
+    """ Return the grid of a pixel window of a raster (i.e. the window covering the 1ha sites of a tile).
+
+    @param transform: affine transform of the raster.
+    @param window: rasterio Window object.
+    @param crs: rasterio CRS object of the raster.
+    @return grid: tuple object containing the transform (6 coefficients), height, width and CRS (wkt) of the window.
+    """
+
+    win_transform = rasterio.windows.transform(window, transform)
+
+    return tuple(win_transform)[:6], int(window.height), int(window.width), crs.to_wkt()
+
+
+def get_footprint_fn(fire_path, ref_path, max_bytes=None, max_entry_bytes=None):
+    """ Return the footprint of a fire scar raster on the grid of a reference image, from the cache when the same
+    fire raster (path and modification time) has already been resampled onto the same grid. Footprints larger than
+    max_entry_bytes are not resampled and None is returned, the caller resamples the fire raster block by block.
+
+    @param fire_path: string object containing the path to the fire scar raster.
+    @param ref_path: string object containing the path to the reference (Landsat) image.
+    @param max_bytes: integer object containing the cache size limit (default: FOOTPRINT_CACHE_BYTES).
+    @param max_entry_bytes: integer object containing the footprint size limit (default: FOOTPRINT_CACHE_ENTRY_BYTES).
+    @return footprint: numpy array object (height, width) of the fire scar values on the reference grid, the array
+    is shared by every caller and must not be modified, or None when the footprint is above max_entry_bytes.
+    """
+
+    if max_entry_bytes is None:
+        max_entry_bytes = FOOTPRINT_CACHE_ENTRY_BYTES
+
+    grid = reference_grid_fn(ref_path)
+    nbytes = footprint_nbytes_fn(fire_path, grid)
+    if nbytes > max_entry_bytes:
+        print("Fire footprint ({0} MB) is above the cache entry limit, it is resampled block by block: {1}".format(
+            nbytes // (1024 * 1024), fire_path))
+        return None
+
+    return get_grid_footprint_fn(fire_path, grid, max_bytes, max_entry_bytes)
+
+
+def get_grid_footprint_fn(fire_path, grid, max_bytes=None, max_entry_bytes=None):
+    """ Return the footprint of a fire scar raster on a grid, from the cache when the same fire raster (path and
+    modification time) has already been resampled onto the same grid. Concurrent requests for the same footprint wait
+    for the first one, so it is resampled once. Footprints larger than max_entry_bytes are returned but not cached.
+
+    @param fire_path: string object containing the path to the fire scar raster.
+    @param grid: tuple object returned by reference_grid_fn or window_grid_fn.
+    @param max_bytes: integer object containing the cache size limit (default: FOOTPRINT_CACHE_BYTES).
+    @param max_entry_bytes: integer object containing the footprint size limit (default: FOOTPRINT_CACHE_ENTRY_BYTES).
+    @return footprint: numpy array object (height, width) of the fire scar values on the grid, the array is shared by
+    every caller and must not be modified.
+    """
+
+    if max_bytes is None:
+        max_bytes = FOOTPRINT_CACHE_BYTES
+    if max_entry_bytes is None:
+        max_entry_bytes = FOOTPRINT_CACHE_ENTRY_BYTES
+
+    key = footprint_key_fn(fire_path, grid)
+
+    with _FOOTPRINT_CACHE_LOCK:
+        footprint = _FOOTPRINT_CACHE.get(key)
+        if footprint is not None:
+            _FOOTPRINT_CACHE.move_to_end(key)
+            _footprint_cache_state['hits'] += 1
+            return footprint
+        key_lock = _FOOTPRINT_KEY_LOCKS.setdefault(key, threading.Lock())
+
+    with key_lock:
+        # another thread may have resampled the footprint while this one waited
+        with _FOOTPRINT_CACHE_LOCK:
+            footprint = _FOOTPRINT_CACHE.get(key)
+            if footprint is not None:
+                _FOOTPRINT_CACHE.move_to_end(key)
+                _footprint_cache_state['hits'] += 1
+                return footprint
+
+        footprint = resample_footprint_fn(fire_path, key[2:])
+        footprint.setflags(write=False)
+
+        with _FOOTPRINT_CACHE_LOCK:
+            _footprint_cache_state['misses'] += 1
+            _FOOTPRINT_KEY_LOCKS.pop(key, None)
+            if footprint.nbytes <= min(max_bytes, max_entry_bytes):
+                _FOOTPRINT_CACHE[key] = footprint
+                _footprint_cache_state['bytes'] += footprint.nbytes
+
+                # evict the least recently used footprints
+                while _footprint_cache_state['bytes'] > max_bytes:
+                    _, evicted = _FOOTPRINT_CACHE.popitem(last=False)
+                    _footprint_cache_state['bytes'] -= evicted.nbytes
+
+    return footprint
+
+
+def footprint_block_fn(info, footprint, block_shape):
+    """ Return the part of a footprint covered by the current RIOS block, shaped as a single band RIOS input block.
+
+    @param info: RIOS ReaderInfo object of the current block.
+    @param footprint: numpy array object returned by get_footprint_fn.
+    @param block_shape: tuple object containing the (rows, cols) of the current block.
+    @return block: numpy array object (1, rows, cols) of the footprint values within the block.
+    """
+
+    col, row = info.getPixColRow(0, 0)
+    rows, cols = block_shape
+
+    return footprint[np.newaxis, row:row + rows, col:col + cols]
+
+
+def clear_footprint_cache_fn():
+    """ Remove every footprint from the cache. """
+
+    with _FOOTPRINT_CACHE_LOCK:
+        _FOOTPRINT_CACHE.clear()
+        _footprint_cache_state['bytes'] = 0
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+fire_mask_engine.py
+===================
+
+Description: This script contains the fire scar month mask engine used by the apply_lsat_dk*smask scripts.
+The fire scar products (dka/dkn) record the month a pixel was burnt (1 - 12). A Landsat composite is masked where the
+pixel was burnt on or before the cutoff month of its season (i.e. season '0509' masks months 1 - 9).
+
+The cutoff month is converted into a 256 entry boolean lookup table (fire_month_mask), the mask of a block is built
+with a single lookup table gather (lut[dk]) and the no data value is written into every band of the block with one
+broadcast assignment, in place.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+from rios import applier
+import fire_footprint_cache
+import fire_month_mask
+
+# RIOS block processing settings used by the fire mask modules, set once per run by set_rios_concurrency_fn
+RIOS_CONCURRENCY = {'compute_workers': 1,
+                    'read_workers': 0,
+                    'block_size': None}
+
+
+def set_rios_concurrency_fn(compute_workers=1, read_workers=0, block_size=None):
+    """ Set the RIOS block processing settings used by every fire mask applier call in this process. Compute workers
+    require RIOS 2, older RIOS versions process the blocks serially.
+
+    @param compute_workers: integer object containing the number of blocks processed concurrently (1 = serial).
+    @param read_workers: integer object containing the number of block read workers (0 = read in the main thread).
+    @param block_size: integer object containing the RIOS block (window) size in pixels (None = RIOS default 256).
+    """
+
+    compute_workers = max(1, int(compute_workers))
+    if compute_workers > 1 and not hasattr(applier, 'ConcurrencyStyle'):
+        print("WARNING: fire mask compute workers require RIOS 2, the blocks are processed serially (mask_workers: {0})"
+              .format(compute_workers))
+        compute_workers = 1
+
+    RIOS_CONCURRENCY['compute_workers'] = compute_workers
+    RIOS_CONCURRENCY['read_workers'] = max(0, int(read_workers))
+    RIOS_CONCURRENCY['block_size'] = int(block_size) if block_size else None
+
+
+def configure_applier_controls_fn(controls, compute_workers=None, read_workers=None, block_size=None):
+    """ Apply the block size and concurrency settings to a RIOS ApplierControls object. Arguments left as None use
+    the RIOS_CONCURRENCY settings. RIOS 2 uses threaded compute workers and read workers (ConcurrencyStyle), older
+    RIOS versions always process the blocks serially: their multiprocessing job manager splits each block into
+    sub-blocks that share the block ReaderInfo, so the footprint offset (fire_footprint_cache.footprint_block_fn)
+    would be wrong for every sub-block after the first.
+
+    @param controls: RIOS ApplierControls object.
+    @param compute_workers: integer object containing the number of blocks processed concurrently (RIOS 2 only).
+    @param read_workers: integer object containing the number of block read workers (RIOS 2 only).
+    @param block_size: integer object containing the RIOS block (window) size in pixels.
+    @return controls: RIOS ApplierControls object.
+    """
+
+    if compute_workers is None:
+        compute_workers = RIOS_CONCURRENCY['compute_workers']
+    if read_workers is None:
+        read_workers = RIOS_CONCURRENCY['read_workers']
+    if block_size is None:
+        block_size = RIOS_CONCURRENCY['block_size']
+
+    if block_size:
+        controls.setWindowXsize(block_size)
+        controls.setWindowYsize(block_size)
+
+    if hasattr(applier, 'ConcurrencyStyle'):
+        if compute_workers > 1 or read_workers > 0:
+            num_compute_workers = compute_workers if compute_workers > 1 else 0
+            compute_worker_kind = applier.CW_THREADS if num_compute_workers else applier.CW_NONE
+            controls.setConcurrencyStyle(applier.ConcurrencyStyle(numReadWorkers=read_workers,
+                                                                  numComputeWorkers=num_compute_workers,
+                                                                  computeWorkerKind=compute_worker_kind))
+
+    return controls
+
+
+def apply_fire_mask_fn(info, inputs, outputs, otherargs):
+    """ RIOS function that sets every band of the dbg_image block to the no data value where the fire scar block is
+    within the cutoff month. The fire scar block is taken from the cached footprint when there is one, otherwise from
+    dk7_image, which RIOS resamples onto the dbg_image block.
+
+    @param info: RIOS ReaderInfo object of the current block.
+    @param inputs: RIOS inputs, dbg_image (bands, rows, cols) and dk7_image (only when otherargs.footprint is None).
+    @param outputs: RIOS outputs, outimg.
+    @param otherargs: RIOS other inputs, footprint (fire_footprint_cache.get_footprint_fn, or None), month_lut
+    (fire_month_mask.month_lut_fn) and valNull.
+    """
+
+    if otherargs.footprint is None:
+        dk_block = inputs.dk7_image
+    else:
+        dk_block = fire_footprint_cache.footprint_block_fn(info, otherargs.footprint, inputs.dbg_image.shape[1:])
+    mask = fire_month_mask.fire_month_mask_fn(dk_block[0], otherargs.month_lut)
+
+    # the input block is read fresh for every block, so it is masked in place and written out
+    outimg = inputs.dbg_image
+    outimg[:, mask] = otherargs.valNull
+    outputs.outimg = outimg
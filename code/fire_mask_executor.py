@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+
+"""
+fire_mask_executor.py
+=====================
+
+Description: This script contains the batch fire mask executor used by the run_fire_scar_mask scripts.
+Each fire mask is described by a job (reference image, fire scar raster, output mask, season / month cutoff and the
+apply_lsat_dk*smask script that produces it). The jobs of every image in a tile are collected first, the jobs whose
+output mask is up to date according to the fire mask manifest (fire_mask_manifest) are removed in bulk and the
+remaining jobs are run in a thread pool with progress reporting. Every completed mask is recorded in the manifest.
+
+The jobs share the fire footprint cache (fire_footprint_cache), so images of the same tile and fire year reuse the
+resampled fire scar footprint whichever worker masks them.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import importlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import fire_month_mask
+import fire_mask_manifest
+
+
+def fire_mask_job_fn(ref_image, fire_path, mask_out, cutoff, apply_module, other_outputs=()):
+    """ Create a fire mask job.
+
+    @param ref_image: string object containing the path to the Landsat image to be masked.
+    @param fire_path: string object containing the path to the fire scar (dka/dkn) raster.
+    @param mask_out: string object containing the path to the output mask image.
+    @param cutoff: string object containing the season (i.e. '0509') or month (i.e. '07') of the image.
+    @param apply_module: string object containing the name of the apply script (i.e. 'apply_lsat_dkbsmask').
+    @param other_outputs: tuple object containing alternative output paths, the job is skipped if any of them exist.
+    @return job: dictionary object containing the job.
+    """
+
+    job = {'ref_image': ref_image,
+           'fire_path': fire_path,
+           'mask_out': mask_out,
+           'cutoff': cutoff,
+           'apply_module': apply_module,
+           'other_outputs': tuple(other_outputs)}
+
+    return job
+
+
+def unique_fire_mask_jobs_fn(jobs):
+    """ Remove the duplicate jobs of an output mask, the last job is kept (as the last job run would overwrite the
+    output mask of the others).
+
+    @param jobs: list object containing the jobs returned by fire_mask_job_fn.
+    @return unique_jobs: list object containing one job per output mask, in their original order.
+    """
+
+    key_fn = fire_mask_manifest.path_key_fn
+
+    last_jobs = {}
+    for job in jobs:
+        last_jobs[key_fn(job['mask_out'])] = job
+
+    return [job for job in jobs if last_jobs[key_fn(job['mask_out'])] is job]
+
+
+def in_memory_fire_masks_fn(jobs):
+    """ Convert fire mask jobs into the images and fire masks of the zonal stats engine, the masks are applied in
+    memory to the site pixels of the original images (zonal_stats_engine.apply_multi_band_zonal_stats_fn) instead of
+    being written to disk.
+
+    @param jobs: list object containing the jobs returned by fire_mask_job_fn.
+    @return image_names: list object containing the (original image path, output mask path) of each masked image,
+    the output mask path is only used to name the results.
+    @return fire_masks: list object containing the (fire scar raster path, cutoff month) of each masked image.
+    """
+
+    image_names = []
+    fire_masks = []
+    for job in unique_fire_mask_jobs_fn(jobs):
+        cutoff_month = fire_month_mask.cutoff_month_fn(job['cutoff'])
+        if cutoff_month is None:
+            print("Unknown fire mask cutoff, image skipped: ", job['cutoff'], job['ref_image'])
+            continue
+        image_names.append((job['ref_image'], job['mask_out']))
+        fire_masks.append((job['fire_path'], cutoff_month))
+
+    return image_names, fire_masks
+
+
+def image_fire_masks_fn(image_list, jobs):
+    """ Align the in memory fire masks (in_memory_fire_masks_fn) of the jobs with an image list, used to calculate the
+    unmasked and fire masked zonal stats of each image together (dual mode).
+
+    @param image_list: list object containing the image paths.
+    @param jobs: list object containing the jobs returned by fire_mask_job_fn.
+    @return fire_masks: list object containing the (fire scar raster path, cutoff month) of each image, None for the
+    images without a fire mask job (the last job of an image is used if it has more than one).
+    """
+
+    key_fn = fire_mask_manifest.path_key_fn
+
+    image_names, fire_masks = in_memory_fire_masks_fn(jobs)
+    image_fire_masks = dict((key_fn(ref_image), fire_mask)
+                            for (ref_image, mask_out), fire_mask in zip(image_names, fire_masks))
+
+    return [image_fire_masks.get(key_fn(image_s)) for image_s in image_list]
+
+
+def pending_fire_mask_jobs_fn(jobs):
+    """ Remove the duplicate jobs (the last job of an output mask is kept) and the jobs whose output mask is up to
+    date (fire_mask_manifest.current_masks_fn), or that have an existing other output.
+
+    @param jobs: list object containing the jobs returned by fire_mask_job_fn.
+    @return pending: list object containing the jobs to be run, in their original order.
+    """
+
+    unique_jobs = unique_fire_mask_jobs_fn(jobs)
+
+    current, adopted = fire_mask_manifest.current_masks_fn(unique_jobs)
+    fire_mask_manifest.update_manifests_fn(adopted)
+
+    pending = []
+    for job, is_current in zip(unique_jobs, current):
+        if is_current:
+            print("Already created: ", job['mask_out'])
+        else:
+            pending.append(job)
+
+    print("fire mask jobs: {0}, duplicates: {1}, already created: {2}, to run: {3}".format(
+        len(jobs), len(jobs) - len(unique_jobs), len(unique_jobs) - len(pending), len(pending)))
+
+    return pending
+
+
+def run_fire_mask_job_fn(job):
+    """ Produce the output mask of a job with its apply_lsat_dk*smask script.
+
+    @param job: dictionary object returned by fire_mask_job_fn.
+    @return job: dictionary object of the completed job.
+    """
+
+    apply_module = importlib.import_module(job['apply_module'])
+    try:
+        apply_module.main_routine(job['ref_image'], job['fire_path'], job['mask_out'], job['cutoff'])
+    except BaseException:
+        # remove a partial mask so it is not mistaken for a completed one
+        if os.path.isfile(job['mask_out']):
+            os.remove(job['mask_out'])
+        raise
+
+    return job
+
+
+def run_fire_mask_jobs_fn(jobs, workers=1):
+    """ Run the fire mask jobs that are not up to date in a thread pool and record the completed masks in the
+    manifest (the completed masks are recorded even if another job fails).
+
+    @param jobs: list object containing the jobs returned by fire_mask_job_fn.
+    @param workers: integer object containing the number of masks produced at the same time.
+    @return pending: list object containing the jobs that were run.
+    """
+
+    pending = pending_fire_mask_jobs_fn(jobs)
+    if not pending:
+        return pending
+
+    workers = max(1, min(int(workers), len(pending)))
+    print("Running {0} fire mask jobs with {1} workers".format(len(pending), workers))
+    start_time = time.time()
+
+    completed_jobs = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(run_fire_mask_job_fn, job) for job in pending]
+            for completed, future in enumerate(as_completed(futures), 1):
+                # re-raise any exception from the job in the main thread.
+                job = future.result()
+                completed_jobs.append(job)
+                print("fire mask {0}/{1} ({2:.1f} s): {3}".format(
+                    completed, len(pending), time.time() - start_time, job['mask_out']))
+    finally:
+        fire_mask_manifest.update_manifests_fn(fire_mask_manifest.completed_mask_records_fn(completed_jobs))
+
+    return pending
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+fire_mask_manifest.py
+=====================
+
+Description: This script contains the fire mask manifest used by the fire mask executor (fire_mask_executor).
+Every fire mask produced is recorded in a small json manifest (fire_mask_manifest.json) stored in the directory of
+the mask, together with the input image, the fire scar raster, the modification time and size of both and the
+season / month cutoff it was produced with.
+
+A mask is skipped only if it exists and its manifest record matches the current inputs. A mask whose image or fire
+scar raster has changed since it was produced (i.e. a partial NAFI product that has been completed) is rebuilt.
+Masks produced before the manifest existed are accepted (and recorded) if they are newer than both inputs.
+
+The modification time and size of every file are read from one directory listing per directory, the images and
+masks are not checked one at a time.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import json
+import os
+import threading
+from datetime import datetime
+
+# manifest file name, one manifest per mask directory
+MANIFEST_NAME = "fire_mask_manifest.json"
+
+# json manifest format version, a manifest written with a different version is ignored
+MANIFEST_VERSION = 1
+
+# manifests are read and written by the executor threads of every product branch
+_MANIFEST_LOCK = threading.Lock()
+
+
+def path_key_fn(path):
+    """ Return the normalised path used as the key of the manifest records and directory stats.
+
+    @param path: string object containing a file path.
+    @return key: string object containing the normalised absolute path.
+    """
+
+    return os.path.normcase(os.path.abspath(path))
+
+
+def directory_stats_fn(paths):
+    """ Return the modification time and size of the paths that exist, each parent directory is listed once.
+
+    @param paths: iterable object containing file paths.
+    @return stats: dictionary object {normalised path: (mtime, size)} of the paths that exist.
+    """
+
+    dir_names = {}
+    for path in paths:
+        dir_path, name = os.path.split(path_key_fn(path))
+        dir_names.setdefault(dir_path, set()).add(name)
+
+    stats = {}
+    for dir_path, names in dir_names.items():
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError:
+            continue
+        for entry in entries:
+            name = os.path.normcase(entry.name)
+            if name in names:
+                entry_stat = entry.stat()
+                stats[os.path.join(dir_path, name)] = (entry_stat.st_mtime, entry_stat.st_size)
+
+    return stats
+
+
+def manifest_path_fn(mask_dir):
+    """ Return the manifest path of a mask directory.
+
+    @param mask_dir: string object containing the path to the directory of the masks.
+    @return manifest_path: string object containing the path to the json manifest.
+    """
+
+    return os.path.join(mask_dir, MANIFEST_NAME)
+
+
+def read_manifest_fn(mask_dir):
+    """ Read the manifest of a mask directory, an empty manifest is returned if it does not exist or is unreadable.
+
+    @param mask_dir: string object containing the path to the directory of the masks.
+    @return records: dictionary object {mask file name: record}.
+    """
+
+    manifest_path = manifest_path_fn(mask_dir)
+    if not os.path.isfile(manifest_path):
+        return {}
+
+    try:
+        with open(manifest_path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (IOError, OSError, ValueError):
+        print("Fire mask manifest could not be read, masks will be checked against their inputs: ", manifest_path)
+        return {}
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+
+    return manifest.get('masks', {})
+
+
+def write_manifest_fn(records, mask_dir):
+    """ Write the manifest of a mask directory, the manifest is written to a temporary file and renamed so that a
+    failed write does not leave a partial manifest behind.
+
+    @param records: dictionary object {mask file name: record}.
+    @param mask_dir: string object containing the path to the directory of the masks.
+    """
+
+    manifest_path = manifest_path_fn(mask_dir)
+    temp_path = manifest_path + '.tmp'
+    try:
+        with open(temp_path, 'w') as manifest_file:
+            json.dump({'version': MANIFEST_VERSION, 'masks': records}, manifest_file, indent=1, sort_keys=True)
+        os.replace(temp_path, manifest_path)
+    except (IOError, OSError):
+        print("Fire mask manifest could not be written: ", manifest_path)
+
+
+def mask_record_fn(job, stats):
+    """ Create the manifest record of a fire mask job from the current stats of its inputs.
+
+    @param job: dictionary object returned by fire_mask_executor.fire_mask_job_fn.
+    @param stats: dictionary object returned by directory_stats_fn (must include the image and fire scar raster).
+    @return record: dictionary object containing the inputs, their mtime and size and the cutoff, None if an input
+    does not exist.
+    """
+
+    ref_stat = stats.get(path_key_fn(job['ref_image']))
+    fire_stat = stats.get(path_key_fn(job['fire_path']))
+    if ref_stat is None or fire_stat is None:
+        return None
+
+    record = {'ref_image': job['ref_image'],
+              'ref_mtime': ref_stat[0],
+              'ref_size': ref_stat[1],
+              'fire_path': job['fire_path'],
+              'fire_mtime': fire_stat[0],
+              'fire_size': fire_stat[1],
+              'cutoff': str(job['cutoff']),
+              'apply_module': job['apply_module']}
+
+    return record
+
+
+def record_matches_fn(manifest_record, record):
+    """ Compare a manifest record with the current record of a job, the creation time is not compared.
+
+    @param manifest_record: dictionary object read from the manifest (or None).
+    @param record: dictionary object returned by mask_record_fn.
+    @return matches: boolean object, True if the mask was produced from the same inputs and cutoff.
+    """
+
+    if manifest_record is None or record is None:
+        return False
+
+    return all(manifest_record.get(key) == value for key, value in record.items())
+
+
+def current_masks_fn(jobs):
+    """ Decide in bulk which fire mask jobs are up to date.
+
+    @param jobs: list object containing the jobs returned by fire_mask_executor.fire_mask_job_fn.
+    @return current: list object of booleans, True if the output mask of the job exists and is up to date.
+    @return adopted: dictionary object {mask directory: {mask file name: record}} of the existing masks without a
+    manifest record that are newer than their inputs, they are to be added to the manifest.
+    """
+
+    stats = directory_stats_fn(path for job in jobs for path in
+                               (job['ref_image'], job['fire_path'], job['mask_out']) + job['other_outputs'])
+
+    manifests = {}
+    current = []
+    adopted = {}
+    for job in jobs:
+        if any(path_key_fn(path) in stats for path in job['other_outputs']):
+            # an alternative output of the image already exists
+            current.append(True)
+            continue
+
+        mask_stat = stats.get(path_key_fn(job['mask_out']))
+        if mask_stat is None:
+            current.append(False)
+            continue
+
+        mask_dir, mask_name = os.path.split(path_key_fn(job['mask_out']))
+        if mask_dir not in manifests:
+            manifests[mask_dir] = read_manifest_fn(mask_dir)
+
+        record = mask_record_fn(job, stats)
+        manifest_record = manifests[mask_dir].get(mask_name)
+
+        if manifest_record is not None:
+            is_current = record_matches_fn(manifest_record, record)
+            if not is_current:
+                print("Inputs changed, the mask will be rebuilt: ", job['mask_out'])
+        elif record is not None and mask_stat[0] >= max(record['ref_mtime'], record['fire_mtime']):
+            # a mask produced before the manifest existed, newer than its inputs
+            is_current = True
+            adopted.setdefault(mask_dir, {})[mask_name] = dict(record, created=None)
+        else:
+            is_current = False
+            print("Mask is older than its inputs, the mask will be rebuilt: ", job['mask_out'])
+
+        current.append(is_current)
+
+    return current, adopted
+
+
+def update_manifests_fn(mask_records):
+    """ Add records to the manifests of their mask directories (read, update and write under a lock).
+
+    @param mask_records: dictionary object {mask directory: {mask file name: record}}.
+    """
+
+    with _MANIFEST_LOCK:
+        for mask_dir, records in mask_records.items():
+            if not records:
+                continue
+            manifest = read_manifest_fn(mask_dir)
+            manifest.update(records)
+            write_manifest_fn(manifest, mask_dir)
+
+
+def completed_mask_records_fn(jobs):
+    """ Create the manifest records of completed fire mask jobs, grouped by mask directory.
+
+    @param jobs: list object containing the completed jobs returned by fire_mask_executor.fire_mask_job_fn.
+    @return mask_records: dictionary object {mask directory: {mask file name: record}}.
+    """
+
+    stats = directory_stats_fn(path for job in jobs for path in (job['ref_image'], job['fire_path']))
+    created = datetime.now().isoformat(timespec='seconds')
+
+    mask_records = {}
+    for job in jobs:
+        record = mask_record_fn(job, stats)
+        if record is None:
+            continue
+        mask_dir, mask_name = os.path.split(path_key_fn(job['mask_out']))
+        record['created'] = created
+        mask_records.setdefault(mask_dir, {})[mask_name] = record
+
+    return mask_records
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+fire_month_mask.py
+==================
+
+Description: This script contains the fire scar month mask shared by the fire mask engine (fire_mask_engine) and the
+in memory fire masks of the zonal stats engine (zonal_stats_engine).
+The fire scar products (dka/dkn) record the month a pixel was burnt (1 - 12). A Landsat image is masked where the
+pixel was burnt on or before the cutoff month of its season (i.e. season '0509' masks months 1 - 9) or single date
+image month. The cutoff month is converted into a 256 entry boolean lookup table and the mask is built with a single
+lookup table gather (lut[dk]).
+
+The script only depends on numpy, so the zonal stats scripts do not require RIOS.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+
+# import modules
+from __future__ import print_function, division
+
+import numpy as np
+
+# cutoff month of each seasonal composite (apply_lsat_dkbsmask and apply_lsat_dknsmask)
+SEASON_CUTOFF_MONTHS = {'0112': 12,
+                        '0509': 9,
+                        '0608': 8,
+                        '0911': 11,
+                        '1202': 12}
+
+# cutoff month of each single date image month (apply_lsat_dksdmask)
+MONTH_CUTOFF_MONTHS = dict(('{0:02d}'.format(month), month) for month in range(1, 13))
+
+_MONTH_LUTS = {}
+
+
+def cutoff_month_fn(cutoff):
+    """ Return the cutoff month of a season (i.e. '0509') or single date image month (i.e. '07').
+
+    @param cutoff: string object containing the season or month of the image.
+    @return cutoff_month: integer object containing the last burnt month (1 - 12) to be masked, None if unknown.
+    """
+
+    cutoff = str(cutoff)
+
+    return SEASON_CUTOFF_MONTHS.get(cutoff, MONTH_CUTOFF_MONTHS.get(cutoff))
+
+
+def month_lut_fn(cutoff_month):
+    """ Return the 256 entry lookup table of a cutoff month, True for the fire scar months 1 to cutoff_month.
+
+    @param cutoff_month: integer object containing the last burnt month (1 - 12) to be masked.
+    @return lut: numpy boolean array object (256,).
+    """
+
+    lut = _MONTH_LUTS.get(cutoff_month)
+    if lut is None:
+        lut = np.zeros(256, dtype=bool)
+        lut[1:cutoff_month + 1] = True
+        _MONTH_LUTS[cutoff_month] = lut
+
+    return lut
+
+
+def fire_month_mask_fn(dk, lut):
+    """ Build the mask of a fire scar block with a single lookup table gather.
+
+    @param dk: numpy array object containing the fire scar month values.
+    @param lut: numpy boolean array object returned by month_lut_fn.
+    @return mask: numpy boolean array object (same shape as dk), True where the pixel is to be masked.
+    """
+
+    if dk.dtype != np.uint8:
+        # values outside 0 - 255 are never fire months, map them to 0 (not masked)
+        dk = np.where((dk >= 0) & (dk <= 255), dk, 0).astype(np.uint8)
+
+    return lut[dk]
@@ -14,6 +14,7 @@ import argparse
 from rios import applier
 import pdb
 from rios import fileinfo
+import fire_mask_engine
 
 
 # def getCmdargs():
@@ -39,7 +40,7 @@ def copyFootPrint(info, inputs, outputs):
     # places the result in the outputs as outimage.
     outputs.outimage = copy 
 
-def main(reffile, infile, outfile):
+def main(reffile, infile, outfile, compute_workers=None, read_workers=None, block_size=None):
     """Main routine"""
     
     # cmdargs = getCmdargs()
@@ -47,6 +48,7 @@ def main(reffile, infile, outfile):
     # Set up input and output filenames.
     infiles = applier.FilenameAssociations()
     controls = applier.ApplierControls()
+    fire_mask_engine.configure_applier_controls_fn(controls, compute_workers, read_workers, block_size)
 
     infiles.image1 = reffile
     infiles.image2 = infile
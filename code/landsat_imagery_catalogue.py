@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+
+"""
+landsat_imagery_catalogue.py
+============================
+
+Description: This script contains the Landsat imagery catalogue used by the step1_5 landsat list scripts.
+A WRS2 tile directory (lsat_dir\\<path_row>) is scanned once and every Landsat product image found in it is stored in
+a compact SQLite table (path, product code, sensor, start and end date, zone, mask type, size and modification time).
+Every listing step is a filtered query of the table (i.e. product 'dp1', zone '2', no mask) instead of a walk of the
+whole tile directory.
+
+The listings of every registered product (PRODUCT_PATTERNS, i.e. 'dp1' or 'dp1_fire_mask') are returned together by
+tile_product_images_fn, every image name of the tile is classified against all of the product patterns with a single
+compiled regular expression.
+
+The catalogue is persisted to a SQLite database (default: the user's home directory) and refreshed incrementally,
+only directories that are new or whose modification time has changed since the last scan are listed again. Within a
+run a tile is refreshed once, unless a refresh is requested (i.e. after the fire mask images have been written).
+Different tiles can be scanned concurrently by different threads.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import calendar
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# catalogue database format version, a database written with a different version is rebuilt
+CATALOGUE_VERSION = 1
+
+# end of a Landsat product image name, i.e. ..._dp1m2.img, ..._dbgm2_zstdmask.img or ..._dp1m2_dkbsmask.img
+IMAGE_NAME_PATTERN = re.compile(r'(?:^|_)(?P<product>[a-z0-9]+)m(?P<zone>\d)(?:_(?P<mask_type>[a-z]+))?\.img$')
+
+# registered product listings: listing name -> (product code, mask types), '' is the unmasked image (i.e. dp1m2.img)
+PRODUCT_PATTERNS = OrderedDict([('dp1', ('dp1', ('',))),
+                                ('dp0', ('dp0', ('zstdmask',))),
+                                ('dbg', ('dbg', ('zstdmask',))),
+                                ('dbi', ('dbi', ('',))),
+                                ('dp1_fire_mask', ('dp1', ('dkbsmask', 'dknsmask'))),
+                                ('dp0_fire_mask', ('dp0', ('dksdmask', 'dkndmask'))),
+                                ('dbg_fire_mask', ('dbg', ('dksdmask', 'dkndmask'))),
+                                ('dbi_fire_mask', ('dbi', ('dkbsmask', 'dknsmask')))])
+
+# compiled product patterns, keyed by (zone, listing names)
+_PRODUCT_PATTERN_CACHE = {}
+
+_CATALOGUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS dirs (dir TEXT PRIMARY KEY, tile_dir TEXT, parent TEXT, mtime REAL);
+CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, dir TEXT, tile_dir TEXT, name TEXT, product TEXT,
+                                   sensor TEXT, start_date TEXT, end_date TEXT, zone TEXT, mask_type TEXT,
+                                   size INTEGER, mtime REAL);
+CREATE INDEX IF NOT EXISTS images_product ON images (tile_dir, product, zone, mask_type);
+CREATE INDEX IF NOT EXISTS dirs_tile_dir ON dirs (tile_dir);
+"""
+
+# tile directories already refreshed in this process, keyed by (database path, tile directory)
+_REFRESHED_TILES = set()
+
+# databases already created / version checked in this process
+_INITIALISED_CATALOGUES = set()
+
+# one lock per (database path, tile directory), different tiles are scanned concurrently
+_TILE_LOCKS = {}
+_CATALOGUE_LOCK = threading.Lock()
+
+
+def register_product_pattern_fn(name, product, mask_types=('',)):
+    """ Register (or replace) a product listing returned by tile_product_images_fn.
+
+    @param name: string object containing the listing name (i.e. 'dil').
+    @param product: string object containing the product code of the image names (i.e. 'dil').
+    @param mask_types: tuple object containing the mask types of the listing, '' for the unmasked images.
+    """
+
+    PRODUCT_PATTERNS[name] = (product, tuple(mask_types))
+    _PRODUCT_PATTERN_CACHE.clear()
+
+
+def product_pattern_fn(zone, names):
+    """ Compile one regular expression matching the image names of every listing, each listing is a named group so
+    the listing of a file name is read from match.lastgroup (the first listing wins if two listings overlap).
+
+    @param zone: string or integer object containing the zone code of the image names (i.e. 2 for 'dp1m2.img').
+    @param names: tuple object containing the listing names (keys of PRODUCT_PATTERNS).
+    @return pattern: compiled regular expression object.
+    """
+
+    key = (str(zone), names)
+    pattern = _PRODUCT_PATTERN_CACHE.get(key)
+    if pattern is None:
+        alternatives = []
+        for name in names:
+            product, mask_types = PRODUCT_PATTERNS[name]
+            suffixes = sorted(re.escape('_' + mask_type) if mask_type else '' for mask_type in mask_types)
+            alternatives.append(r'(?P<{0}>{1}m{2}(?:{3})\.img)'.format(name, re.escape(product), re.escape(str(zone)),
+                                                                      '|'.join(suffixes)))
+        pattern = re.compile(r'(?:^|_)(?:{0})$'.format('|'.join(alternatives)))
+        _PRODUCT_PATTERN_CACHE[key] = pattern
+
+    return pattern
+
+
+def classify_image_paths_fn(image_paths, pattern, names):
+    """ Sort image paths into their listings with one regular expression search per file name.
+
+    @param image_paths: iterable object containing the image paths.
+    @param pattern: compiled regular expression object returned by product_pattern_fn.
+    @param names: tuple object containing the listing names.
+    @return product_images: dictionary object {listing name: [image path, ...]} (every name is a key).
+    """
+
+    product_images = OrderedDict((name, []) for name in names)
+    for image_path in image_paths:
+        match = pattern.search(os.path.basename(image_path))
+        if match is not None:
+            product_images[match.lastgroup].append(image_path)
+
+    return product_images
+
+
+def default_catalogue_path_fn(lsat_dir):
+    """ Return the default SQLite database path for a Landsat directory (the user's home directory).
+
+    @param lsat_dir: string object containing the path to the Landsat directory (parent of the WRS2 tile directories).
+    @return catalogue_path: string object containing the path to the SQLite database.
+    """
+
+    dir_key = hashlib.md5(os.path.normcase(os.path.abspath(lsat_dir)).encode('utf-8')).hexdigest()[:12]
+    catalogue_path = os.path.join(os.path.expanduser("~"), "landsat_imagery_catalogue_{0}.sqlite".format(dir_key))
+
+    return catalogue_path
+
+
+def connect_catalogue_fn(catalogue_path):
+    """ Open the catalogue database. On the first connection in this process the tables are created if they do not
+    exist and emptied if the database was written with a different CATALOGUE_VERSION.
+
+    @param catalogue_path: string object containing the path to the SQLite database.
+    @return conn: sqlite3 Connection object.
+    """
+
+    conn = sqlite3.connect(catalogue_path, timeout=60)
+
+    with _CATALOGUE_LOCK:
+        if catalogue_path not in _INITIALISED_CATALOGUES:
+            conn.executescript(_CATALOGUE_SCHEMA)
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if version is None or version[0] != str(CATALOGUE_VERSION):
+                with conn:
+                    conn.execute("DELETE FROM dirs")
+                    conn.execute("DELETE FROM images")
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                 (str(CATALOGUE_VERSION),))
+            _INITIALISED_CATALOGUES.add(catalogue_path)
+
+    return conn
+
+
+def tile_lock_fn(catalogue_path, tile_dir):
+    """ Return the lock of a tile directory, a tile is only refreshed by one thread at a time.
+
+    @param catalogue_path: string object containing the path to the SQLite database.
+    @param tile_dir: string object containing the normalised path to the WRS2 tile directory.
+    @return lock: threading.Lock object.
+    """
+
+    with _CATALOGUE_LOCK:
+        return _TILE_LOCKS.setdefault((catalogue_path, tile_dir), threading.Lock())
+
+
+def image_dates_fn(date_code):
+    """ Convert an image date code, seasonal 'mYYYYMMYYYYMM' or single date 'YYYYMMDD', into start and end dates.
+
+    @param date_code: string object containing the date part of the image name.
+    @return start_date: string object (YYYY-MM-DD), None if the date code is not recognised.
+    @return end_date: string object (YYYY-MM-DD), the last day of the end month for seasonal images.
+    """
+
+    digits = date_code.lstrip('m')
+    if not digits.isdigit():
+        return None, None
+
+    if len(digits) == 12:
+        s_year, s_month, e_year, e_month = int(digits[:4]), int(digits[4:6]), int(digits[6:10]), int(digits[10:])
+        if not (1 <= s_month <= 12 and 1 <= e_month <= 12):
+            return None, None
+        e_day = calendar.monthrange(e_year, e_month)[1]
+        return '{0:04d}-{1:02d}-01'.format(s_year, s_month), '{0:04d}-{1:02d}-{2:02d}'.format(e_year, e_month, e_day)
+
+    if len(digits) == 8:
+        single_date = '{0}-{1}-{2}'.format(digits[:4], digits[4:6], digits[6:])
+        return single_date, single_date
+
+    return None, None
+
+
+def image_record_fn(entry, dir_path, tile_dir):
+    """ Create a catalogue record for a Landsat product image, None is returned for any other file.
+
+    @param entry: os.DirEntry object of the file.
+    @param dir_path: string object containing the path to the directory of the file.
+    @param tile_dir: string object containing the path to the WRS2 tile directory.
+    @return record: tuple object containing the values of an images table row.
+    """
+
+    match = IMAGE_NAME_PATTERN.search(entry.name)
+    if match is None:
+        return None
+
+    # i.e. lztmre_nt_m198712198802_dbgm2.img: sensor, region, date, product and zone
+    name_parts = entry.name.split("_")
+    sensor = name_parts[0] if len(name_parts) > 1 else None
+    start_date, end_date = image_dates_fn(name_parts[2]) if len(name_parts) > 3 else (None, None)
+
+    stat = entry.stat()
+    record = (entry.path, dir_path, tile_dir, entry.name, match.group('product'), sensor, start_date, end_date,
+              match.group('zone'), match.group('mask_type') or '', stat.st_size, stat.st_mtime)
+
+    return record
+
+
+def refresh_tile_fn(conn, tile_dir):
+    """ Walk a WRS2 tile directory, listing only the directories that are new or whose modification time has changed
+    since the last scan. The images of the directories that no longer exist are removed. The directory walk is done
+    before the database is written, so the database is only locked for the update.
+
+    @param conn: sqlite3 Connection object returned by connect_catalogue_fn.
+    @param tile_dir: string object containing the path to the WRS2 tile directory.
+    @return listed: integer object containing the number of directories (re)listed.
+    """
+
+    cached_dirs = {}
+    cached_subdirs = {}
+    for dir_path, parent, dir_mtime in conn.execute("SELECT dir, parent, mtime FROM dirs WHERE tile_dir = ?",
+                                                    (tile_dir,)):
+        cached_dirs[dir_path] = dir_mtime
+        cached_subdirs.setdefault(parent, []).append(dir_path)
+
+    seen_dirs = set()
+    listings = []
+    dir_stack = [(tile_dir, None)]
+
+    while dir_stack:
+        dir_path, parent = dir_stack.pop()
+        try:
+            dir_mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            continue
+        seen_dirs.add(dir_path)
+
+        if cached_dirs.get(dir_path) == dir_mtime:
+            subdirs = cached_subdirs.get(dir_path, [])
+        else:
+            subdirs = []
+            records = []
+            for entry in os.scandir(dir_path):
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                else:
+                    record = image_record_fn(entry, dir_path, tile_dir)
+                    if record is not None:
+                        records.append(record)
+            listings.append((dir_path, parent, dir_mtime, records))
+
+        dir_stack.extend((subdir, dir_path) for subdir in subdirs)
+
+    with conn:
+        for dir_path, parent, dir_mtime, records in listings:
+            conn.execute("DELETE FROM images WHERE dir = ?", (dir_path,))
+            conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            conn.execute("INSERT OR REPLACE INTO dirs (dir, tile_dir, parent, mtime) VALUES (?, ?, ?, ?)",
+                         (dir_path, tile_dir, parent, dir_mtime))
+
+        # directories removed since the last scan
+        for dir_path in set(cached_dirs) - seen_dirs:
+            conn.execute("DELETE FROM images WHERE dir = ?", (dir_path,))
+            conn.execute("DELETE FROM dirs WHERE dir = ?", (dir_path,))
+
+    return len(listings)
+
+
+def refresh_tile_once_fn(conn, catalogue_path, tile_dir, refresh=False):
+    """ Refresh a tile directory on the first call in this process, or when a refresh is requested. The caller holds
+    the lock of the tile (tile_lock_fn).
+
+    @param conn: sqlite3 Connection object returned by connect_catalogue_fn.
+    @param catalogue_path: string object containing the path to the SQLite database.
+    @param tile_dir: string object containing the normalised path to the WRS2 tile directory.
+    @param refresh: boolean object, True forces the tile directory to be re-checked.
+    """
+
+    tile_key = (catalogue_path, tile_dir)
+    if refresh or tile_key not in _REFRESHED_TILES:
+        listed = refresh_tile_fn(conn, tile_dir)
+        print("Landsat imagery catalogue refreshed: {0} ({1} directories listed)".format(tile_dir, listed))
+        _REFRESHED_TILES.add(tile_key)
+
+
+def refresh_tile_images_fn(landsat_tile_dir, catalogue_path=None):
+    """ Re-check a WRS2 tile directory (incrementally) so the listings that follow can query the catalogue without
+    refreshing the tile again (refresh=False), i.e. once per tile by the batch listing.
+
+    @param landsat_tile_dir: string object containing the path to the WRS2 tile directory (lsat_dir\\<path_row>).
+    @param catalogue_path: string object containing the path to the SQLite database (default:
+    default_catalogue_path_fn).
+    """
+
+    tile_dir = os.path.normpath(landsat_tile_dir)
+    if catalogue_path is None:
+        catalogue_path = default_catalogue_path_fn(os.path.dirname(tile_dir))
+
+    with tile_lock_fn(catalogue_path, tile_dir):
+        conn = connect_catalogue_fn(catalogue_path)
+        try:
+            refresh_tile_once_fn(conn, catalogue_path, tile_dir, refresh=True)
+        finally:
+            conn.close()
+
+
+def tile_images_fn(landsat_tile_dir, product, zone, mask_types=('',), refresh=False, catalogue_path=None):
+    """ Return the paths of the images of a product in a WRS2 tile directory. The tile is scanned (incrementally) on
+    the first call in this process, every other call is a query of the catalogue.
+
+    @param landsat_tile_dir: string object containing the path to the WRS2 tile directory (lsat_dir\\<path_row>).
+    @param product: string object containing the product code (i.e. 'dp1').
+    @param zone: string or integer object containing the zone code of the image name (i.e. 2 for 'dp1m2.img').
+    @param mask_types: tuple object containing the mask types to return, '' for unmasked images (i.e. 'dp1m2.img')
+    and the mask type for masked images (i.e. 'zstdmask' for 'dbgm2_zstdmask.img').
+    @param refresh: boolean object, True forces the tile directory to be re-checked even if it was already scanned
+    in this process (i.e. after fire mask images have been written to it).
+    @param catalogue_path: string object containing the path to the SQLite database (default:
+    default_catalogue_path_fn).
+    @return list_landsat_tile_path: list object containing the image paths sorted by path.
+    """
+
+    tile_dir = os.path.normpath(landsat_tile_dir)
+    if catalogue_path is None:
+        catalogue_path = default_catalogue_path_fn(os.path.dirname(tile_dir))
+
+    mask_types = tuple(mask_types)
+
+    with tile_lock_fn(catalogue_path, tile_dir):
+        conn = connect_catalogue_fn(catalogue_path)
+        try:
+            refresh_tile_once_fn(conn, catalogue_path, tile_dir, refresh)
+            rows = conn.execute("SELECT path FROM images WHERE tile_dir = ? AND product = ? AND zone = ? "
+                                "AND mask_type IN ({0}) ORDER BY path".format(", ".join("?" * len(mask_types))),
+                                (tile_dir, str(product), str(zone)) + mask_types).fetchall()
+        finally:
+            conn.close()
+
+    return [row[0] for row in rows]
+
+
+def tile_product_images_fn(landsat_tile_dir, zone, names=None, refresh=False, catalogue_path=None):
+    """ Return the image listings of every registered product of a WRS2 tile directory together. The tile is
+    scanned once (os.scandir, incrementally) into the catalogue and each image name of the zone is classified with
+    a single compiled regular expression (product_pattern_fn).
+
+    @param landsat_tile_dir: string object containing the path to the WRS2 tile directory (lsat_dir\\<path_row>).
+    @param zone: string or integer object containing the zone code of the image names (i.e. 2 for 'dp1m2.img').
+    @param names: iterable object containing the listing names to return (default: every key of PRODUCT_PATTERNS).
+    @param refresh: boolean object, True forces the tile directory to be re-checked even if it was already scanned
+    in this process (i.e. after fire mask images have been written to it).
+    @param catalogue_path: string object containing the path to the SQLite database (default:
+    default_catalogue_path_fn).
+    @return product_images: dictionary object {listing name: [image path, ...]}, the paths are sorted.
+    """
+
+    names = tuple(PRODUCT_PATTERNS) if names is None else tuple(names)
+    tile_dir = os.path.normpath(landsat_tile_dir)
+    if catalogue_path is None:
+        catalogue_path = default_catalogue_path_fn(os.path.dirname(tile_dir))
+
+    with tile_lock_fn(catalogue_path, tile_dir):
+        conn = connect_catalogue_fn(catalogue_path)
+        try:
+            refresh_tile_once_fn(conn, catalogue_path, tile_dir, refresh)
+            rows = conn.execute("SELECT path FROM images WHERE tile_dir = ? AND zone = ? ORDER BY path",
+                                (tile_dir, str(zone))).fetchall()
+        finally:
+            conn.close()
+
+    return classify_image_paths_fn((row[0] for row in rows), product_pattern_fn(zone, names), names)
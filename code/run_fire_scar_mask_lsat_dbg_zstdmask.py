@@ -12,6 +12,8 @@ import os
 import geopandas as gpd
 import shutil
 from datetime import datetime
+import burn_scar_catalogue
+import fire_mask_executor
 
 
 # def getCmdargs():
@@ -78,8 +80,16 @@ def temporary_dir_fn():
     return temp_dir_path, final_user
 
 
-def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
-    """Run mainRoutine"""
+def fire_mask_jobs_fn(im_list, zone, temp_dir_path, tile, burn_dir):
+    """ Collect the fire mask jobs of every image in a csv image list.
+
+    @param im_list: string object containing the path to the csv image list.
+    @param zone: string object containing the Landsat tile zone.
+    @param temp_dir_path: string object containing the path to the temporary directory.
+    @param tile: string object containing the Landsat tile (path and row).
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @return fire_mask_jobs: list object containing the jobs (fire_mask_executor.fire_mask_job_fn).
+    """
 
     # lsat_tile = cmdargs.lsat_tile
     # lsat_dir = r"N:\landsat\wrs2"
@@ -88,67 +98,12 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
     #part_dkn = cmdargs.part_dkn
     #tile_grid = cmdargs.lsat_tile_grid
 
-    fire_mask_dir = os.path.join(temp_dir_path, "fire_mask")
-
-
-
-    # -------------search for burn scar mapping dkk composites ------------
-    image_list = []
-    file_path_list = []
-    year_list = []
-
-    for root, dirs, files in os.walk(burn_dir, topdown=False):
-        for name in files:
-            # print("fire name: ", name)
-            if name.endswith(f"dkaa2.tif"):
-                name_list = name.split("_")
-
-                image_list.append(name)
-                file_path_list.append(os.path.join(root, name))
-                # print(name_list[2])
-                year = name_list[2]
-                # print(year)
-                year_list.append(str(year))
-
-    dka_df = pd.DataFrame(
-        {'dka': image_list,
-         'dka_path': file_path_list,
-         'year': year_list,
-
-         })
-    print(dka_df)
-
-    # -------------search for burn scar mapping dkn composites ------------
-    image_list = []
-    file_path_list = []
-    year_list = []
-
-    for root, dirs, files in os.walk(burn_dir, topdown=False):
-        for name in files:
-            # print("fire name: ", name)
-            if name.endswith(f"dkna2.tif"):
-                name_list = name.split("_")
-
-                image_list.append(name)
-                file_path_list.append(os.path.join(root, name))
-                # print(name_list[2])
-                year = name_list[2]
-                # print(year)
-                year_list.append(str(year))
-
-    dkn_df = pd.DataFrame(
-        {'dkn': image_list,
-         'dkn_path': file_path_list,
-         'year': year_list,
+    # ------------- burn scar catalogue (scanned once per run, keyed by product and year) ------------
+    catalogue = burn_scar_catalogue.load_burn_scar_catalogue_fn(burn_dir)
+    print("burn scar years: ", dict((product, sorted(catalogue[product])) for product in catalogue))
 
-         })
-    print(dkn_df)
+    fire_mask_jobs = []
 
-    foot_img_list = []
-    foot_img_path_list = []
-    foot_year = []
-    orig_fire_list = []
-    orig_dbi_list = []
     file_path_list = []
     year_list = []
     month_list = []
@@ -207,13 +162,8 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
          })
     print(single_dbg_df)
 
-    foot_img_list = []
-    foot_img_path_list = []
-    foot_year = []
-    orig_fire_list = []
-    orig_dbg_list = []
-
-    for index, row in single_dbg_df.iterrows():
+    # images from the same year are processed together
+    for row in single_dbg_df.sort_values('year', kind='mergesort').to_dict('records'):
         dbg_image = row["dbg"]
         dbg_path = row["dbg_path"]
         year = row["year"]
@@ -228,53 +178,27 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
             reffile = dbg_path
             mask_out_name = reffile.replace("_zstdmask.img", "_dksdmask.img")
 
-            if os.path.isfile(mask_out_name):
-                print("Already created: ", mask_out_name)
-            else:
-                print("-"*100)
-                print("Creating: ", mask_out_name)
-                required_year = year
-                print("Required mask year: ", required_year)
-
-                # hunt for fire year
-
-                for index, row in dka_df.iterrows():
-                    f_year = row["year"]
-                    if f_year == required_year:
-                        print("located annual dbg and matching fire year")
+            print("-"*100)
+            required_year = year
+            print("Required mask year: ", required_year)
 
-                        f_name = row["dka"]
-                        f_path = row["dka_path"]
+            # hunt for fire year
 
-                        infile = f_path
-                        f_name_split = f_name.split("_")
-                        str_tile = str(tile)
-                        # print("f_name_split: ", f_name_split)
+            for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dka", required_year):
+                print("located annual dbg and matching fire year")
 
-                        out_name = f"{str(f_name_split[0])}_{str(required_year)}{str(month)}{str(day)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dksd{str(zone)}.img"
-                        print(out_name)
+                f_path = fire_record["path"]
 
-                        # import sys
-                        # sys.exit()
-                        outfile = os.path.join(temp_dir_path, out_name)
-                        print("outfile: ", outfile)
+                infile = f_path
 
-                        foot_img_list.append(out_name)
-                        foot_img_path_list.append(outfile)
-                        foot_year.append(required_year)
-                        orig_fire_list.append(f_path)
-                        orig_dbg_list.append(reffile)
+                # import sys
+                # sys.exit()
 
-                        import imgFootPrintConverter_rios2
-                        imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+                mask_out_name = reffile.replace("_zstdmask.img", "_dksdmask.img")
+                print(mask_out_name)
 
-                        mask_out_name = reffile.replace("_zstdmask.img", "_dksdmask.img")
-                        print(mask_out_name)
-
-                        import apply_lsat_dksdmask
-                        apply_lsat_dksdmask.main_routine(reffile, outfile, mask_out_name, month)
-
-                        print("file exported to: ", mask_out_name)
+                fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, month,
+                                                                          "apply_lsat_dksdmask"))
 
         # ----------------------------------------------- DKN ________________________________________________________
 
@@ -283,56 +207,39 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
             reffile = dbg_path
             mask_out_name = reffile.replace("_zstdmask.img", "_dkndmask.img")
 
-            if os.path.isfile(mask_out_name):
-                print("Already created: ", mask_out_name)
-            else:
-                print("Creating: ", mask_out_name)
-                required_year = year
-                print("Required mask year: ", required_year)
+            required_year = year
+            print("Required mask year: ", required_year)
 
-                # hunt for fire year
+            # hunt for fire year
 
-                for index, row in dkn_df.iterrows():
-                    f_year = row["year"]
-                    if f_year == required_year:
-                        print("located annual dbg and matching fire year")
+            for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dkn", required_year):
+                print("located annual dbg and matching fire year")
 
-                        f_name = row["dkn"]
-                        f_path = row["dkn_path"]
+                f_path = fire_record["path"]
 
-                        infile = f_path
-                        f_name_split = f_name.split("_")
-                        str_tile = str(tile)
-                        # print("f_name_split: ", f_name_split)
+                infile = f_path
 
-                        out_name = f"{str(f_name_split[0])}_{str(required_year)}{str(month)}{str(day)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dknd{str(zone)}.img"
-                        print(out_name)
+                # import sys
+                # sys.exit()
 
-                        # import sys
-                        # sys.exit()
-                        outfile = os.path.join(temp_dir_path, out_name)
-                        print("outfile: ", outfile)
+                mask_out_name = reffile.replace("_zstdmask.img", "_dkndmask.img")
+                print(mask_out_name)
 
-                        foot_img_list.append(out_name)
-                        foot_img_path_list.append(outfile)
-                        foot_year.append(required_year)
-                        orig_fire_list.append(f_path)
-                        orig_dbg_list.append(reffile)
+                fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, month,
+                                                                          "apply_lsat_dksdmask"))
 
-                        import imgFootPrintConverter_rios2
-                        imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+        else:
+            pass
 
-                        mask_out_name = reffile.replace("_zstdmask.img", "_dkndmask.img")
-                        print(mask_out_name)
 
-                        import apply_lsat_dksdmask
-                        apply_lsat_dksdmask.main_routine(reffile, outfile, mask_out_name, month)
+    return fire_mask_jobs
 
-                        print("file exported to: ", mask_out_name)
 
-        else:
-            pass
+def main_routine(im_list, zone, temp_dir_path, tile, burn_dir, workers=1):
+    """Run mainRoutine"""
 
+    fire_mask_jobs = fire_mask_jobs_fn(im_list, zone, temp_dir_path, tile, burn_dir)
+    fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, workers)
 
     print("script complete, goodbye.......")
 
@@ -12,6 +12,8 @@ import os
 import geopandas as gpd
 import shutil
 from datetime import datetime
+import burn_scar_catalogue
+import fire_mask_executor
 
 
 # def getCmdargs():
@@ -78,8 +80,16 @@ def temporary_dir_fn():
     return temp_dir_path, final_user
 
 
-def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
-    """Run mainRoutine"""
+def fire_mask_jobs_fn(im_list, zone, temp_dir_path, tile, burn_dir):
+    """ Collect the fire mask jobs of every image in a csv image list.
+
+    @param im_list: string object containing the path to the csv image list.
+    @param zone: string object containing the Landsat tile zone.
+    @param temp_dir_path: string object containing the path to the temporary directory.
+    @param tile: string object containing the Landsat tile (path and row).
+    @param burn_dir: string object containing the path to the burn scar directory.
+    @return fire_mask_jobs: list object containing the jobs (fire_mask_executor.fire_mask_job_fn).
+    """
 
     print("run fire scar mask lsat dp1")
     # lsat_tile = cmdargs.lsat_tile
@@ -89,73 +99,12 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
     #part_dkn = cmdargs.part_dkn
     #tile_grid = cmdargs.lsat_tile_grid
 
-    fire_mask_dir = os.path.join(temp_dir_path, "fire_mask")
-
-    if not os.path.isdir(fire_mask_dir):
-        os.mkdir(fire_mask_dir)
-
-    # -------------search for burn scar mapping dka composites ------------
-    image_list = []
-    file_path_list = []
-    year_list = []
-
-    for root, dirs, files in os.walk(burn_dir, topdown=False):
-        for name in files:
-            # print("fire name: ", name)
-            if name.endswith(f"dkaa2.tif"):
-                name_list = name.split("_")
+    # ------------- burn scar catalogue (scanned once per run, keyed by product and year) ------------
+    catalogue = burn_scar_catalogue.load_burn_scar_catalogue_fn(burn_dir)
+    print("burn scar years: ", dict((product, sorted(catalogue[product])) for product in catalogue))
 
-                image_list.append(name)
-                file_path_list.append(os.path.join(root, name))
-                # print(name_list[2])
-                year = name_list[2]
-                # print(year)
-                year_list.append(str(year))
+    fire_mask_jobs = []
 
-    dka_df = pd.DataFrame(
-        {'dka': image_list,
-         'dka_path': file_path_list,
-         'year': year_list,
-
-         })
-    print(dka_df)
-
-    dka_df.to_csv(r"U:\biomass\scratch\fire_mask\dka_df.csv", index=False)
-
-    # -------------search for burn scar mapping dkk composites ------------
-    image_list = []
-    file_path_list = []
-    year_list = []
-
-    for root, dirs, files in os.walk(burn_dir, topdown=False):
-        for name in files:
-            # print("fire name: ", name)
-            if name.endswith(f"dkna2.tif"):
-                name_list = name.split("_")
-
-                image_list.append(name)
-                file_path_list.append(os.path.join(root, name))
-                # print(name_list[2])
-                year = name_list[2]
-                # print(year)
-                year_list.append(str(year))
-
-    dkn_df = pd.DataFrame(
-        {'dkn': image_list,
-         'dkn_path': file_path_list,
-         'year': year_list,
-
-         })
-    print(dkn_df)
-    dkn_df.to_csv(r"U:\biomass\scratch\fire_mask\dkn_df.csv", index=False)
-
-    foot_img_list = []
-    foot_img_path_list = []
-    foot_year = []
-    orig_fire_list = []
-    orig_dp1_list = []
-    st_month_list = []
-    end_month_list = []
     file_path_list = []
     year_list = []
     st_month_list = []
@@ -213,13 +162,8 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
         print(seasonal_dp1_df)
         seasonal_dp1_df.to_csv(r"U:\biomass\scratch\fire_mask\seasonal_dp1_df.csv", index=False)
 
-        foot_img_list = []
-        foot_img_path_list = []
-        foot_year = []
-        orig_fire_list = []
-        orig_dp1_list = []
-
-        for index, row in seasonal_dp1_df.iterrows():
+        # images from the same year are processed together
+        for row in seasonal_dp1_df.sort_values('year', kind='mergesort').to_dict('records'):
             dp1_image = row["dp1"]
             dp1_path = row["dp1_path"]
             year = row["year"]
@@ -239,51 +183,23 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
                     reffile = dp1_path
                     mask_out_name = reffile.replace(".img", "_dkbsmask.img")
 
-                    if os.path.isfile(mask_out_name):
-                        print("Already created: ", mask_out_name)
-                    else:
-                        print("Creating: ", mask_out_name)
-                        required_year = year
-                        print("Required mask year: ", required_year)
-
-                        # hunt for fire year
-
-                        for index, row in dkn_df.iterrows():
-                            f_year = row["year"]
-                            if f_year == required_year:
-                                print("located annual dp1 and matching fire year: ", str(year))
-
-                                f_name = row["dka"]
-                                f_path = row["dka_path"]
-
-                                infile = f_path
-                                f_name_split = f_name.split("_")
-                                str_tile = str(tile)
-                                # print("f_name_split: ", f_name_split)
-                                out_name = f"{str(f_name_split[0])}_{str(required_year)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dkba{str(zone)}.img"
+                    required_year = year
+                    print("Required mask year: ", required_year)
 
-                                outfile = os.path.join(fire_mask_dir, out_name)
-                                print("outfile: ", outfile)
+                    # hunt for fire year
 
-                                foot_img_list.append(out_name)
-                                foot_img_path_list.append(outfile)
-                                foot_year.append(required_year)
-                                orig_fire_list.append(f_path)
-                                orig_dp1_list.append(reffile)
+                    for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dka", required_year):
+                        print("located annual dp1 and matching fire year: ", str(year))
 
-                                import imgFootPrintConverter_rios2
-                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+                        f_path = fire_record["path"]
 
-                                mask_out_name = reffile.replace(".img", "_dkbsmask.img")
-                                print(mask_out_name)
+                        infile = f_path
 
-                                import apply_lsat_dkbsmask
-                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name, season)
+                        mask_out_name = reffile.replace(".img", "_dkbsmask.img")
+                        print(mask_out_name)
 
-                                print("file exported to: ", outfile)
-
-                            else:
-                                pass
+                        fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, season,
+                                                                                  "apply_lsat_dkbsmask"))
 
                 elif st_month == "05":
                     season = "0509"
@@ -293,52 +209,23 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
 
                     mask_out_name = reffile.replace(".img", "_dkbsmask.img")
 
-                    if os.path.isfile(mask_out_name):
-                        print("Already created: ", mask_out_name)
-                    else:
-                        print("Creating: ", mask_out_name)
-                        required_year = year
-
-                        # hunt for fire year
-
-                        for index, row in dkn_df.iterrows():
-                            f_year = row["year"]
-                            if f_year == required_year:
-                                print("located dry season dp1 and matching fire year")
-
-                                f_name = row["dka"]
-                                f_path = row["dka_path"]
+                    required_year = year
 
-                                infile = f_path
-                                # print("infile: ", infile)
-                                f_name_split = f_name.split("_")
-                                str_tile = str(tile)
-                                # print("f_name_split: ", f_name_split)
-                                out_name = f"{str(f_name_split[0])}_{str(required_year)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dkba{str(zone)}.img"
-                                # print(out_name)
+                    # hunt for fire year
 
-                                outfile = os.path.join(fire_mask_dir, out_name)
-                                print("outfile: ", outfile)
+                    for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dka", required_year):
+                        print("located dry season dp1 and matching fire year")
 
-                                foot_img_list.append(out_name)
-                                foot_img_path_list.append(outfile)
-                                foot_year.append(required_year)
-                                orig_fire_list.append(f_path)
-                                orig_dp1_list.append(reffile)
+                        f_path = fire_record["path"]
 
-                                import imgFootPrintConverter_rios2
-                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+                        infile = f_path
+                        # print("infile: ", infile)
 
-                                mask_out_name = reffile.replace(".img", "_dkbsmask.img")
-                                print(mask_out_name)
+                        mask_out_name = reffile.replace(".img", "_dkbsmask.img")
+                        print(mask_out_name)
 
-                                import apply_lsat_dkbsmask
-                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name, season)
-
-                                print("file exported to: ", outfile)
-
-                            else:
-                                pass
+                        fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, season,
+                                                                                  "apply_lsat_dkbsmask"))
 
             #elif int_year > 2017:
             elif int_year > 1999:
@@ -350,51 +237,23 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
                     reffile = dp1_path
                     mask_out_name = reffile.replace(".img", "_dknsmask.img")
 
-                    if os.path.isfile(mask_out_name):
-                        print("Already created: ", mask_out_name)
-                    else:
-                        print("Creating: ", mask_out_name)
-                        required_year = year
-                        print("Required mask year: ", required_year)
-
-                        # hunt for fire year
-
-                        for index, row in dkn_df.iterrows():
-                            f_year = row["year"]
-                            if f_year == required_year:
-                                print("located annual dp1 and matching fire year")
-
-                                f_name = row["dkn"]
-                                f_path = row["dkn_path"]
+                    required_year = year
+                    print("Required mask year: ", required_year)
 
-                                infile = f_path
-                                f_name_split = f_name.split("_")
-                                str_tile = str(tile)
-                                # print("f_name_split: ", f_name_split)
-                                out_name = f"{str(f_name_split[0])}_{str(required_year)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dkns{str(zone)}.img"
+                    # hunt for fire year
 
-                                outfile = os.path.join(fire_mask_dir, out_name)
-                                # print("outfile: ", outfile)
+                    for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dkn", required_year):
+                        print("located annual dp1 and matching fire year")
 
-                                foot_img_list.append(out_name)
-                                foot_img_path_list.append(outfile)
-                                foot_year.append(required_year)
-                                orig_fire_list.append(f_path)
-                                orig_dp1_list.append(reffile)
+                        f_path = fire_record["path"]
 
-                                import imgFootPrintConverter_rios2
-                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+                        infile = f_path
 
-                                mask_out_name = reffile.replace(".img", "_dknsmask.img")
-                                print(mask_out_name)
+                        mask_out_name = reffile.replace(".img", "_dknsmask.img")
+                        print(mask_out_name)
 
-                                import apply_lsat_dkbsmask
-                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name, season)
-
-                                print("file exported to: ", outfile)
-
-                            else:
-                                pass
+                        fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, season,
+                                                                                  "apply_lsat_dkbsmask"))
 
                 elif st_month == "05":
                     season = "0509"
@@ -404,52 +263,32 @@ def main_routine(im_list, zone, temp_dir_path, tile, burn_dir):
 
                     mask_out_name = reffile.replace(".img", "_dknsmask.img")
 
-                    if os.path.isfile(mask_out_name):
-                        print("Already created: ", mask_out_name)
-                    else:
-                        print("Creating: ", mask_out_name)
-                        required_year = year
+                    required_year = year
 
-                        # hunt for fire year
+                    # hunt for fire year
 
-                        for index, row in dkn_df.iterrows():
-                            f_year = row["year"]
-                            if f_year == required_year:
-                                print("located dry season dp1 and matching fire year")
+                    for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dkn", required_year):
+                        print("located dry season dp1 and matching fire year")
 
-                                f_name = row["dkn"]
-                                f_path = row["dkn_path"]
+                        f_path = fire_record["path"]
 
-                                infile = f_path
-                                # print("infile: ", infile)
-                                f_name_split = f_name.split("_")
-                                str_tile = str(tile)
-                                # print("f_name_split: ", f_name_split)
-                                out_name = f"{str(f_name_split[0])}_{str(required_year)}_p{str(str_tile[:3])}_r{str(str_tile[3:])}_dknn{str(zone)}.img"
-                                # print(out_name)
+                        infile = f_path
+                        # print("infile: ", infile)
 
-                                outfile = os.path.join(fire_mask_dir, out_name)
-                                # print("outfile: ", outfile)
+                        mask_out_name = reffile.replace(".img", "_dknsmask.img")
+                        print(mask_out_name)
 
-                                foot_img_list.append(out_name)
-                                foot_img_path_list.append(outfile)
-                                foot_year.append(required_year)
-                                orig_fire_list.append(f_path)
-                                orig_dp1_list.append(reffile)
+                        fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(reffile, infile, mask_out_name, season,
+                                                                                  "apply_lsat_dkbsmask"))
 
-                                import imgFootPrintConverter_rios2
-                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+    return fire_mask_jobs
 
-                                mask_out_name = reffile.replace(".img", "_dknsmask.img")
-                                print(mask_out_name)
 
-                                import apply_lsat_dkbsmask
-                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name, season)
-
-                                print("file exported to: ", outfile)
+def main_routine(im_list, zone, temp_dir_path, tile, burn_dir, workers=1):
+    """Run mainRoutine"""
 
-                            else:
-                                pass
+    fire_mask_jobs = fire_mask_jobs_fn(im_list, zone, temp_dir_path, tile, burn_dir)
+    fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, workers)
 
     print("script complete, goodbye.......")
 
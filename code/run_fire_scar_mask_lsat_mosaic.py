@@ -12,6 +12,9 @@ import os
 import geopandas as gpd
 import shutil
 from datetime import datetime
+import burn_scar_catalogue
+import fire_mask_executor
+import fire_mask_engine
 
 
 def getCmdargs():
@@ -31,6 +34,23 @@ def getCmdargs():
 
     p.add_argument("-p", "--part_dkn", help="Uncompleted NAFI Landsat Burn Scar (i.e. 'dkh') up to August")
 
+    p.add_argument("-j", "--mask_jobs", type=int,
+                   help="Enter the number of fire masks produced at the same time (i.e. 4)",
+                   default=1)
+
+    p.add_argument("-m", "--mask_workers", type=int,
+                   help="Enter the number of RIOS compute workers used per fire mask (block) applier, "
+                        "RIOS 2 only (i.e. 4)",
+                   default=1)
+
+    p.add_argument("-e", "--read_workers", type=int,
+                   help="Enter the number of RIOS read workers used per fire mask applier, RIOS 2 only (i.e. 2)",
+                   default=0)
+
+    p.add_argument("-k", "--block_size", type=int,
+                   help="Enter the RIOS block size in pixels used by the fire mask appliers (i.e. 1024)",
+                   default=None)
+
     cmdargs = p.parse_args()
 
     if cmdargs.lsat_dir is None:
@@ -83,6 +103,7 @@ def main_routine():
     burn_dir = cmdargs.burn_scar_dir
     nafi_dir = cmdargs.lsat_nafi_dir
     part_dkn = cmdargs.part_dkn
+    fire_mask_engine.set_rios_concurrency_fn(cmdargs.mask_workers, cmdargs.read_workers, cmdargs.block_size)
     # tile_grid = cmdargs.lsat_tile_grid
 
     temp_dir_path, user = temporary_dir_fn()
@@ -90,57 +111,12 @@ def main_routine():
 
     # ------------------------------------------------ DKK Fire Scars -----------------------------------------
 
-    # ------------- search for burn scar mapping dkk composites ------------
-    fimage_list = []
-    ffile_path_list = []
-    fyear_list = []
-
-    for froot, fdirs, ffiles in os.walk(burn_dir, topdown=False):
-        for fname in ffiles:
-            print("fire name: ", fname)
-            if fname.endswith(f"dkaa2.tif"):
-                fname_list = fname.split("_")
-
-                fimage_list.append(fname)
-                ffile_path_list.append(os.path.join(froot, fname))
-                # print(fname_list[2])
-                fyear = fname_list[2]
-                # print(fyear)
-                fyear_list.append(str(fyear))
-
-    dka_df = pd.DataFrame(
-        {'dka': fimage_list,
-         'dka_path': ffile_path_list,
-         'year': fyear_list,
-
-         })
-    #print("dka: ", dka_df)
+    # ------------- burn scar catalogue (scanned once per run, keyed by product and year) ------------
+    catalogue = burn_scar_catalogue.load_burn_scar_catalogue_fn(burn_dir)
+    print("burn scar years: ", dict((product, sorted(catalogue[product])) for product in catalogue))
 
-    # ------------- search for burn scar mapping dkn composites ------------
-    image_list = []
-    file_path_list = []
-    year_list = []
-
-    for root, dirs, files in os.walk(burn_dir, topdown=False):
-        for name in files:
-            # print("fire name: ", name)
-            if name.endswith(f"dkna2.tif"):
-                name_list = name.split("_")
-
-                image_list.append(name)
-                file_path_list.append(os.path.join(root, name))
-                # print(name_list[2])
-                year = name_list[2]
-                # print(year)
-                year_list.append(str(year))
-
-    dkn_df = pd.DataFrame(
-        {'dkn': image_list,
-         'dkn_path': file_path_list,
-         'year': year_list,
-
-         })
-    print(dkn_df)
+    # fire mask jobs of every mosaic, run together once the mosaic directories have been walked
+    fire_mask_jobs = []
 
 
 
@@ -172,6 +148,8 @@ def main_routine():
                     year_list = []
                     st_month_list = []
                     end_month_list = []
+                    # first fire mask job of the mosaic directory
+                    dir_job_start = len(fire_mask_jobs)
 
                     # import sys
                     # sys.exit()
@@ -212,13 +190,9 @@ def main_routine():
 
                         # ------------------------------------------------------------------------------
 
-                        foot_img_list = []
-                        foot_img_path_list = []
-                        foot_year = []
-                        orig_fire_list = []
-                        orig_dbi_list = []
                         print("Go through mosaic df")
-                        for index, row in seasonal_dbi_df.iterrows():
+                        # images from the same year are processed together
+                        for row in seasonal_dbi_df.sort_values('year', kind='mergesort').to_dict('records'):
                             # print("row: ", row)
                             dbi_image = row["mosaic"]
                             dbi_path = row["mosaic_path"]
@@ -246,110 +220,51 @@ def main_routine():
                             mask_out_name1 = reffile.replace(".tif", "_dkbsmask.tif")
                             mask_out_name2 = reffile.replace(".tif", "_dknsmask.tif")
 
-                            if os.path.isfile(mask_out_name1) or os.path.isfile(mask_out_name2):
-                                print("Already created: ", mask_out_name1, " or ", mask_out_name2)
-                            else:
-                                required_year = year
-
-                                # hunt for fire year
-                                print("-"*50)
-                                int_year = int(year)
-                                print(int_year)
-                                if int_year <= 2017:
+                            required_year = year
 
-                                    for index, row in dka_df.iterrows():
-                                        f_year = row["year"]
-                                        if f_year == required_year:
-                                            print("located annual dbi and matching fire year")
+                            # hunt for fire year
+                            print("-"*50)
+                            int_year = int(year)
+                            print(int_year)
+                            if int_year <= 2017:
 
-                                            f_name = row["dka"]
-                                            f_path = row["dka_path"]
+                                for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dka", required_year):
+                                    print("located annual dbi and matching fire year")
 
-                                            infile = f_path
-                                            f_name_split = f_name.split("_")
-                                            # str_tile = str(tile)
-                                            # print("f_name_split: ", f_name_split)
-                                            out_name = f"{str(f_name_split[0])}_nt_{required_year}_{out_dir}a2.img"
+                                    f_path = fire_record["path"]
 
-                                            outfile = os.path.join(temp_dir_path, out_name)
-                                            print("outfile: ", outfile)
+                                    infile = f_path
 
-                                            foot_img_list.append(out_name)
-                                            foot_img_path_list.append(outfile)
-                                            foot_year.append(required_year)
-                                            orig_fire_list.append(f_path)
-                                            orig_dbi_list.append(reffile)
+                                    fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(
+                                        reffile, infile, mask_out_name1, season, "apply_lsat_dkbsmask", (mask_out_name2,)))
 
-                                            if os.path.isfile(mask_out_name1):
-                                                print("Exists: ", mask_out_name1)
-                                            else:
-
-                                                import imgFootPrintConverter_rios2
-                                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
-
-                                                import apply_lsat_dkbsmask
-                                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name1, season)
-
-                                                print("Fire masked footprint exported to: ", outfile)
-                                                print("Masked data: ", mask_out_name1)
-                                                print("+"*50)
-
-                                elif int_year > 2017:
-                                    print("-"*50)
-                                    print(int_year)
-
-                                    for index, row in dkn_df.iterrows():
-                                        f_year = row["year"]
-                                        if f_year == required_year:
-                                            print("located annual dbi and matching fire year")
-
-                                            f_name = row["dkn"]
-                                            f_path = row["dkn_path"]
-
-                                            infile = f_path
-                                            f_name_split = f_name.split("_")
-                                            # str_tile = str(tile)
-                                            # print("f_name_split: ", f_name_split)
-                                            out_name = f"{str(f_name_split[0])}_nt_{required_year}_{out_dir}a2.img"
-
-                                            outfile = os.path.join(temp_dir_path, out_name)
-                                            print("outfile: ", outfile)
-
-                                            foot_img_list.append(out_name)
-                                            foot_img_path_list.append(outfile)
-                                            foot_year.append(required_year)
-                                            orig_fire_list.append(f_path)
-                                            orig_dbi_list.append(reffile)
-
-                                            if os.path.isfile(mask_out_name2):
-                                                print("Exists: ", mask_out_name2)
-                                            else:
-
-                                                import imgFootPrintConverter_rios2
-                                                imgFootPrintConverter_rios2.main(reffile, infile, outfile)
+                            elif int_year > 2017:
+                                print("-"*50)
+                                print(int_year)
 
-                                                import apply_lsat_dkbsmask
-                                                apply_lsat_dkbsmask.main_routine(reffile, outfile, mask_out_name2,
-                                                                                 season)
+                                for fire_record in burn_scar_catalogue.burn_scar_records_fn(catalogue, "dkn", required_year):
+                                    print("located annual dbi and matching fire year")
 
-                                                print("Fire masked footprint exported to: ", outfile)
-                                                print("Masked data: ", mask_out_name2)
+                                    f_path = fire_record["path"]
 
-                                                print("+"*50)
+                                    infile = f_path
 
+                                    fire_mask_jobs.append(fire_mask_executor.fire_mask_job_fn(
+                                        reffile, infile, mask_out_name2, season, "apply_lsat_dkbsmask", (mask_out_name1,)))
 
-                        footprint_df = pd.DataFrame(
-                            {"footprint": foot_img_list,
-                             "foot_path": foot_img_path_list,
-                             "foot_year": foot_year,
-                             "orig_fire": orig_fire_list,
-                             "orig_dbi": orig_dbi_list,
-                             })
-                        print(footprint_df)
-                        footprint_df.to_csv(os.path.join(temp_dir_path, f"{out_dir}_dka_df.csv"), index=False)
+                    # fire raster and output mask of each fire mask job of the mosaic directory
+                    fire_mask_job_df = pd.DataFrame(
+                        [(job['ref_image'], job['fire_path'], job['mask_out'], job['cutoff'])
+                         for job in fire_mask_jobs[dir_job_start:]],
+                        columns=["mosaic_path", "fire_path", "mask_out", "season"])
+                    print(fire_mask_job_df)
+                    fire_mask_job_df.to_csv(os.path.join(temp_dir_path, f"{out_dir}_fire_mask_jobs_df.csv"),
+                                            index=False)
                 else:
                     print("This is not the correct dir..")
 
+    fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, cmdargs.mask_jobs)
+
     # # ------------------------------------------------ DKN Fire Scars -----------------------------------------
     #
     # # -------------search for burn scar mapping dkk composites ------------
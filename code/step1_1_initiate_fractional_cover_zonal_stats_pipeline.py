@@ -102,6 +102,36 @@ Landsat images. -- default set to 'dilm3_zstdmask.img'
 string object from the concatenation of the end part of the filename search criteria for the QLD Rainfall images.
 -- default set to '.img'
 
+--branch_workers: int
+integer object containing the maximum number of product branches (dp1, dp0, dbg and dbi) run concurrently
+-- default set to 4.
+
+--workers: int
+integer object containing the number of worker processes used to calculate the zonal stats of each image in parallel
+-- default set to 1 (serial).
+
+--mask_jobs: int
+integer object containing the number of fire mask images produced at the same time by each product branch
+-- default set to 1 (serial).
+
+--mask_mode: str
+string object, 'raster' writes the fire masked images (*_dkbsmask.img etc.) and calculates the masked zonal stats from
+them, 'memory' applies the fire masks to the site pixels of the original images in memory (no mask images are written)
+and 'dual' calculates the unmasked and the in memory fire masked zonal stats from a single read of each image
+-- default set to 'raster'.
+
+--mask_workers: int
+integer object containing the number of RIOS compute workers used to process the blocks of each fire mask image
+(RIOS 2 only, older RIOS versions process the blocks serially) -- default set to 1 (serial).
+
+--read_workers: int
+integer object containing the number of RIOS read workers used by each fire mask image (RIOS 2 only)
+-- default set to 0.
+
+--block_size: int
+integer object containing the RIOS block size (pixels) used by the fire mask images
+-- default set to None (RIOS default 256).
+
 ======================================================================================================
 
 """
@@ -115,11 +145,19 @@ import shutil
 import sys
 import warnings
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import geopandas
+import fire_mask_engine
+import fire_mask_executor
 
 warnings.filterwarnings("ignore")
 
+# (csv list, stage) pairs that have already been run, shared by the concurrent product branches.
+completed_stages = set()
+completed_stages_lock = threading.Lock()
+
 
 def get_cmd_args_fn():
     p = argparse.ArgumentParser(
@@ -157,6 +195,37 @@ def get_cmd_args_fn():
     p.add_argument("-b", "--burn_dir", help="Path to the Landsat Burn scar (dkk) directory",
                     default=r"U:\biomass\fire_scar")
 
+    p.add_argument("-c", "--branch_workers", type=int,
+                   help="Enter the maximum number of product branches (dp1, dp0, dbg, dbi) run concurrently (i.e. 4)",
+                   default=4)
+
+    p.add_argument("-w", "--workers", type=int,
+                   help="Enter the number of worker processes used to calculate the zonal stats per image (i.e. 16)",
+                   default=1)
+
+    p.add_argument("-j", "--mask_jobs", type=int,
+                   help="Enter the number of fire masks produced at the same time per product branch (i.e. 4)",
+                   default=1)
+
+    p.add_argument("-f", "--mask_mode", choices=["raster", "memory", "dual"],
+                   help="Enter 'raster' to write the fire masked images, 'memory' to apply the fire masks in memory "
+                        "while calculating the masked zonal stats or 'dual' to calculate the unmasked and masked "
+                        "zonal stats from a single read of each image",
+                   default="raster")
+
+    p.add_argument("-m", "--mask_workers", type=int,
+                   help="Enter the number of RIOS compute workers used per fire mask (block) applier, "
+                        "RIOS 2 only (i.e. 4)",
+                   default=1)
+
+    p.add_argument("-e", "--read_workers", type=int,
+                   help="Enter the number of RIOS read workers used per fire mask applier, RIOS 2 only (i.e. 2)",
+                   default=0)
+
+    p.add_argument("-k", "--block_size", type=int,
+                   help="Enter the RIOS block size in pixels used by the fire mask appliers (i.e. 1024)",
+                   default=None)
+
 
     cmd_args = p.parse_args()
 
@@ -412,77 +481,40 @@ def export_dir_folders_fn(export_dir_path, lsat_tile):
         dp0_tile_status_dir, dp0_zonal_stats_output_dir, dp0_mask_tile_status_dir, dp0_mask_zonal_stats_output_dir, \
         dp1_tile_status_dir, dp1_zonal_stats_output_dir, dp1_mask_tile_status_dir, dp1_mask_zonal_stats_output_dir
 
-def main_routine():
-    """" Description: This script determines which Landsat tile had the most non-null zonal statistics records per site
-    and files those plots (bare ground, all bands and interactive) into final output folders. """
-
-    # print('fcZonalStatsPipeline.py INITIATED.')
-    # read in the command arguments
-    cmd_args = get_cmd_args_fn()
-    data = cmd_args.data
-    tile_grid = cmd_args.tile_grid
-    export_dir = cmd_args.export_dir
-    lsat_dir = cmd_args.lsat_dir
-    no_data = int(cmd_args.no_data)
-    path = cmd_args.path
-    row = cmd_args.row
-    zone = cmd_args.zone
-    burn_dir = cmd_args.burn_dir
-    image_count = int(cmd_args.image_count)
-
-    # call the temporaryDir function.
-    temp_dir_path, final_user = temporary_dir_fn()
-    # call the tempDirFolders function.
-    prime_temp_grid_dir, prime_temp_buffer_dir, zonal_stats_ready_dir = temp_dir_folders_fn(temp_dir_path)
-    # call the exportFilepath function.
-    export_dir_path = export_file_path_fn(export_dir, final_user, path, row)
-    print("zonal_stats_ready_dir: ", zonal_stats_ready_dir)
-    # # create a list of variable subdirectories
-    # sub_dir_list = next(os.walk(lsat_dir))[1]
-
-    lsat_tile = str(path) + "_" + str(row)
-    #
-    # call the exportDirFolders function.
-    dbg_tile_status_dir, dbg_zonal_stats_output_dir, dbg_mask_tile_status_dir, dbg_mask_zonal_stats_output_dir, \
-        dbi_tile_status_dir, dbi_zonal_stats_output_dir, dbi_mask_tile_status_dir, dbi_mask_zonal_stats_output_dir, \
-        dp0_tile_status_dir, dp0_zonal_stats_output_dir, dp0_mask_tile_status_dir, dp0_mask_zonal_stats_output_dir, \
-        dp1_tile_status_dir, dp1_zonal_stats_output_dir, dp1_mask_tile_status_dir, \
-        dp1_mask_zonal_stats_output_dir = export_dir_folders_fn(export_dir_path, lsat_tile)
-
-
-    # export_dir_folders_fn(export_dir_path, lsat_tile)
-
-    #print("data: ", data)
-    import step1_3_project_buffer
-    geo_df2, crs_name = step1_3_project_buffer.main_routine(data, zone, export_dir_path, prime_temp_buffer_dir)
-
-    import step1_4_landsat_tile_grid_identify2
-    comp_geo_df, zonal_stats_ready_dir = step1_4_landsat_tile_grid_identify2.main_routine(
-        tile_grid, geo_df2, data, zone, export_dir_path, prime_temp_grid_dir)
+def claim_stage_fn(csv_file, stage):
+    """ Record that a (csv list, stage) pair is being run so that repeats within this run are skipped.
 
+    @param csv_file: string object containing the path to the Landsat tile image list (csv).
+    @param stage: string object containing the pipeline stage name (i.e. 'dp0_fire_mask').
+    @return: boolean object, True if the pair has not been run yet, False if it is a repeat that should be skipped.
+    """
 
-    print("zonal_stats_ready_dir: ", zonal_stats_ready_dir)
-    comp_geo_df.to_file(os.path.join(export_dir_path, "biomass_1ha.shp"))
-    print("comp_geo_df: ", comp_geo_df)
+    key = (os.path.normcase(os.path.abspath(csv_file)), stage)
+    with completed_stages_lock:
+        if key in completed_stages:
+            print("Stage already completed in this run, skipping: ", stage, csv_file)
+            return False
+        completed_stages.add(key)
 
-
-    tile = str(path) + str(row)
-    print("tile: ", tile)
-    geo_df3 = comp_geo_df[comp_geo_df["tile"] == tile]
-    print("geo_df3: ", geo_df3)
-    geo_df4 = geo_df3[["site_name", "tile", "geometry"]]
-    print("geodf4: ", geo_df4)
+    return True
 
 
-    geo_df4.reset_index(drop=True, inplace=True)
-    geo_df4['uid'] = geo_df4.index + 1
-
-    shapefile_path = os.path.join(export_dir_path, "biomass_1ha_{0}.shp".format(str(path) + "_" + str(row)))
-    geo_df4.to_file(os.path.join(export_dir_path, "biomass_1ha_{0}.shp".format(str(path) + "_" + str(row))),
-                    driver="ESRI Shapefile")
+def dp1_branch_fn(export_dir_path, temp_dir_path, zonal_stats_ready_dir, geo_df3, image_count, lsat_dir, path, row,
+                  zone, tile, burn_dir, shapefile_path, dp1_tile_status_dir, dp1_mask_tile_status_dir, workers,
+                  mask_jobs, mask_mode, listing_lock):
+    """ Run the DP1 product branch: list the imagery, calculate the zonal stats, apply the fire masks and calculate the
+    masked zonal stats.
 
-    print("Exported shapefile: ", shapefile_path)
+    @param mask_jobs: integer object containing the number of fire masks produced at the same time.
+    @param mask_mode: string object, 'raster' writes the fire masked images, 'memory' applies the masks in memory and
+    'dual' calculates the unmasked and the in memory masked zonal stats together.
+    @param listing_lock: threading.Lock object serialising the step1_5 listing scripts between concurrent branches.
+    """
 
+    # fire mask footprints are written to a branch specific temporary folder so concurrent branches do not collide.
+    fire_temp_dir_path = os.path.join(temp_dir_path, "dp1_fire")
+    if not os.path.isdir(fire_temp_dir_path):
+        os.makedirs(fire_temp_dir_path)
 
     # --------------------------------------------------- DP1 WORKING---------------------------------------------------
 
@@ -493,8 +525,9 @@ def main_routine():
 
     # call the step1_5_dp1_landsat_list.py script.
     import step1_5_dp1_landsat_list2
-    step1_5_dp1_landsat_list2.main_routine(
-        export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+    with listing_lock:
+        step1_5_dp1_landsat_list2.main_routine(
+            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
     # define the tile for processing directory.
     dp1_tile_for_processing_dir = (dp1_tile_status_dir + '\\dp1_for_processing')
@@ -514,27 +547,59 @@ def main_routine():
 
     if len(dp1_list_zonal_tile) >= 1:
         #
+        if mask_mode == "dual":
+            # the unmasked and fire masked zonal stats are calculated from a single read of each image.
+            import run_fire_scar_mask_lsat_dp1
+            import step1_6_dp1_zonal_stats
+            import step1_6_dp1_mask_zonal_stats
+            dual_zonal_stats_fn(dp1_list_zonal_tile, extension, run_fire_scar_mask_lsat_dp1, step1_6_dp1_zonal_stats,
+                                step1_6_dp1_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir, temp_dir_path,
+                                zonal_stats_ready_dir, no_data, dp1_zonal_stats_output,
+                                export_dir_path + '\\dp1_mask_zonal_stats', shapefile_path, workers)
+            return
+
         for csv_file in dp1_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(csv_file, "dp1_zonal_stats"):
+                continue
             print("csv_file: ", csv_file)
 
             # call the step1_6_dp1_zonal_stats.py script.
             import step1_6_dp1_zonal_stats
             dp1_output_zonal_stats, dp1_complete_tile, dp1_tile, dp1_temp_dir_bands = step1_6_dp1_zonal_stats.main_routine(
-                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp1_zonal_stats_output, shapefile_path, "dp1")
+                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp1_zonal_stats_output, shapefile_path, "dp1", workers)
 
 
         # -------------------------------------------------- DP1 fire ----------------------------------------------------
 
         print("dp1_list_zonal_tile: ", dp1_list_zonal_tile)
+        if mask_mode == "memory":
+            # the fire masks are applied in memory by the masked zonal stats, no mask images are written or listed.
+            import run_fire_scar_mask_lsat_dp1
+            import step1_6_dp1_mask_zonal_stats
+            memory_mask_zonal_stats_fn(dp1_list_zonal_tile, extension, run_fire_scar_mask_lsat_dp1,
+                                       step1_6_dp1_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir,
+                                       temp_dir_path, zonal_stats_ready_dir, no_data,
+                                       export_dir_path + '\\dp1_mask_zonal_stats', shapefile_path, workers)
+            return
+
+        # the fire mask jobs of every csv list are collected and run together (fire_mask_executor).
+        import run_fire_scar_mask_lsat_dp1
+        fire_mask_jobs = []
         for i in dp1_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(i, "dp1_fire_mask"):
+                continue
             print("Checking if there is a fire mask for: ", i)
-            import run_fire_scar_mask_lsat_dp1
-            run_fire_scar_mask_lsat_dp1.main_routine(i, zone, temp_dir_path, tile, burn_dir)
+            fire_mask_jobs.extend(run_fire_scar_mask_lsat_dp1.fire_mask_jobs_fn(
+                i, zone, fire_temp_dir_path, tile, burn_dir))
+        fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, mask_jobs)
 
             # call the step1_5_dp1_landsat_list.py script.
         import step1_5_dp1_landsat_list_fire_mask
-        step1_5_dp1_landsat_list_fire_mask.main_routine(
-            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+        with listing_lock:
+            step1_5_dp1_landsat_list_fire_mask.main_routine(
+                export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
         # define the tile for processing directory.
         dp1_mask_tile_for_processing_dir = (dp1_mask_tile_status_dir + '\\dp1_mask_for_processing')
@@ -558,12 +623,15 @@ def main_routine():
         if len(dp1_mask_list_zonal_tile) >= 1:
             #
             for csv_file in dp1_mask_list_zonal_tile:
+                # skip (csv list, stage) pairs that have already been completed in this run.
+                if not claim_stage_fn(csv_file, "dp1_mask_zonal_stats"):
+                    continue
                 print("csv_file: ", csv_file)
                 #call the step1_6_dp1_mask_zonal_stats.py script.
                 import step1_6_dp1_mask_zonal_stats
                 dp1_output_zonal_stats, dp1_complete_tile, dp1_tile, dp1_temp_dir_bands = step1_6_dp1_mask_zonal_stats.main_routine(
                     temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp1_mask_zonal_stats_output,
-                    shapefile_path, "dp1")
+                    shapefile_path, "dp1", workers)
 
         else:
             print("No dp1 mask images were located")
@@ -572,14 +640,32 @@ def main_routine():
         print("No dp1 images were located")
 
 
+def dp0_branch_fn(export_dir_path, temp_dir_path, zonal_stats_ready_dir, geo_df3, image_count, lsat_dir, path, row,
+                  zone, tile, burn_dir, shapefile_path, dp0_tile_status_dir, dp0_mask_tile_status_dir, workers,
+                  mask_jobs, mask_mode, listing_lock):
+    """ Run the DP0 product branch: list the imagery, calculate the zonal stats, apply the fire masks and calculate the
+    masked zonal stats.
+
+    @param mask_jobs: integer object containing the number of fire masks produced at the same time.
+    @param mask_mode: string object, 'raster' writes the fire masked images, 'memory' applies the masks in memory and
+    'dual' calculates the unmasked and the in memory masked zonal stats together.
+    @param listing_lock: threading.Lock object serialising the step1_5 listing scripts between concurrent branches.
+    """
+
+    # fire mask footprints are written to a branch specific temporary folder so concurrent branches do not collide.
+    fire_temp_dir_path = os.path.join(temp_dir_path, "dp0_fire")
+    if not os.path.isdir(fire_temp_dir_path):
+        os.makedirs(fire_temp_dir_path)
+
     # --------------------------------------------------- DP0 --------------------------------------------------
 
     extension = "dp0"
     no_data = 255.0
 
     import step1_5_dp0_landsat_list3
-    step1_5_dp0_landsat_list3.main_routine(
-        export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+    with listing_lock:
+        step1_5_dp0_landsat_list3.main_routine(
+            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
     # define the tile for processing directory.
     dp0_tile_for_processing_dir = (dp0_tile_status_dir + '\\dp0_for_processing')
@@ -599,72 +685,127 @@ def main_routine():
 
     if len(dp0_list_zonal_tile) >= 1:
         #
+        if mask_mode == "dual":
+            # the unmasked and fire masked zonal stats are calculated from a single read of each image.
+            import run_fire_scar_mask_lsat_dp0_zstdmask
+            import step1_6_dp0_zonal_stats3
+            import step1_6_dp0_mask_zonal_stats
+            dual_zonal_stats_fn(dp0_list_zonal_tile, extension, run_fire_scar_mask_lsat_dp0_zstdmask,
+                                step1_6_dp0_zonal_stats3, step1_6_dp0_mask_zonal_stats, zone, fire_temp_dir_path, tile,
+                                burn_dir, temp_dir_path, zonal_stats_ready_dir, no_data, dp0_zonal_stats_output,
+                                export_dir_path + '\\dp0_mask_zonal_stats', shapefile_path, workers)
+            return
+
         for csv_file in dp0_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(csv_file, "dp0_zonal_stats"):
+                continue
             print("csv_file: ", csv_file)
             # call the step1_6_dp0_zonal_stats.py script.
 
             print("dp0_zonal_stats_output: ", dp0_zonal_stats_output)
             import step1_6_dp0_zonal_stats3
             dp0_output_zonal_stats, dp0_complete_tile, dp0_tile, dp0_temp_dir_bands = step1_6_dp0_zonal_stats3.main_routine(
-                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp0_zonal_stats_output, shapefile_path, "dp0")
-
-            # ------------------------------------------- DP0 fire -----------------------------------------------------
-
-            # print("dp0_list_zonal_tile: ", dp0_list_zonal_tile)
-            for i in dp0_list_zonal_tile:
-                print("i of list: ", i)
-
-                import run_fire_scar_mask_lsat_dp0_zstdmask
-                run_fire_scar_mask_lsat_dp0_zstdmask.main_routine(i, zone, temp_dir_path, tile, burn_dir)
-
-            print("Run list of masks")
-
-            import step1_5_dp0_landsat_list_fire_mask
+                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp0_zonal_stats_output, shapefile_path, "dp0", workers)
+
+        # ------------------------------------------- DP0 fire -----------------------------------------------------
+
+        # print("dp0_list_zonal_tile: ", dp0_list_zonal_tile)
+        if mask_mode == "memory":
+            # the fire masks are applied in memory by the masked zonal stats, no mask images are written or listed.
+            import run_fire_scar_mask_lsat_dp0_zstdmask
+            import step1_6_dp0_mask_zonal_stats
+            memory_mask_zonal_stats_fn(dp0_list_zonal_tile, extension, run_fire_scar_mask_lsat_dp0_zstdmask,
+                                       step1_6_dp0_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir,
+                                       temp_dir_path, zonal_stats_ready_dir, no_data,
+                                       export_dir_path + '\\dp0_mask_zonal_stats', shapefile_path, workers)
+            return
+
+        # the fire mask jobs of every csv list are collected and run together (fire_mask_executor).
+        import run_fire_scar_mask_lsat_dp0_zstdmask
+        fire_mask_jobs = []
+        for i in dp0_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(i, "dp0_fire_mask"):
+                continue
+            print("i of list: ", i)
+
+            fire_mask_jobs.extend(run_fire_scar_mask_lsat_dp0_zstdmask.fire_mask_jobs_fn(
+                i, zone, fire_temp_dir_path, tile, burn_dir))
+        fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, mask_jobs)
+
+        print("Run list of masks")
+
+        import step1_5_dp0_landsat_list_fire_mask
+        with listing_lock:
             step1_5_dp0_landsat_list_fire_mask.main_routine(
                 export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
-            # define the tile for processing directory.
-            dp0_mask_tile_for_processing_dir = (dp0_mask_tile_status_dir + '\\dp0_mask_for_processing')
+        # define the tile for processing directory.
+        dp0_mask_tile_for_processing_dir = (dp0_mask_tile_status_dir + '\\dp0_mask_for_processing')
 
-            print('-' * 50)
-            print(dp0_mask_tile_for_processing_dir)
+        print('-' * 50)
+        print(dp0_mask_tile_for_processing_dir)
 
-            dp0_mask_zonal_stats_output = (export_dir_path + '\\dp0_mask_zonal_stats')
-            # print('dp0 zonal_stats_output: ', dp0_zonal_stats_output)
-            dp0_mask_list_zonal_tile = []
+        dp0_mask_zonal_stats_output = (export_dir_path + '\\dp0_mask_zonal_stats')
+        # print('dp0 zonal_stats_output: ', dp0_zonal_stats_output)
+        dp0_mask_list_zonal_tile = []
 
-            for file in glob.glob(dp0_mask_tile_for_processing_dir + '\\*.csv'):
-                print(file)
-                # append tile paths to list.
-                dp0_mask_list_zonal_tile.append(file)
+        for file in glob.glob(dp0_mask_tile_for_processing_dir + '\\*.csv'):
+            print(file)
+            # append tile paths to list.
+            dp0_mask_list_zonal_tile.append(file)
 
-            print("dp0 MASK: ", dp0_mask_list_zonal_tile)
+        print("dp0 MASK: ", dp0_mask_list_zonal_tile)
 
-            if len(dp0_mask_list_zonal_tile) >= 1:
-                #
-                for csv_file in dp0_mask_list_zonal_tile:
-                    print("csv_file: ", csv_file)
-                    # call the step1_6_dp0_zonal_stats.py script.
+        if len(dp0_mask_list_zonal_tile) >= 1:
+            #
+            for csv_file in dp0_mask_list_zonal_tile:
+                # skip (csv list, stage) pairs that have already been completed in this run.
+                if not claim_stage_fn(csv_file, "dp0_mask_zonal_stats"):
+                    continue
+                print("csv_file: ", csv_file)
+                # call the step1_6_dp0_zonal_stats.py script.
 
-                    print("dp0_mask_zonal_stats_output: ", dp0_mask_zonal_stats_output)
-                    import step1_6_dp0_mask_zonal_stats
-                    dp0_output_zonal_stats, dp0_complete_tile, dp0_tile, dp0_temp_dir_bands = step1_6_dp0_mask_zonal_stats.main_routine(
-                        temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp0_mask_zonal_stats_output, shapefile_path, "dp0")
+                print("dp0_mask_zonal_stats_output: ", dp0_mask_zonal_stats_output)
+                import step1_6_dp0_mask_zonal_stats
+                dp0_output_zonal_stats, dp0_complete_tile, dp0_tile, dp0_temp_dir_bands = step1_6_dp0_mask_zonal_stats.main_routine(
+                    temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dp0_mask_zonal_stats_output, shapefile_path,
+                    "dp0", workers)
 
-            else:
-                print("No dp0 images were located")
+        else:
+            print("No dp0 mask images were located")
 
     else:
         print("No dp0 images were located")
 
+
+def dbg_branch_fn(export_dir_path, temp_dir_path, zonal_stats_ready_dir, geo_df3, image_count, lsat_dir, path, row,
+                  zone, tile, burn_dir, shapefile_path, dbg_tile_status_dir, dbg_mask_tile_status_dir, workers,
+                  mask_jobs, mask_mode, listing_lock):
+    """ Run the DBG product branch: list the imagery, calculate the zonal stats, apply the fire masks and calculate the
+    masked zonal stats.
+
+    @param mask_jobs: integer object containing the number of fire masks produced at the same time.
+    @param mask_mode: string object, 'raster' writes the fire masked images, 'memory' applies the masks in memory and
+    'dual' calculates the unmasked and the in memory masked zonal stats together.
+    @param listing_lock: threading.Lock object serialising the step1_5 listing scripts between concurrent branches.
+    """
+
+    # fire mask footprints are written to a branch specific temporary folder so concurrent branches do not collide.
+    fire_temp_dir_path = os.path.join(temp_dir_path, "dbg_fire")
+    if not os.path.isdir(fire_temp_dir_path):
+        os.makedirs(fire_temp_dir_path)
+
     # ------------------------------------------------------ DBG -------------------------------------------------------
 
     extension = "dbg"
     no_data = 32767.0
 
     import step1_5_dbg_landsat_list3
-    step1_5_dbg_landsat_list3.main_routine(
-        export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+    with listing_lock:
+        step1_5_dbg_landsat_list3.main_routine(
+            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
     # define the tile for processing directory.
     dbg_tile_for_processing_dir = (dbg_tile_status_dir + '\\dbg_for_processing')
@@ -684,29 +825,61 @@ def main_routine():
 
     if len(dbg_list_zonal_tile) >= 1:
 
+        if mask_mode == "dual":
+            # the unmasked and fire masked zonal stats are calculated from a single read of each image.
+            import run_fire_scar_mask_lsat_dbg_zstdmask
+            import step1_6_dbg_zonal_stats3
+            import step1_6_dbg_mask_zonal_stats
+            dual_zonal_stats_fn(dbg_list_zonal_tile, extension, run_fire_scar_mask_lsat_dbg_zstdmask,
+                                step1_6_dbg_zonal_stats3, step1_6_dbg_mask_zonal_stats, zone, fire_temp_dir_path, tile,
+                                burn_dir, temp_dir_path, zonal_stats_ready_dir, no_data, dbg_zonal_stats_output,
+                                export_dir_path + '\\dbg_mask_zonal_stats', shapefile_path, workers)
+            return
+
         for csv_file in dbg_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(csv_file, "dbg_zonal_stats"):
+                continue
 
             # call the step1_6_dbg_zonal_stats.py script.
             print("csv_file: ", csv_file)
             import step1_6_dbg_zonal_stats3
             dbg_output_zonal_stats, dbg_complete_tile, dbg_tile, dbg_temp_dir_bands = step1_6_dbg_zonal_stats3.main_routine(
-                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbg_zonal_stats_output, shapefile_path, "dbg")
+                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbg_zonal_stats_output, shapefile_path, "dbg", workers)
 
         #  --------------------------------------------- dbg fire  -----------------------------------------------------
 
+        if mask_mode == "memory":
+            # the fire masks are applied in memory by the masked zonal stats, no mask images are written or listed.
+            import run_fire_scar_mask_lsat_dbg_zstdmask
+            import step1_6_dbg_mask_zonal_stats
+            memory_mask_zonal_stats_fn(dbg_list_zonal_tile, extension, run_fire_scar_mask_lsat_dbg_zstdmask,
+                                       step1_6_dbg_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir,
+                                       temp_dir_path, zonal_stats_ready_dir, no_data,
+                                       export_dir_path + '\\dbg_mask_zonal_stats', shapefile_path, workers)
+            return
+
+        # the fire mask jobs of every csv list are collected and run together (fire_mask_executor).
+        import run_fire_scar_mask_lsat_dbg_zstdmask
+        fire_mask_jobs = []
         for i in dbg_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(i, "dbg_fire_mask"):
+                continue
             print("Creating fire mask for dbg: ", i)
 
             print(i, zone, temp_dir_path, tile, burn_dir)
 
-            import run_fire_scar_mask_lsat_dbg_zstdmask
-            run_fire_scar_mask_lsat_dbg_zstdmask.main_routine(i, zone, temp_dir_path, tile, burn_dir)
-            print("created...")
+            fire_mask_jobs.extend(run_fire_scar_mask_lsat_dbg_zstdmask.fire_mask_jobs_fn(
+                i, zone, fire_temp_dir_path, tile, burn_dir))
+            print("queued...")
             print("-" * 50)
+        fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, mask_jobs)
 
         import step1_5_dbg_landsat_list_fire_mask
-        step1_5_dbg_landsat_list_fire_mask.main_routine(
-            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+        with listing_lock:
+            step1_5_dbg_landsat_list_fire_mask.main_routine(
+                export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
         # define the tile for processing directory.
         dbg_mask_tile_for_processing_dir = (dbg_mask_tile_status_dir + '\\dbg_mask_for_processing')
@@ -727,12 +900,15 @@ def main_routine():
         if len(dbg_mask_list_zonal_tile) >= 1:
 
             for csv_file in dbg_mask_list_zonal_tile:
+                # skip (csv list, stage) pairs that have already been completed in this run.
+                if not claim_stage_fn(csv_file, "dbg_mask_zonal_stats"):
+                    continue
                 # call the step1_6_dbg_zonal_stats.py script.
                 print("csv_file: ", csv_file)
                 import step1_6_dbg_mask_zonal_stats
                 dbg_output_zonal_stats, dbg_complete_tile, dbg_tile, dbg_temp_dir_bands = step1_6_dbg_mask_zonal_stats.main_routine(
                     temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbg_mask_zonal_stats_output, shapefile_path,
-                    "dbg")
+                    "dbg", workers)
 
         else:
             print("No dbg fire mask images were located")
@@ -741,14 +917,33 @@ def main_routine():
     else:
         print("No dbg images were located")
 
+
+def dbi_branch_fn(export_dir_path, temp_dir_path, zonal_stats_ready_dir, geo_df3, image_count, lsat_dir, path, row,
+                  zone, tile, burn_dir, shapefile_path, dbi_tile_status_dir, dbi_mask_tile_status_dir, workers,
+                  mask_jobs, mask_mode, listing_lock):
+    """ Run the DBI product branch: list the imagery, calculate the zonal stats, apply the fire masks and calculate the
+    masked zonal stats.
+
+    @param mask_jobs: integer object containing the number of fire masks produced at the same time.
+    @param mask_mode: string object, 'raster' writes the fire masked images, 'memory' applies the masks in memory and
+    'dual' calculates the unmasked and the in memory masked zonal stats together.
+    @param listing_lock: threading.Lock object serialising the step1_5 listing scripts between concurrent branches.
+    """
+
+    # fire mask footprints are written to a branch specific temporary folder so concurrent branches do not collide.
+    fire_temp_dir_path = os.path.join(temp_dir_path, "dbi_fire")
+    if not os.path.isdir(fire_temp_dir_path):
+        os.makedirs(fire_temp_dir_path)
+
     # # ---------------------------------------------------- DBI --------------------------------------------------------
 
     extension = "dbi"
     no_data = 32767.0
 
     import step1_5_dbi_landsat_list
-    step1_5_dbi_landsat_list.main_routine(
-        export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+    with listing_lock:
+        step1_5_dbi_landsat_list.main_routine(
+            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
     # define the tile for processing directory.
     dbi_tile_for_processing_dir = (dbi_tile_status_dir + '\\dbi_for_processing')
@@ -773,22 +968,54 @@ def main_routine():
 
     if len(dbi_list_zonal_tile) >= 1:
 
+        if mask_mode == "dual":
+            # the unmasked and fire masked zonal stats are calculated from a single read of each image.
+            import run_fire_scar_mask_lsat_dbi_v2
+            import step1_6_dbi_zonal_stats
+            import step1_6_dbi_mask_zonal_stats
+            dual_zonal_stats_fn(dbi_list_zonal_tile, extension, run_fire_scar_mask_lsat_dbi_v2, step1_6_dbi_zonal_stats,
+                                step1_6_dbi_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir, temp_dir_path,
+                                zonal_stats_ready_dir, no_data, dbi_zonal_stats_output,
+                                export_dir_path + '\\dbi_mask_zonal_stats', shapefile_path, workers)
+            return
+
         for csv_file in dbi_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(csv_file, "dbi_zonal_stats"):
+                continue
             # call the step1_6_dbi_zonal_stats.py script.
             print("csv_file: ", csv_file)
             import step1_6_dbi_zonal_stats
             dbi_output_zonal_stats, dbi_complete_tile, dbi_tile, dbi_temp_dir_bands = step1_6_dbi_zonal_stats.main_routine(
-                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbi_zonal_stats_output, shapefile_path, "dbi")
+                temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbi_zonal_stats_output, shapefile_path, "dbi", workers)
 
         #  ---------------------------------------------------- dbi fire  -------------------------------------------
 
-        for i in dbi_list_zonal_tile:
+        if mask_mode == "memory":
+            # the fire masks are applied in memory by the masked zonal stats, no mask images are written or listed.
             import run_fire_scar_mask_lsat_dbi_v2
-            run_fire_scar_mask_lsat_dbi_v2.main_routine(i, zone, temp_dir_path, tile, burn_dir)
+            import step1_6_dbi_mask_zonal_stats
+            memory_mask_zonal_stats_fn(dbi_list_zonal_tile, extension, run_fire_scar_mask_lsat_dbi_v2,
+                                       step1_6_dbi_mask_zonal_stats, zone, fire_temp_dir_path, tile, burn_dir,
+                                       temp_dir_path, zonal_stats_ready_dir, no_data,
+                                       export_dir_path + '\\dbi_mask_zonal_stats', shapefile_path, workers)
+            return
+
+        # the fire mask jobs of every csv list are collected and run together (fire_mask_executor).
+        import run_fire_scar_mask_lsat_dbi_v2
+        fire_mask_jobs = []
+        for i in dbi_list_zonal_tile:
+            # skip (csv list, stage) pairs that have already been completed in this run.
+            if not claim_stage_fn(i, "dbi_fire_mask"):
+                continue
+            fire_mask_jobs.extend(run_fire_scar_mask_lsat_dbi_v2.fire_mask_jobs_fn(
+                i, zone, fire_temp_dir_path, tile, burn_dir))
+        fire_mask_executor.run_fire_mask_jobs_fn(fire_mask_jobs, mask_jobs)
 
         import step1_5_dbi_landsat_list_fire_mask
-        step1_5_dbi_landsat_list_fire_mask.main_routine(
-            export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
+        with listing_lock:
+            step1_5_dbi_landsat_list_fire_mask.main_routine(
+                export_dir_path, geo_df3, image_count, lsat_dir, path, row, zone, extension)
 
         # define the tile for processing directory.
         dbi_mask_tile_for_processing_dir = (dbi_mask_tile_status_dir + '\\dbi_mask_for_processing')
@@ -810,12 +1037,15 @@ def main_routine():
         if len(dbi_mask_list_zonal_tile) >= 1:
 
             for csv_file in dbi_mask_list_zonal_tile:
+                # skip (csv list, stage) pairs that have already been completed in this run.
+                if not claim_stage_fn(csv_file, "dbi_mask_zonal_stats"):
+                    continue
                 # call the step1_6_dil_zonal_stats.py script.
                 print("csv_file: ", csv_file)
                 import step1_6_dbi_mask_zonal_stats
                 dbi_output_zonal_stats, dbi_complete_tile, dbi_tile, dbi_temp_dir_bands = step1_6_dbi_mask_zonal_stats.main_routine(
                     temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, dbi_mask_zonal_stats_output, shapefile_path,
-                    "dbi")
+                    "dbi", workers)
 
         else:
             print("No dbi images were located")
@@ -824,7 +1054,193 @@ def main_routine():
         print("No dbi images were located")
 
 
+def memory_mask_zonal_stats_fn(csv_files, extension, fire_mask_module, mask_zonal_stats_module, zone,
+                               fire_temp_dir_path, tile, burn_dir, temp_dir_path, zonal_stats_ready_dir, no_data,
+                               mask_zonal_stats_output, shapefile_path, workers):
+    """ Calculate the masked zonal stats of the unmasked csv image lists of a product, the fire masks of each list
+    (fire_mask_jobs_fn) are applied in memory to the site pixels of the original images.
+
+    @param csv_files: list object containing the paths to the unmasked csv image lists.
+    @param extension: string object containing the product (i.e. 'dp1').
+    @param fire_mask_module: module object of the run_fire_scar_mask_lsat script of the product.
+    @param mask_zonal_stats_module: module object of the step1_6 mask zonal stats script of the product.
+    @param mask_zonal_stats_output: string object containing the path to the masked zonal stats output directory.
+    """
+
+    if not os.path.isdir(mask_zonal_stats_output):
+        os.makedirs(mask_zonal_stats_output)
+
+    for csv_file in csv_files:
+        # skip (csv list, stage) pairs that have already been completed in this run.
+        if not claim_stage_fn(csv_file, extension + "_mask_zonal_stats"):
+            continue
+
+        fire_mask_jobs = fire_mask_module.fire_mask_jobs_fn(csv_file, zone, fire_temp_dir_path, tile, burn_dir)
+        if not fire_mask_jobs:
+            print("No {0} fire masks for: ".format(extension), csv_file)
+            continue
+
+        print("csv_file (fire masks in memory): ", csv_file)
+        mask_zonal_stats_module.main_routine(temp_dir_path, zonal_stats_ready_dir, no_data, csv_file,
+                                             mask_zonal_stats_output, shapefile_path, extension, workers,
+                                             fire_mask_jobs)
+
+
+def dual_zonal_stats_fn(csv_files, extension, fire_mask_module, zonal_stats_module, mask_zonal_stats_module, zone,
+                        fire_temp_dir_path, tile, burn_dir, temp_dir_path, zonal_stats_ready_dir, no_data,
+                        zonal_stats_output, mask_zonal_stats_output, shapefile_path, workers):
+    """ Calculate the unmasked and the fire masked zonal stats of the unmasked csv image lists of a product from a
+    single read of each image, the fire masks of each list (fire_mask_jobs_fn) are applied in memory.
+
+    @param csv_files: list object containing the paths to the unmasked csv image lists.
+    @param extension: string object containing the product (i.e. 'dp1').
+    @param fire_mask_module: module object of the run_fire_scar_mask_lsat script of the product.
+    @param zonal_stats_module: module object of the step1_6 zonal stats script of the product.
+    @param mask_zonal_stats_module: module object of the step1_6 mask zonal stats script of the product.
+    @param zonal_stats_output: string object containing the path to the zonal stats output directory.
+    @param mask_zonal_stats_output: string object containing the path to the masked zonal stats output directory.
+    """
+
+    if not os.path.isdir(mask_zonal_stats_output):
+        os.makedirs(mask_zonal_stats_output)
+
+    for csv_file in csv_files:
+        # skip (csv list, stage) pairs that have already been completed in this run.
+        if not claim_stage_fn(csv_file, extension + "_zonal_stats"):
+            continue
+
+        fire_mask_jobs = fire_mask_module.fire_mask_jobs_fn(csv_file, zone, fire_temp_dir_path, tile, burn_dir)
+
+        print("csv_file (unmasked and fire masked zonal stats): ", csv_file)
+        zonal_stats_module.main_routine(temp_dir_path, zonal_stats_ready_dir, no_data, csv_file, zonal_stats_output,
+                                        shapefile_path, extension, workers, fire_mask_jobs)
+
+        if not fire_mask_jobs:
+            print("No {0} fire masks for: ".format(extension), csv_file)
+        elif claim_stage_fn(csv_file, extension + "_mask_zonal_stats"):
+            # the masked results calculated with the unmasked zonal stats are used, no image is read again.
+            mask_zonal_stats_module.main_routine(temp_dir_path, zonal_stats_ready_dir, no_data, csv_file,
+                                                 mask_zonal_stats_output, shapefile_path, extension, workers,
+                                                 fire_mask_jobs)
+
+
+def run_product_branches_fn(branch_tasks, branch_workers):
+    """ Run the independent product branches as concurrent tasks.
+
+    @param branch_tasks: list object containing (name, branch function, argument tuple) for each product branch.
+    @param branch_workers: integer object containing the maximum number of branches running at the same time.
+    """
+
+    branch_workers = max(1, min(int(branch_workers), len(branch_tasks)))
+    print("Running {0} product branches with a concurrency limit of {1}".format(len(branch_tasks), branch_workers))
+
+    with ThreadPoolExecutor(max_workers=branch_workers) as executor:
+        futures = dict((executor.submit(branch_fn, *branch_args), name) for name, branch_fn, branch_args in branch_tasks)
+
+        for future in as_completed(futures):
+            # re-raise any exception from the branch in the main thread.
+            future.result()
+            print("Product branch complete: ", futures[future])
+
+
+def main_routine():
+    """" Description: This script determines which Landsat tile had the most non-null zonal statistics records per site
+    and files those plots (bare ground, all bands and interactive) into final output folders. """
+
+    # print('fcZonalStatsPipeline.py INITIATED.')
+    # read in the command arguments
+    cmd_args = get_cmd_args_fn()
+    data = cmd_args.data
+    tile_grid = cmd_args.tile_grid
+    export_dir = cmd_args.export_dir
+    lsat_dir = cmd_args.lsat_dir
+    no_data = int(cmd_args.no_data)
+    path = cmd_args.path
+    row = cmd_args.row
+    zone = cmd_args.zone
+    burn_dir = cmd_args.burn_dir
+    image_count = int(cmd_args.image_count)
+    workers = int(cmd_args.workers)
+    branch_workers = int(cmd_args.branch_workers)
+    mask_jobs = int(cmd_args.mask_jobs)
+    mask_mode = cmd_args.mask_mode
+
+    # RIOS block processing settings of every fire mask applier call in this run
+    fire_mask_engine.set_rios_concurrency_fn(cmd_args.mask_workers, cmd_args.read_workers, cmd_args.block_size)
+
+    # call the temporaryDir function.
+    temp_dir_path, final_user = temporary_dir_fn()
+    # call the tempDirFolders function.
+    prime_temp_grid_dir, prime_temp_buffer_dir, zonal_stats_ready_dir = temp_dir_folders_fn(temp_dir_path)
+    # call the exportFilepath function.
+    export_dir_path = export_file_path_fn(export_dir, final_user, path, row)
+    print("zonal_stats_ready_dir: ", zonal_stats_ready_dir)
+    # # create a list of variable subdirectories
+    # sub_dir_list = next(os.walk(lsat_dir))[1]
+
+    lsat_tile = str(path) + "_" + str(row)
+    #
+    # call the exportDirFolders function.
+    dbg_tile_status_dir, dbg_zonal_stats_output_dir, dbg_mask_tile_status_dir, dbg_mask_zonal_stats_output_dir, \
+        dbi_tile_status_dir, dbi_zonal_stats_output_dir, dbi_mask_tile_status_dir, dbi_mask_zonal_stats_output_dir, \
+        dp0_tile_status_dir, dp0_zonal_stats_output_dir, dp0_mask_tile_status_dir, dp0_mask_zonal_stats_output_dir, \
+        dp1_tile_status_dir, dp1_zonal_stats_output_dir, dp1_mask_tile_status_dir, \
+        dp1_mask_zonal_stats_output_dir = export_dir_folders_fn(export_dir_path, lsat_tile)
+
+
+    # export_dir_folders_fn(export_dir_path, lsat_tile)
+
+    #print("data: ", data)
+    import step1_3_project_buffer
+    geo_df2, crs_name = step1_3_project_buffer.main_routine(data, zone, export_dir_path, prime_temp_buffer_dir)
+
+    import step1_4_landsat_tile_grid_identify2
+    comp_geo_df, zonal_stats_ready_dir = step1_4_landsat_tile_grid_identify2.main_routine(
+        tile_grid, geo_df2, data, zone, export_dir_path, prime_temp_grid_dir)
+
+
+    print("zonal_stats_ready_dir: ", zonal_stats_ready_dir)
+    comp_geo_df.to_file(os.path.join(export_dir_path, "biomass_1ha.shp"))
+    print("comp_geo_df: ", comp_geo_df)
+
+
+    tile = str(path) + str(row)
+    print("tile: ", tile)
+    geo_df3 = comp_geo_df[comp_geo_df["tile"] == tile]
+    print("geo_df3: ", geo_df3)
+    geo_df4 = geo_df3[["site_name", "tile", "geometry"]]
+    print("geodf4: ", geo_df4)
+
+
+    geo_df4.reset_index(drop=True, inplace=True)
+    geo_df4['uid'] = geo_df4.index + 1
+
+    shapefile_path = os.path.join(export_dir_path, "biomass_1ha_{0}.shp".format(str(path) + "_" + str(row)))
+    geo_df4.to_file(os.path.join(export_dir_path, "biomass_1ha_{0}.shp".format(str(path) + "_" + str(row))),
+                    driver="ESRI Shapefile")
+
+    print("Exported shapefile: ", shapefile_path)
+
+
+    # -------------------------------------------------- Product branches ---------------------------------------------
+
+    # the dp1, dp0, dbg and dbi branches read different products and write to different output folders, each branch
+    # (list -> zonal stats -> fire mask -> masked zonal stats) is run as a concurrent task.
+    listing_lock = threading.Lock()
+    branch_args = (export_dir_path, temp_dir_path, zonal_stats_ready_dir, geo_df3, image_count, lsat_dir, path, row,
+                   zone, tile, burn_dir, shapefile_path)
+
+    branch_tasks = [
+        ("dp1", dp1_branch_fn, branch_args + (dp1_tile_status_dir, dp1_mask_tile_status_dir, workers, mask_jobs,
+                                             mask_mode, listing_lock)),
+        ("dp0", dp0_branch_fn, branch_args + (dp0_tile_status_dir, dp0_mask_tile_status_dir, workers, mask_jobs,
+                                             mask_mode, listing_lock)),
+        ("dbg", dbg_branch_fn, branch_args + (dbg_tile_status_dir, dbg_mask_tile_status_dir, workers, mask_jobs,
+                                             mask_mode, listing_lock)),
+        ("dbi", dbi_branch_fn, branch_args + (dbi_tile_status_dir, dbi_mask_tile_status_dir, workers, mask_jobs,
+                                             mask_mode, listing_lock))]
 
+    run_product_branches_fn(branch_tasks, branch_workers)
 
     # ---------------------------------------------------- Clean up ----------------------------------------------------
 
@@ -10,13 +10,19 @@ which Landsat tile.
 
 Step 1: Divides the Landsat tile grid into two based on its WGS zonal position.
 
-Step 2: Applies a negative 4000m buffer to each Landsat tile to reduce noise, and concatenates them into two shapefiles
-(projectedDF2 and projectedDF3)
+Step 2: Applies a negative 3000m buffer (TILE_BUFFER_DISTANCE) to each Landsat tile to reduce noise.
 
-Step 3: Using GeoPandas, preforms a spatial overlay (identify) is preformed between the Landsat Tile Grid and the
-completed ODK sites shapefile to determine which Landsat tile should be used to derive zonal statistics from, on a site
-by site basis. Following this, the identity shapefiles are concatenated and two outputs are created
-(comp_geo_df_52 and comp_geo_df_53).
+Step 3: Using GeoPandas, identifies which buffered Landsat tile(s) each completed ODK site overlays to determine which
+Landsat tile should be used to derive zonal statistics from, on a site by site basis, and exports the sites of each
+tile (tile_by_tile.shp).
+
+The main routine buffers the tiles in memory (buffer_tile_grid_fn) and assigns every site to its tiles with a single
+spatial join (spatial_join_tile_fn), the spatial index (STRtree) of the buffered tiles is queried with all of the site
+polygons at once instead of overlaying the sites with one tile shapefile at a time.
+
+The buffered tile grids of the three UTM zones are cached (tile_grid_cache) keyed by the hash of the tile grid files,
+the zone selection and projection rule version (TILE_GRID_VERSION) and the buffer distance, later runs load the cached
+grids instead of reprojecting and buffering the tile grid again.
 
 
 Author: Rob McGregor
@@ -55,15 +61,25 @@ SOFTWARE.
 
 # Import modules
 from __future__ import print_function, division
-import os
 import geopandas as gpd
-import pandas as pd
-import glob
 import warnings
 import sys
+from collections import OrderedDict
+from shapely.ops import unary_union
+import tile_grid_cache
 
 warnings.filterwarnings("ignore")
 
+# negative buffer (m) applied to each Landsat tile to reduce noise along the tile edges
+TILE_BUFFER_DISTANCE = -3000
+
+# version of the zone selection and projection rules (select_tile_grid_fn) and the tile buffer (buffer_tile_grid_fn),
+# part of the tile grid cache key: increase it whenever either function changes so stale cached grids are not loaded
+TILE_GRID_VERSION = 1
+
+# zone code -> standardised crs information of the projected tile grid
+ZONE_CRS_NAMES = OrderedDict([("2", 'WGS84z52'), ("3", 'WGS84z53'), ("4", 'WGS84z54')])
+
 
 def project_tile_grid_fn(tile_grid, prime_temp_grid_dir):
     """ Subset and re-project the Landsat tile grid into WGS zone 52 and 53.
@@ -77,6 +93,25 @@ def project_tile_grid_fn(tile_grid, prime_temp_grid_dir):
 
     # read in Landsat tile grid vector dataset
     tile_grid = gpd.read_file(tile_grid)
+    # call the select_tile_grid_fn function.
+    tile_grid_wgs52, tile_grid_wgs53, tile_grid_wgs54 = select_tile_grid_fn(tile_grid)
+
+    # export shapefiles  
+    tile_grid_wgs52.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tile_grid_wgs52.shp')
+    tile_grid_wgs53.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tileGridWgs53.shp')
+    tile_grid_wgs54.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tileGridWgs54.shp')
+
+    return tile_grid_wgs52, tile_grid_wgs53, tile_grid_wgs54
+
+
+def select_tile_grid_fn(tile_grid):
+    """ Subset and re-project the Landsat tile grid geo-dataframe into WGS zone 52, 53 and 54 in memory.
+
+    @param tile_grid: geo-dataframe containing the Landsat tile locations and names.
+    @return tile_grid_wgs52: geo-dataframe object filtered based on utm zone from the Landsat tile grid.
+    @return tile_grid_wgs53: geo-dataframe object filtered based on utm zone from the Landsat tile grid.
+    @return tile_grid_wgs54: geo-dataframe object filtered based on utm zone from the Landsat tile grid.
+    """
     # subset dataset into WGSz52 and WGSz53
     # tile_grid_54_selection = tile_grid.loc[tile_grid['WRSPR'] == 100_074]
     # tile_grid_53_selection = tile_grid.loc[(tile_grid['WRSPR'] <= 104_073) & ((tile_grid['WRSPR'] != 103_078) |(tile_grid['WRSPR'] != 100_074))]
@@ -91,156 +126,121 @@ def project_tile_grid_fn(tile_grid, prime_temp_grid_dir):
     tile_grid_wgs53 = tile_grid_53_selection.to_crs(epsg=32753)
     tile_grid_wgs54 = tile_grid_54_selection.to_crs(epsg=32754)
 
-    # export shapefiles  
-    tile_grid_wgs52.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tile_grid_wgs52.shp')
-    tile_grid_wgs53.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tileGridWgs53.shp')
-    tile_grid_wgs54.to_file(driver='ESRI Shapefile', filename=proj_tile_grid_sep_dir + '\\tileGridWgs54.shp')
-
     return tile_grid_wgs52, tile_grid_wgs53, tile_grid_wgs54
 
 
-def negative_buffer_fn(projected_df, prime_temp_grid_dir, crs_name):
-    """ Separate each Landsat tile, apply a negative buffer (4000m) and export the shapefiles.
+def tile_name_fn(wrspr):
+    """ Convert a Landsat tile WRSPR value (i.e. 101077 or 99077) to the tile name used in the file names (101077 or
+    099077).
 
-    @param projected_df: geo-dataframe containing the filtered version of the Landsat tile grid.
-    @param prime_temp_grid_dir: string object containing the path to the temporary directory.
-    @param crs_name: string object containing the standardised crs information to be used as part of the file/sub-dir.
-    @return tile_grid_temp_dir: string object containing the path to sub-directory tile_grid/crs_name.
-    @return crs_name: string object containing the standardised crs information to be used as part of the file name.
+    @param wrspr: integer object containing the Landsat tile WRSPR value.
+    @return tile: string object containing the six digit tile name.
     """
-    tile_grid_temp_dir = prime_temp_grid_dir + '\\tile_grid\\' + crs_name
-    os.makedirs(tile_grid_temp_dir)
 
-    # Loop through the unique values within the projected_df feature: WRSPR
-    for landsatTile in projected_df.WRSPR.unique():
-        # subset the projected_df geoDataFrame based on the unique Landsat tile variable.
-        projected_df2 = projected_df.loc[projected_df.WRSPR == landsatTile]
+    return '{0:06d}'.format(int(wrspr))
+
 
-        # apply a negative 4000m buffer from each Landsat tile to mask the tile images at a later point.
-        #todo change back to -4000 buff01 misssing in 106_09
-        projected_df3 = projected_df2.buffer(-3000)
+def buffer_tile_grid_fn(projected_df, buffer_distance=TILE_BUFFER_DISTANCE):
+    """ Apply a negative buffer to every Landsat tile of a projected tile grid in memory.
 
-        # export shapefile.
-        projected_df3.to_file(driver='ESRI Shapefile',
-                              filename=tile_grid_temp_dir + '\\' + str(landsatTile) + '_NegBuffer_' + crs_name + '.shp')
+    @param projected_df: geo-dataframe containing the filtered version of the Landsat tile grid.
+    @param buffer_distance: integer object containing the buffer distance (m) applied to each tile.
+    @return buffer_df: geo-dataframe containing the tile name (tile) and the buffered geometry of each tile.
+    """
 
-    return tile_grid_temp_dir, crs_name
+    buffer_df = gpd.GeoDataFrame({'tile': [tile_name_fn(wrspr) for wrspr in projected_df.WRSPR]},
+                                 geometry=projected_df.geometry.buffer(buffer_distance).values, crs=projected_df.crs)
 
+    # tiles removed entirely by the buffer can not contain a site
+    return buffer_df[~buffer_df.geometry.is_empty].reset_index(drop=True)
 
-def concatenate_df_fn(prime_temp_grid_dir, tile_grid_temp_dir, crs_name):
-    """ Create one geoDataFrame (comp_tile_geo_df) containing all negatively buffered Landsat tiles identified as
-    overlaying an odk 1ha site within their respective WGS84 zones.
 
-    @param prime_temp_grid_dir: string object containing the path to the temporary directory.
-    @param tile_grid_temp_dir: string object containing the path to sub-directory tile_grid/crs_name.
-    @param crs_name: string object containing the standardised crs information to be used as part of the file/sub-dir.
-    @return comp_tile_geo_df: geo-dataframe produced from all located shapefiles.
-    @return concat_tile_grid_temp_dir: string object containing the path to the export temporary sub-directory
-    @return crs_name: string object containing the standardised crs information to be used as part of the file/sub-dir.
+def zone_tile_grids_fn(tile_grid, buffer_distance=TILE_BUFFER_DISTANCE):
+    """ Project the Landsat tile grid into each UTM zone and apply the negative buffer to the tiles of each zone.
+
+    @param tile_grid: string object containing the path to the Landsat tile grid vector dataset.
+    @param buffer_distance: integer object containing the buffer distance (m) applied to each tile.
+    @return tile_grids: dictionary object {crs_name: buffered geo-dataframe (buffer_tile_grid_fn)}.
     """
-    # Create two folders for outputs
-    concat_tile_grid_temp_dir = prime_temp_grid_dir + '\\concat_tile_grid\\' + crs_name
-    os.makedirs(concat_tile_grid_temp_dir)
 
-    # create an empty list     
-    list_df = []
+    projected_dfs = select_tile_grid_fn(gpd.read_file(tile_grid))
 
-    for landsat_tile_shp in glob.glob(tile_grid_temp_dir + '\\*.shp'):
-        geo_df = gpd.read_file(landsat_tile_shp)
-        list_df.append(geo_df)
+    return OrderedDict((crs_name, buffer_tile_grid_fn(projected_df, buffer_distance))
+                       for crs_name, projected_df in zip(ZONE_CRS_NAMES.values(), projected_dfs))
 
-    if len(list_df) >= 2:
 
-        comp_tile_geo_df = gpd.GeoDataFrame(pd.concat(list_df, ignore_index=True), crs=list_df[0].crs)
-        comp_tile_geo_df.to_file(concat_tile_grid_temp_dir + '\\comp_geo_df_buffer_' + crs_name + '.shp')
+def cached_zone_tile_grids_fn(tile_grid, buffer_distance=TILE_BUFFER_DISTANCE, cache_dir=None):
+    """ Return the buffered tile grids of each UTM zone (zone_tile_grids_fn) from the tile grid cache.
 
-    elif len(list_df) == 1:
+    @param tile_grid: string object containing the path to the Landsat tile grid vector dataset.
+    @param buffer_distance: integer object containing the buffer distance (m) applied to each tile.
+    @param cache_dir: string object containing the path to the cache directory (default: tile_grid_cache).
+    @return tile_grids: dictionary object {crs_name: buffered geo-dataframe (buffer_tile_grid_fn)}.
+    """
 
-        comp_tile_geo_df = gpd.read_file(landsat_tile_shp, ignore_index=True)
-        comp_tile_geo_df.to_file(concat_tile_grid_temp_dir + '\\comp_geo_df_buffer_' + crs_name + '.shp')
-    else:
-        print('There are no files: concatenate_df_fn')
-        sys.exit(1)
-        comp_tile_geo_df = None
+    return tile_grid_cache.cached_tile_grids_fn(tile_grid, ZONE_CRS_NAMES.values(), buffer_distance,
+                                                TILE_GRID_VERSION, zone_tile_grids_fn, cache_dir)
 
-    return comp_tile_geo_df, concat_tile_grid_temp_dir, crs_name
 
+def polygon_part_fn(geometry):
+    """ Return the polygon part of an intersection, the lines and points of a geometry collection (sites touching the
+    edge of a tile) are removed as they are by the identity overlay.
 
-def identity_df_fn(tile_grid_temp_dir, prime_temp_grid_dir, odk_geo_1ha_df, crs_name):
-    """ Identify which site spatially overlays which Landsat tile and output a shapefile with the tile name in the
-    filename.
+    @param geometry: shapely geometry object.
+    @return geometry: shapely geometry object.
+    """
 
-    @param tile_grid_temp_dir: string object containing the path to sub-directory tile_grid/crs_name.
-    @param prime_temp_grid_dir: string object containing the path to the temporary directory.
-    @param odk_geo_1ha_df:
-    @param crs_name: string object containing the standardised crs information to be used as part of the file/sub-dir.
-    @return identify_tile_grid_temp_dir: string object containing the path to sub-directory identify_tile_grid\crs_name.
+    if geometry.geom_type == 'GeometryCollection':
+        geometry = unary_union([part for part in geometry.geoms if part.geom_type in ('Polygon', 'MultiPolygon')])
+
+    return geometry
+
+
+def spatial_join_tile_fn(buffer_df, odk_geo_1ha_df):
+    """ Identify which site spatially overlays which buffered Landsat tile with a single spatial join, the spatial
+    index (STRtree) of the buffered tiles is queried with all of the site polygons at once. The site tile pairs are
+    returned in memory.
+
+    @param buffer_df: geo-dataframe returned by buffer_tile_grid_fn.
+    @param odk_geo_1ha_df: geo-dataframe containing the 1ha site polygons (same crs as buffer_df).
+    @return comp_geo_df: geo-dataframe containing the site attributes, the tile name (tile) and the part of the site
+    within the buffered tile (geometry) of each site tile pair, ordered by tile.
     """
-    identify_tile_grid_temp_dir = prime_temp_grid_dir + '\\identify_tile_grid\\' + crs_name
-    os.makedirs(identify_tile_grid_temp_dir)
 
-    # create an empty list
-    list_df = []
+    site_df = odk_geo_1ha_df.drop(columns=['tile'], errors='ignore').reset_index(drop=True)
+    join_df = gpd.sjoin(site_df, buffer_df, how='inner', predicate='intersects')
+    join_df = join_df.sort_values(['tile'], kind='mergesort')
 
-    for file in glob.glob(tile_grid_temp_dir + '\\*.shp'):
-        # Extract Landsat tile name
-        tile = str(file[-29:-23])
-        # code_str = str(code)
-        clean_tile = tile.replace('\\', '0')
-        # Append the open geo_df to a list.
-        geo_df = gpd.read_file(file)
-        list_df.append(geo_df)
-        intersect_df = gpd.overlay(geo_df, odk_geo_1ha_df, how='identity')
-        intersect_df.to_file(identify_tile_grid_temp_dir + '\\' + clean_tile + '_identity_' + crs_name + '.shp')
+    # clip each site to its buffered tile, as the identity overlay does.
+    tile_geometry = buffer_df.geometry.values[join_df['index_right'].values]
+    geometry = join_df.geometry.values.intersection(tile_geometry)
+    geometry = gpd.GeoSeries(geometry, crs=site_df.crs).apply(polygon_part_fn)
 
-    return identify_tile_grid_temp_dir
+    comp_geo_df = gpd.GeoDataFrame(join_df.drop(columns=['index_right', join_df.geometry.name]).reset_index(drop=True),
+                                   geometry=geometry.values, crs=site_df.crs)
+    comp_geo_df = comp_geo_df[comp_geo_df.geometry.area > 0].reset_index(drop=True)
 
+    print("site tile pairs: ", len(comp_geo_df))
 
-def concatenate_tile_df_fn(zonal_stats_ready_dir, identify_tile_grid_temp_dir, prime_temp_grid_dir, crs_name):
-    """ Create a geoDataFrame for all of the shapefiles created in the identity_df_fn function through concatenation.
+    return comp_geo_df
+
+
+def tile_sites_to_file_fn(zonal_stats_ready_dir, comp_geo_df):
+    """ Export the sites of each tile (site_name, tile and uid) to a shapefile (tile_by_tile.shp).
 
     @param zonal_stats_ready_dir: string object containing the path to a temporary sub-directory
-    prime_temp_grid_dir\zonal_stats_ready\crs_name.
-    @param identify_tile_grid_temp_dir: string object containing the path to sub-directory identify_tile_grid\crs_name.
-    @param prime_temp_grid_dir: string object containing the path to the temporary directory.
-    @param crs_name: string object containing the standardised crs information to be used as part of the file/sub-dir.
-    @return comp_geo_df: geo-dataframe
+    prime_temp_grid_dir\zonal_stats_ready.
+    @param comp_geo_df: geo-dataframe containing the site_name, tile and geometry of each site tile pair.
     """
 
-    concat_identity_tile_grid_dir = prime_temp_grid_dir + '\\concat_identity_tile_grid\\' + crs_name
-    os.makedirs(concat_identity_tile_grid_dir)
-
-    list_identify_zone = []
-
-    for file in glob.glob(identify_tile_grid_temp_dir + "\\*" + crs_name + ".shp"):
-        # append the open geo_df to a list.
-        #print("file: ", file)
-        geo_df = gpd.read_file(file)
-        clean_tile = file[-28:-22]
-        geo_df['TILE'] = clean_tile
-        list_identify_zone.append(geo_df)
-
-    if len(list_identify_zone) >= 1:
-        geo_df1 = gpd.GeoDataFrame(pd.concat(list_identify_zone, ignore_index=True), crs=list_identify_zone[0].crs)
-        comp_geo_df = geo_df1.dropna(axis=0, subset=['FID_2'])
-        comp_geo_df.rename(columns={"TILE": "tile"}, errors="raise", inplace=True)
-        #print('comp_geo_df: ', comp_geo_df)
-        #comp_geo_df.to_file(r"Z:\Scratch\Rob\tern\tree_biomass_field_data\test.shp", driver="ESRI Shapefile")
-
-        for i in comp_geo_df.tile.unique():
-            #print("i: ", i)
-            site_tile_df = comp_geo_df.loc[comp_geo_df.tile == i]
-            site_tile_df2 = site_tile_df[['site_name', 'tile', 'geometry']]
-            site_tile_df2.reset_index(drop=True, inplace=True)
-            site_tile_df2['uid'] = site_tile_df2.index + 1
-            #export_file = os.path.join(zonal_stats_ready_dir,  str(i) + '_by_tile.shp')
-            site_tile_df2.to_file(zonal_stats_ready_dir + '\\' + str(i) + '_by_tile.shp')
-    else:
-        print("-------------------------ERROR--------------------------------")
-        sys.exit(1)
-        comp_geo_df = None
-
-    return comp_geo_df
+    for i in comp_geo_df.tile.unique():
+        #print("i: ", i)
+        site_tile_df = comp_geo_df.loc[comp_geo_df.tile == i]
+        site_tile_df2 = site_tile_df[['site_name', 'tile', 'geometry']]
+        site_tile_df2.reset_index(drop=True, inplace=True)
+        site_tile_df2['uid'] = site_tile_df2.index + 1
+        #export_file = os.path.join(zonal_stats_ready_dir,  str(i) + '_by_tile.shp')
+        site_tile_df2.to_file(zonal_stats_ready_dir + '\\' + str(i) + '_by_tile.shp')
 
 
 def main_routine(tile_grid, geo_df2, data, zone, export_dir_path, prime_temp_grid_dir):
@@ -252,70 +252,46 @@ def main_routine(tile_grid, geo_df2, data, zone, export_dir_path, prime_temp_gri
     # define the zonal_stats_ready_dir path
     zonal_stats_ready_dir = prime_temp_grid_dir + '\\zonal_stats_ready'
 
-    # call the project_tile_grid_fn function.
-    tile_grid_wgs52, tile_grid_wgs53, tile_grid_wgs54 = project_tile_grid_fn(tile_grid, prime_temp_grid_dir)
+    # call the cached_zone_tile_grids_fn function (buffered tile grid of each zone).
+    tile_grids = cached_zone_tile_grids_fn(tile_grid)
 
 
     if zone == "2":
     # ------------------------------------------ tile_grid_wgs52 -------------------------------------------------------
 
-        # set the projected_df to tile_grid_wgs52
-        projected_df = tile_grid_wgs52
+        # set the buffer_df to the WGS84z52 buffered tile grid
+        buffer_df = tile_grids['WGS84z52']
         # set the crs_name variable to 'WGS84z52'
         crs_name = 'WGS84z52'
-        # call the negative_buffer_fn function.
-        tile_grid_temp_dir, crs_name = negative_buffer_fn(projected_df, prime_temp_grid_dir, crs_name)
-        # set the odk_geo1ha_df variable to geo_df52
-        odk_geo1ha_df = geo_df2
-
-        #("odk_geo1ha_df: ", odk_geo1ha_df)
-        # call the concatenate_df_fn function.
-        comp_tile_geo_df, concat_tile_grid_temp_dir, crs_name = concatenate_df_fn(prime_temp_grid_dir, tile_grid_temp_dir,
-                                                                                  crs_name)
-        # call the identity_df_fn function.
-        identify_tile_grid_temp_dir = identity_df_fn(tile_grid_temp_dir, prime_temp_grid_dir, odk_geo1ha_df, crs_name)
-        # call the concatenate_tile_df_fn function.
-        comp_geo_df = concatenate_tile_df_fn(zonal_stats_ready_dir, identify_tile_grid_temp_dir, prime_temp_grid_dir,
-                                               crs_name)
 
     elif zone == "3":
 
         # -------------------------------------------- tile_grid_wgs53 --------------------------------------------------
 
-        projected_df = tile_grid_wgs53
+        buffer_df = tile_grids['WGS84z53']
         crs_name = 'WGS84z53'
-        # call the negative_buffer_fn function.
-        tile_grid_temp_dir, crs_name = negative_buffer_fn(projected_df, prime_temp_grid_dir, crs_name)
-        # set the odk_geo1ha_df variable to geo_df53
-        odk_geo1ha_df = geo_df2
-        # call the concatenate_df_fn function.
-        comp_tile_geo_df, concat_tile_grid_temp_dir, crs_name = concatenate_df_fn(prime_temp_grid_dir, tile_grid_temp_dir,
-                                                                                  crs_name)
-        # call the identifyDF function.
-        identify_tile_grid_temp_dir = identity_df_fn(tile_grid_temp_dir, prime_temp_grid_dir, odk_geo1ha_df, crs_name)
-        # call the concatenate_tile_df_fn function.
-        comp_geo_df = concatenate_tile_df_fn(zonal_stats_ready_dir, identify_tile_grid_temp_dir, prime_temp_grid_dir,
-                                               crs_name)
 
     elif zone == "4":
 
         # -------------------------------------------- tile_grid_wgs54 --------------------------------------------------
 
-        projected_df = tile_grid_wgs54
+        buffer_df = tile_grids['WGS84z54']
         crs_name = 'WGS84z54'
-        # call the negative_buffer_fn function.
-        tile_grid_temp_dir, crs_name = negative_buffer_fn(projected_df, prime_temp_grid_dir, crs_name)
-        # set the odk_geo1ha_df variable to geo_df53
-        odk_geo1ha_df = geo_df2
-        # call the concatenate_df_fn function.
-        comp_tile_geo_df, concat_tile_grid_temp_dir, crs_name = concatenate_df_fn(prime_temp_grid_dir, tile_grid_temp_dir,
-                                                                                  crs_name)
-        # call the identifyDF function.
-        identify_tile_grid_temp_dir = identity_df_fn(tile_grid_temp_dir, prime_temp_grid_dir, odk_geo1ha_df, crs_name)
-        # call the concatenate_tile_df_fn function.
-        comp_geo_df = concatenate_tile_df_fn(zonal_stats_ready_dir, identify_tile_grid_temp_dir, prime_temp_grid_dir,
-                                               crs_name)
 
+    print("crs_name: ", crs_name)
+    # set the odk_geo1ha_df variable to geo_df2
+    odk_geo1ha_df = geo_df2
+
+    # call the spatial_join_tile_fn function (site tile pairs of all of the sites).
+    comp_geo_df = spatial_join_tile_fn(buffer_df, odk_geo1ha_df)
+
+    if len(comp_geo_df) >= 1:
+        # call the tile_sites_to_file_fn function.
+        tile_sites_to_file_fn(zonal_stats_ready_dir, comp_geo_df)
+    else:
+        print("-------------------------ERROR--------------------------------")
+        print("No site overlays a buffered Landsat tile: ", crs_name)
+        sys.exit(1)
 
     return comp_geo_df, zonal_stats_ready_dir
 
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+"""
+step1_5_batch_landsat_list.py
+=============================
+
+Description: This script lists the Landsat imagery of a set of WRS2 tiles (path_rows) in one run, instead of one
+pipeline process per tile. Each tile is listed with the create_csv_list_of_paths_fn function of every step1_5 landsat
+list script (dp1, dp0, dbg, dbi and their fire mask listings) and the tiles are scanned concurrently in a thread pool,
+the scans are I/O bound on the network drives. Each tile directory is scanned once into the Landsat imagery catalogue
+(landsat_imagery_catalogue) and every product listing of the tile, including the fire mask listings, is a query of
+that scan.
+
+The per tile for_processing csv lists are written by create_csv_list_of_paths_fn, the tile status lists (tiles ready
+for zonal stats and tiles not processed) of every product are written once for all of the tiles and a summary table
+of the image count per tile and product is exported (landsat_tile_image_counts.csv).
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import argparse
+import csv
+import importlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+import warnings
+import landsat_imagery_catalogue
+
+warnings.filterwarnings("ignore")
+
+# listing name -> (product extension, step1_5 landsat list script, tile status label), the listing names match the
+# landsat_imagery_catalogue.PRODUCT_PATTERNS keys
+LISTING_MODULES = OrderedDict([('dp1', ('dp1', 'step1_5_dp1_landsat_list2', 'dp1')),
+                               ('dp0', ('dp0', 'step1_5_dp0_landsat_list3', 'dp0')),
+                               ('dbg', ('dbg', 'step1_5_dbg_landsat_list3', 'dbg')),
+                               ('dbi', ('dbi', 'step1_5_dbi_landsat_list', 'dbi')),
+                               ('dp1_fire_mask', ('dp1', 'step1_5_dp1_landsat_list_fire_mask', 'dp1_mask')),
+                               ('dp0_fire_mask', ('dp0', 'step1_5_dp0_landsat_list_fire_mask', 'dp0_mask')),
+                               ('dbg_fire_mask', ('dbg', 'step1_5_dbg_landsat_list_fire_mask', 'dbg_mask')),
+                               ('dbi_fire_mask', ('dbi', 'step1_5_dbi_landsat_list_fire_mask', 'dbi_mask'))])
+
+
+def get_cmd_args_fn():
+    p = argparse.ArgumentParser(
+        description='''List the Landsat imagery of several WRS2 tiles in one run.''')
+
+    p.add_argument('-x', '--export_dir',
+                   help='Enter the export directory for the tile status lists and the image count summary.',
+                   default=r'U:\scratch\rob\pipelines\outputs')
+
+    p.add_argument('-l', '--lsat_dir', help="The wrs2 directory containing landsat data",
+                   default=r"N:\Landsat\wrs2")
+
+    p.add_argument('-t', '--tiles', nargs='+',
+                   help="Enter the Landsat path_rows to be listed (i.e. 101_077 101_078 102_077)")
+
+    p.add_argument('-i', '--image_count', type=int,
+                   help='Enter the minimum amount of Landsat images required per tile as an integer (i.e. 950).',
+                   default=100)
+
+    p.add_argument('-z', '--zone', help="Enter the Landsat tile zone (i.e. 2 or 3)",
+                   required=True)
+
+    p.add_argument('-w', '--workers', type=int,
+                   help="Enter the number of tiles listed at the same time (i.e. 8)",
+                   default=8)
+
+    cmd_args = p.parse_args()
+
+    if cmd_args.tiles is None:
+        p.print_help()
+
+    return cmd_args
+
+
+def path_row_fn(path_row):
+    """ Convert a Landsat tile label (i.e. '101_077', '101077' or (101, 77)) to the tile directory name (101_077).
+
+    @param path_row: string or tuple object containing the Landsat path and row.
+    @return lsat_tile: string object containing the tile directory name.
+    """
+
+    if isinstance(path_row, (tuple, list)):
+        path, row = path_row
+    else:
+        path_row = str(path_row).strip()
+        if "_" in path_row:
+            path, row = path_row.split("_")
+        else:
+            path, row = path_row[:3], path_row[3:]
+
+    return "{0:03d}_{1:03d}".format(int(path), int(row))
+
+
+def status_dirs_fn(export_dir_path, label):
+    """ Create (if required) the tile status directory of a listing and its for_processing and tile_status_lists
+    sub-directories.
+
+    @param export_dir_path: string object containing the path to the export directory.
+    @param label: string object containing the tile status label (i.e. 'dp1' or 'dp1_mask').
+    @return tile_status_dir: string object containing the path to the tile status directory.
+    """
+
+    tile_status_dir = export_dir_path + '\\{0}_tile_status'.format(label)
+    for dir_path in (tile_status_dir,
+                     tile_status_dir + '\\{0}_for_processing'.format(label),
+                     tile_status_dir + '\\{0}_tile_status_lists'.format(label)):
+        if not os.path.isdir(dir_path):
+            os.makedirs(dir_path)
+
+    return tile_status_dir
+
+
+def list_tile_fn(lsat_tile, lsat_dir, export_dir_path, image_count, zone, names):
+    """ List one tile for every listing with the create_csv_list_of_paths_fn function of its step1_5 script, the
+    tile status lists are left to write_status_lists_fn. The tile directory is refreshed in the catalogue once, before
+    its listings, and every listing is a query of that scan (refresh=False).
+
+    @param lsat_tile: string object containing the tile directory name (i.e. 101_077).
+    @param lsat_dir: string object containing the path to the Landsat wrs2 directory.
+    @param export_dir_path: string object containing the path to the export directory.
+    @param image_count: integer object containing the minimum amount of images required per tile.
+    @param zone: string or integer object containing the zone code of the image names.
+    @param names: tuple object containing the listing names (keys of LISTING_MODULES).
+    @return tile_counts: dictionary object {listing name: (image count, sufficient)}.
+    """
+
+    path, row = lsat_tile.split("_")
+
+    # scan the tile once for all of the listings.
+    landsat_imagery_catalogue.refresh_tile_images_fn(lsat_dir + '\\' + lsat_tile)
+
+    tile_counts = OrderedDict()
+    for name in names:
+        extension, module_name, label = LISTING_MODULES[name]
+        listing_module = importlib.import_module(module_name)
+        tile_status_dir = export_dir_path + '\\{0}_tile_status'.format(label)
+        list_sufficient, list_landsat_tile_path = listing_module.create_csv_list_of_paths_fn(
+            lsat_tile, lsat_dir, extension, image_count, tile_status_dir, path, row, zone, write_status_lists=False,
+            refresh=False)
+        tile_counts[name] = (len(list_landsat_tile_path), bool(list_sufficient))
+
+    return tile_counts
+
+
+def write_status_lists_fn(export_dir_path, label, list_sufficient, list_insufficient):
+    """ Write the tile status lists of a listing (all of the tiles ready for zonal stats and not processed).
+
+    @param export_dir_path: string object containing the path to the export directory.
+    @param label: string object containing the tile status label (i.e. 'dp1' or 'dp1_mask').
+    @param list_sufficient: list object containing the tiles with sufficient images.
+    @param list_insufficient: list object containing the tiles with insufficient images.
+    """
+
+    status_list_dir = export_dir_path + '\\{0}_tile_status\\{0}_tile_status_lists'.format(label)
+
+    for file_name, tiles in (('Complete_list_of_{0}_tiles_ready_for_zonal_stats.csv'.format(label), list_sufficient),
+                             ('Complete_list_of_{0}_tiles_not_processed.csv'.format(label), list_insufficient)):
+        with open(status_list_dir + '\\' + file_name, "w") as output:
+            writer = csv.writer(output, lineterminator='\n')
+            for tile in tiles:
+                writer.writerow([tile])
+
+
+def batch_list_fn(export_dir_path, lsat_dir, path_rows, image_count, zone, names=None, workers=8):
+    """ List the imagery of several tiles concurrently and write the for_processing csv lists, the tile status lists
+    and the image count summary of every listing in one go.
+
+    @param export_dir_path: string object containing the path to the export directory.
+    @param lsat_dir: string object containing the path to the Landsat wrs2 directory.
+    @param path_rows: iterable object containing the Landsat tiles (path_row_fn).
+    @param image_count: integer object containing the minimum amount of images required per tile.
+    @param zone: string or integer object containing the zone code of the image names, or a dictionary object
+    {tile directory name: zone} for tiles in different zones.
+    @param names: iterable object containing the listing names (default: every key of LISTING_MODULES).
+    @param workers: integer object containing the number of tiles listed at the same time.
+    @return summary_df: dataframe object containing the image count of every tile (rows) and listing (columns).
+    """
+
+    names = tuple(LISTING_MODULES) if names is None else tuple(names)
+    lsat_tiles = sorted(set(path_row_fn(path_row) for path_row in path_rows))
+
+    if not lsat_tiles:
+        print("No Landsat tiles to list")
+        return pd.DataFrame(columns=names)
+
+    for name in names:
+        status_dirs_fn(export_dir_path, LISTING_MODULES[name][2])
+
+    workers = max(1, min(int(workers), len(lsat_tiles)))
+    print("Listing {0} Landsat tiles with {1} workers".format(len(lsat_tiles), workers))
+    start_time = time.time()
+
+    tile_counts = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(list_tile_fn, lsat_tile, lsat_dir, export_dir_path, image_count,
+                                        zone.get(lsat_tile) if isinstance(zone, dict) else zone, names), lsat_tile)
+                       for lsat_tile in lsat_tiles)
+        for completed, future in enumerate(as_completed(futures), 1):
+            # re-raise any exception from the listing in the main thread.
+            tile_counts[futures[future]] = future.result()
+            print("tile {0}/{1} listed ({2:.1f} s): {3}".format(completed, len(lsat_tiles), time.time() - start_time,
+                                                                futures[future]))
+
+    for name in names:
+        list_sufficient = [lsat_tile for lsat_tile in lsat_tiles if tile_counts[lsat_tile][name][1]]
+        list_insufficient = [lsat_tile for lsat_tile in lsat_tiles if not tile_counts[lsat_tile][name][1]]
+        write_status_lists_fn(export_dir_path, LISTING_MODULES[name][2], list_sufficient, list_insufficient)
+
+    summary_df = pd.DataFrame([[tile_counts[lsat_tile][name][0] for name in names] for lsat_tile in lsat_tiles],
+                              index=pd.Index(lsat_tiles, name='tile'), columns=list(names))
+
+    summary_path = export_dir_path + '\\landsat_tile_image_counts.csv'
+    summary_df.to_csv(summary_path)
+    print(summary_df)
+    print("Image count summary: ", summary_path)
+
+    return summary_df
+
+
+def main_routine():
+    """ Description: This script lists the Landsat imagery of several WRS2 tiles in one run. """
+
+    cmd_args = get_cmd_args_fn()
+    if cmd_args.tiles is None:
+        return
+
+    batch_list_fn(cmd_args.export_dir, cmd_args.lsat_dir, cmd_args.tiles, cmd_args.image_count, cmd_args.zone,
+                  workers=cmd_args.workers)
+
+
+if __name__ == "__main__":
+    main_routine()
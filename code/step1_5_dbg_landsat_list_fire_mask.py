@@ -51,6 +51,7 @@ import csv
 import sys
 from glob import glob
 import warnings
+import landsat_imagery_catalogue
 
 warnings.filterwarnings("ignore")
 
@@ -122,7 +123,7 @@ def unique_values_fn(geo_df):
     return list_tile_unique
 
 
-def list_file_directory_fn(landsat_tile_dir, extension, zone):
+def list_file_directory_fn(landsat_tile_dir, extension, zone, refresh=True):
     """ Create an empty list to store the Landsat image file path for images that meet the search criteria
     (image_search_criteria1 and image_search_criteria2).
     @param landsat_tile_dir:
@@ -133,27 +134,17 @@ def list_file_directory_fn(landsat_tile_dir, extension, zone):
 
     print("Landsat tile dir: ", landsat_tile_dir)
     print("looking for: ", "{0}m{1}_zstdmask.img".format(extension, str(zone)))
-    list_landsat_tile_path = []
-
-    # Navigate and loop through the folders within the Landsat Tile Directory stored in the 'landsat_tile_dir'
-    # object variable.
-    for root, dirs, files in os.walk(landsat_tile_dir):
-        for file in files:
-            # print('file: ', file)
-            # Search for files ending with the string value stored in the object variable: imageSearchCriteria.
-            if file.endswith("{0}m{1}_dksdmask.img".format(extension, str(zone))) or file.endswith("{0}m{1}_dkndmask.img".format(extension, str(zone))):
-                # print("located: ", file)
-                # Concatenate the root and file names to create a file path.
-                image_path = (os.path.join(root, file))
-                # print('image_path: ', image_path)
-                # Append the image_path variable to the empty list 'list_landsat_tile_path'.
-                list_landsat_tile_path.append(image_path)
-                # print("list_landsat: ", list_landsat_tile_path)
+    # Query the Landsat imagery catalogue (landsat_imagery_catalogue), the listings of every product are classified
+    # together with one regular expression. The fire mask images are written after the first scan of the tile so
+    # the changed directories are listed again, unless the caller has just refreshed the tile (refresh=False).
+    product_images = landsat_imagery_catalogue.tile_product_images_fn(landsat_tile_dir, zone, refresh=refresh)
+    list_landsat_tile_path = product_images[extension + '_fire_mask']
 
     return list_landsat_tile_path
 
 
-def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, tile_status_dir, path, row, zone):
+def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, tile_status_dir, path, row, zone,
+                                write_status_lists=True, refresh=True):
     """ Determine which Landsat Tiles have a sufficient amount of images to process.
 
     @param list_tile_unique: list object containing the path to all landsat images matching either search criteria.
@@ -162,6 +153,11 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
     @param image_search_criteria2: string object containing the end part of the required file name (--search_criteria2)
     @param fc_count: integer object containing the command argument --image_count
     @param tile_status_dir: string object to the subdirectory export_dir\tile_status
+    @param write_status_lists: boolean object, False leaves the tile status lists to the caller (i.e. the batch
+    listing of step1_5_batch_landsat_list).
+    @param refresh: boolean object, True re-checks the tile directory in the Landsat imagery catalogue (the fire mask
+    images are written after the first scan of the tile), False uses the scan already made in this process (i.e. by
+    the batch listing).
     @return list_sufficient: list object containing the path to all Landsat images of interest providing that the
     number was greater than the fc_count value.
     """
@@ -179,7 +175,7 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
     print('Confirm that there are sufficient SR tiles for processing')
     print('landsat_tile_dir: ', landsat_tile_dir)
     # Run the list_file_directory_fn function.
-    list_landsat_tile_path = list_file_directory_fn(landsat_tile_dir, extension, zone)
+    list_landsat_tile_path = list_file_directory_fn(landsat_tile_dir, extension, zone, refresh)
 
     print("list_landsat_tile_path: ", list_landsat_tile_path)
     # Calculate the number of image pathways stored in the list_landsat_tile_path variable.
@@ -208,22 +204,23 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
         print('There are insufficient SR images for: ', str(lsat_tile))
         # sys.exit()
 
-    # assumes that file_list is a flat list, it adds a
-    csv_output2 = tile_status_dir + '\\dbg_mask_tile_status_lists\\' + 'Complete_list_of_dbg_mask_tiles_ready_for_zonal_stats.csv'
-    # Creates a csv list of all the Landsat tile names that contain 1ha sites that have met the minimum
-    # fc_count threshold.
-    with open(csv_output2, "w") as output:
-        writer = csv.writer(output, lineterminator='\n')
-        for file in list_sufficient:
-            writer.writerow([file])
-
-    csv_output3 = tile_status_dir + '\\dbg_mask_tile_status_lists\\' + 'Complete_list_of_dbg_mask_tiles_not_processed.csv'
-    # Creates a csv list of all the Landsat tile names that contain 1ha sites that have NOT met the minimum
-    # fc_count threshold.
-    with open(csv_output3, "w") as output:
-        writer = csv.writer(output, lineterminator='\n')
-        for file in list_insufficient:
-            writer.writerow([file])
+    if write_status_lists:
+        # assumes that file_list is a flat list, it adds a
+        csv_output2 = tile_status_dir + '\\dbg_mask_tile_status_lists\\' + 'Complete_list_of_dbg_mask_tiles_ready_for_zonal_stats.csv'
+        # Creates a csv list of all the Landsat tile names that contain 1ha sites that have met the minimum
+        # fc_count threshold.
+        with open(csv_output2, "w") as output:
+            writer = csv.writer(output, lineterminator='\n')
+            for file in list_sufficient:
+                writer.writerow([file])
+
+        csv_output3 = tile_status_dir + '\\dbg_mask_tile_status_lists\\' + 'Complete_list_of_dbg_mask_tiles_not_processed.csv'
+        # Creates a csv list of all the Landsat tile names that contain 1ha sites that have NOT met the minimum
+        # fc_count threshold.
+        with open(csv_output3, "w") as output:
+            writer = csv.writer(output, lineterminator='\n')
+            for file in list_insufficient:
+                writer.writerow([file])
 
     return list_sufficient, list_landsat_tile_path
 
@@ -51,6 +51,7 @@ import csv
 import sys
 from glob import glob
 import warnings
+import landsat_imagery_catalogue
 
 warnings.filterwarnings("ignore")
 
@@ -120,7 +121,7 @@ def unique_values_fn(geo_df):
     return list_tile_unique
 
 
-def list_file_directory_fn(landsat_tile_dir, extension, zone):
+def list_file_directory_fn(landsat_tile_dir, extension, zone, refresh=False):
     """ Create an empty list to store the Landsat image file path for images that meet the search criteria
     (image_search_criteria1 and image_search_criteria2).
     @param landsat_tile_dir:
@@ -131,28 +132,17 @@ def list_file_directory_fn(landsat_tile_dir, extension, zone):
 
     print("Landsat tile dir: ", landsat_tile_dir)
     print("looking for: ", "{0}m{1}_zstdmask.img".format(extension, str(zone)))
-    list_landsat_tile_path = []
-
-    # Navigate and loop through the folders within the Landsat Tile Directory stored in the 'landsat_tile_dir'
-    # object variable.
-    for root, dirs, files in os.walk(landsat_tile_dir):
-        for file in files:
-            #print('file: ', file)
-            # Search for files ending with the string value stored in the object variable: imageSearchCriteria.
-            if file.endswith("{0}m{1}_zstdmask.img".format(extension, str(zone))):
-                #print("located: ", file)
-                # Concatenate the root and file names to create a file path.
-                image_path = (os.path.join(root, file))
-                #print('image_path: ', image_path)
-                # Append the image_path variable to the empty list 'list_landsat_tile_path'.
-                list_landsat_tile_path.append(image_path)
-                #print("list_landsat: ", list_landsat_tile_path)
-
+    # Query the Landsat imagery catalogue (landsat_imagery_catalogue), the listings of every product are classified
+    # together with one regular expression, the tile directory is only scanned once per run and only the
+    # directories that have changed since the last scan are listed again.
+    product_images = landsat_imagery_catalogue.tile_product_images_fn(landsat_tile_dir, zone, refresh=refresh)
+    list_landsat_tile_path = product_images[extension]
 
     return list_landsat_tile_path
 
 
-def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, tile_status_dir, path, row, zone):
+def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, tile_status_dir, path, row, zone,
+                                write_status_lists=True, refresh=False):
 
     """ Determine which Landsat Tiles have a sufficient amount of images to process.
 
@@ -162,6 +152,10 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
     @param image_search_criteria2: string object containing the end part of the required file name (--search_criteria2)
     @param fc_count: integer object containing the command argument --image_count
     @param tile_status_dir: string object to the sub-directory export_dir\tile_status
+    @param write_status_lists: boolean object, False leaves the tile status lists to the caller (i.e. the batch
+    listing of step1_5_batch_landsat_list).
+    @param refresh: boolean object, True re-checks the tile directory in the Landsat imagery catalogue even if it was
+    already scanned in this process.
     @return list_sufficient: list object containing the the path to all Landsat images of interest providing that the
     number was greater than the fc_count value.
     """
@@ -180,7 +174,7 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
     print('Confirm that there are sufficient fractional cover dp0 tiles for processing')
     print('landsat_tile_dir: ', landsat_tile_dir)
     # Run the list_file_directory_fn function.
-    list_landsat_tile_path = list_file_directory_fn(landsat_tile_dir, extension, zone)
+    list_landsat_tile_path = list_file_directory_fn(landsat_tile_dir, extension, zone, refresh)
 
     print("list_landsat_tile_path: ", list_landsat_tile_path)
     # Calculate the number of image pathways stored in the list_landsat_tile_path variable.
@@ -209,22 +203,23 @@ def create_csv_list_of_paths_fn(lsat_tile, lsat_dir, extension, image_count, til
         print('There are insufficient fractional cover dp0 tiles for processing: ', str(lsat_tile))
         #sys.exit()
 
-    # assumes that file_list is a flat list, it adds a
-    csv_output2 = tile_status_dir + '\\dp0_tile_status_lists\\' + 'Complete_list_of_dp0_tiles_ready_for_zonal_stats.csv'
-    # Creates a csv list of all of the Landsat tile names that contain 1ha sites that have met the minimum
-    # fc_count threshold.
-    with open(csv_output2, "w") as output:
-        writer = csv.writer(output, lineterminator='\n')
-        for file in list_sufficient:
-            writer.writerow([file])
-
-    csv_output3 = tile_status_dir + '\\dp0_tile_status_lists\\' + 'Complete_list_of_dp0_tiles_not_processed.csv'
-    # Creates a csv list of all of the Landsat tile names that contain 1ha sites that have NOT met the minimum
-    # fc_count threshold.
-    with open(csv_output3, "w") as output:
-        writer = csv.writer(output, lineterminator='\n')
-        for file in list_insufficient:
-            writer.writerow([file])
+    if write_status_lists:
+        # assumes that file_list is a flat list, it adds a
+        csv_output2 = tile_status_dir + '\\dp0_tile_status_lists\\' + 'Complete_list_of_dp0_tiles_ready_for_zonal_stats.csv'
+        # Creates a csv list of all of the Landsat tile names that contain 1ha sites that have met the minimum
+        # fc_count threshold.
+        with open(csv_output2, "w") as output:
+            writer = csv.writer(output, lineterminator='\n')
+            for file in list_sufficient:
+                writer.writerow([file])
+
+        csv_output3 = tile_status_dir + '\\dp0_tile_status_lists\\' + 'Complete_list_of_dp0_tiles_not_processed.csv'
+        # Creates a csv list of all of the Landsat tile names that contain 1ha sites that have NOT met the minimum
+        # fc_count threshold.
+        with open(csv_output3, "w") as output:
+            writer = csv.writer(output, lineterminator='\n')
+            for file in list_insufficient:
+                writer.writerow([file])
 
     return list_sufficient, list_landsat_tile_path
 
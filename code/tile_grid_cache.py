@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+"""
+tile_grid_cache.py
+==================
+
+Description: This script contains the buffered Landsat tile grid cache used by step1_4_landsat_tile_grid_identify2.
+The Landsat tile grid (Landsat_wrs2_TileGrid.shp) is projected into each UTM zone and every tile is negatively buffered
+once, the buffered grids are stored as FlatGeobuf files keyed by the hash of the tile grid files (shp, shx, dbf, prj
+and cpg), the version of the zone selection and projection rules of the caller and the buffer distance. Later runs
+load the cached grids instead of reprojecting and buffering the tile grid again, a changed tile grid, rule version or
+buffer distance is cached under a new key.
+
+The cache is stored in a directory of the user's home directory (default: tile_grid_cache) and the grids loaded in a
+run are kept in memory for the rest of the run.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import geopandas as gpd
+
+TILE_GRID_CACHE_DRIVER = 'FlatGeobuf'
+TILE_GRID_CACHE_EXTENSION = '.fgb'
+
+# files of a shapefile that define the tile grid
+TILE_GRID_EXTENSIONS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+_GRID_HASHES = {}
+_TILE_GRIDS = {}
+_TILE_GRID_LOCK = threading.Lock()
+
+
+def default_cache_dir_fn():
+    """ Return the default tile grid cache directory (the user's home directory).
+
+    @return cache_dir: string object containing the path to the cache directory.
+    """
+
+    return os.path.join(os.path.expanduser("~"), "tile_grid_cache")
+
+
+def grid_file_paths_fn(tile_grid):
+    """ Return the files of a tile grid, every existing file of a shapefile or the file itself.
+
+    @param tile_grid: string object containing the path to the tile grid vector dataset.
+    @return file_paths: list object containing the paths to the files of the tile grid.
+    """
+
+    base_path, extension = os.path.splitext(tile_grid)
+    if extension.lower() != '.shp':
+        return [tile_grid]
+
+    return [base_path + grid_extension for grid_extension in TILE_GRID_EXTENSIONS
+            if os.path.isfile(base_path + grid_extension)]
+
+
+def grid_file_hash_fn(tile_grid):
+    """ Return the md5 hash of the tile grid files, hashed once per run unless a file has been modified.
+
+    @param tile_grid: string object containing the path to the tile grid vector dataset.
+    @return grid_hash: string object containing the hex digest of the tile grid files.
+    """
+
+    file_paths = grid_file_paths_fn(tile_grid)
+    stat_key = tuple((os.path.normcase(os.path.abspath(file_path)), os.path.getsize(file_path),
+                      os.path.getmtime(file_path)) for file_path in file_paths)
+
+    grid_hash = _GRID_HASHES.get(stat_key)
+    if grid_hash is None:
+        md5 = hashlib.md5()
+        for file_path in file_paths:
+            md5.update(os.path.splitext(file_path)[1].lower().encode('utf-8'))
+            with open(file_path, 'rb') as grid_file:
+                for chunk in iter(lambda: grid_file.read(1024 * 1024), b''):
+                    md5.update(chunk)
+        grid_hash = md5.hexdigest()
+        _GRID_HASHES[stat_key] = grid_hash
+
+    return grid_hash
+
+
+def buffer_label_fn(buffer_distance):
+    """ Return the file name label of a buffer distance (i.e. -3000 -> 'buffer_m3000').
+
+    @param buffer_distance: integer or float object containing the buffer distance (m).
+    @return label: string object.
+    """
+
+    return 'buffer_{0:g}'.format(buffer_distance).replace('-', 'm').replace('.', 'p')
+
+
+def cache_path_fn(cache_dir, grid_hash, version, crs_name, buffer_distance):
+    """ Return the cache file of the buffered tile grid of a UTM zone.
+
+    @param cache_dir: string object containing the path to the cache directory.
+    @param grid_hash: string object returned by grid_file_hash_fn.
+    @param version: integer object containing the version of the zone selection and projection rules.
+    @param crs_name: string object containing the standardised crs information (i.e. 'WGS84z52').
+    @param buffer_distance: integer or float object containing the buffer distance (m).
+    @return cache_path: string object containing the path to the buffered tile grid file.
+    """
+
+    return os.path.join(cache_dir, 'tile_grid_{0}_v{1}_{2}_{3}{4}'.format(
+        grid_hash, version, crs_name, buffer_label_fn(buffer_distance), TILE_GRID_CACHE_EXTENSION))
+
+
+def write_grid_fn(grid_df, output_path):
+    """ Write a tile grid to the cache, through a temporary file so other runs never read a partial file.
+
+    @param grid_df: geo-dataframe containing the tile grid.
+    @param output_path: string object containing the path to the cache file.
+    """
+
+    temp_path = '{0}_{1}_{2}.tmp{3}'.format(output_path[:-len(TILE_GRID_CACHE_EXTENSION)], os.getpid(),
+                                           threading.get_ident(), TILE_GRID_CACHE_EXTENSION)
+    try:
+        # without the FlatGeobuf spatial index the features keep the order of the tile grid
+        grid_df.to_file(temp_path, driver=TILE_GRID_CACHE_DRIVER, SPATIAL_INDEX='NO')
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+
+
+def cached_tile_grids_fn(tile_grid, crs_names, buffer_distance, version, build_fn, cache_dir=None):
+    """ Return the buffered tile grid of each UTM zone, from the cache when the same tile grid files have already been
+    projected and buffered with the same rule version and buffer distance, otherwise the grids are built with build_fn
+    and cached.
+
+    @param tile_grid: string object containing the path to the tile grid vector dataset.
+    @param crs_names: iterable object containing the standardised crs information of the zones (i.e. 'WGS84z52').
+    @param buffer_distance: integer or float object containing the buffer distance (m) applied to each tile.
+    @param version: integer object containing the version of the zone selection and projection rules of build_fn,
+    changed by the caller whenever the rules change so the grids cached with the old rules are not loaded.
+    @param build_fn: function object build_fn(tile_grid, buffer_distance) returning a dictionary object
+    {crs_name: buffered geo-dataframe} of every zone.
+    @param cache_dir: string object containing the path to the cache directory (default: default_cache_dir_fn).
+    @return tile_grids: dictionary object {crs_name: buffered geo-dataframe}.
+    """
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir_fn()
+    crs_names = tuple(crs_names)
+
+    grid_hash = grid_file_hash_fn(tile_grid)
+    memory_key = (os.path.normcase(os.path.abspath(cache_dir)), grid_hash, version, crs_names, buffer_distance)
+
+    with _TILE_GRID_LOCK:
+        tile_grids = _TILE_GRIDS.get(memory_key)
+        if tile_grids is not None:
+            return tile_grids
+
+        cache_paths = OrderedDict((crs_name, cache_path_fn(cache_dir, grid_hash, version, crs_name, buffer_distance))
+                                  for crs_name in crs_names)
+
+        if all(os.path.isfile(cache_path) for cache_path in cache_paths.values()):
+            print("Loading the cached tile grids: ", grid_hash, version, buffer_distance)
+            tile_grids = OrderedDict((crs_name, gpd.read_file(cache_path))
+                                     for crs_name, cache_path in cache_paths.items())
+        else:
+            print("Building the tile grid cache: ", grid_hash, version, buffer_distance)
+            built_grids = build_fn(tile_grid, buffer_distance)
+            tile_grids = OrderedDict((crs_name, built_grids[crs_name]) for crs_name in crs_names)
+
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            for crs_name, cache_path in cache_paths.items():
+                write_grid_fn(tile_grids[crs_name], cache_path)
+
+        _TILE_GRIDS[memory_key] = tile_grids
+
+    return tile_grids
+
+
+def clear_tile_grids_fn():
+    """ Remove every tile grid loaded in this run from memory (the cache files are kept). """
+
+    with _TILE_GRID_LOCK:
+        _TILE_GRIDS.clear()
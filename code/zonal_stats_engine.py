@@ -0,0 +1,709 @@
+#!/usr/bin/env python
+
+"""
+zonal_stats_engine.py
+=====================
+
+Description: This script contains the shared zonal statistics engine used by the step1_6 zonal stats scripts.
+Each Landsat image is opened once, all of the requested bands are read into a single (bands, rows, cols) block and
+the statistics for every band and site are calculated in one vectorised kernel call. The site polygons are
+rasterised once per raster grid into a pixel index, every other image on the same grid gathers its site pixels from
+that index. A list of images can be scored in parallel worker processes (map_multi_band_zonal_stats_fn).
+
+In dual mode (map_multi_band_zonal_stats_fn dual_fire_masks) the site pixels of each image are read once and both the
+unmasked and the fire masked statistics are calculated from them. The unmasked statistics are returned and the fire
+masked statistics are held in memory until the masked zonal stats script of the product asks for them.
+
+The statistics are returned as one DataFrame per band with the columns in the same order as the rasterstats output
+used by apply_zonal_stats_fn: min, max, mean, count, std, median, range, p25, p50, p75, p95 and p99.
+
+
+Author: Rob McGregor
+email: Robert.Mcgregor@nt.gov.au
+Date: 17/10/2026
+Version: 1.0
+
+###############################################################################################
+
+MIT License
+
+Copyright (c) 2020 Rob McGregor
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the 'Software'), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+
+THE SOFTWARE IS PROVIDED 'AS IS', WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+##################################################################################################
+
+========================================================================================================================
+"""
+
+# import modules
+from __future__ import print_function, division
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import fiona
+import rasterio
+import numpy as np
+import pandas as pd
+from rasterio import features
+from rasterio.transform import rowcol
+from rasterio.windows import Window
+import warnings
+import fire_footprint_cache
+import fire_month_mask
+
+warnings.filterwarnings("ignore")
+
+# percentiles reported for each site (rasterstats percentile_25 ... percentile_99)
+PERCENTILES = [25, 50, 75, 95, 99]
+
+# statistic columns returned per band, in the rasterstats order used by the step1_6 headers
+STAT_COLUMNS = ['min', 'max', 'mean', 'count', 'std', 'median', 'range', 'p25', 'p50', 'p75', 'p95', 'p99']
+
+# statistic columns renamed in the step1_6 output headers
+HEADER_STATS = {'median': 'med'}
+
+# site pixel index cache, all images in a *_landsat_tile_list.csv share one grid so the site polygons are rasterised
+# once per (shapefile, uid, grid transform, grid shape, all_touched) key
+_PIXEL_INDEX_CACHE = {}
+
+# fire masked results calculated in dual mode, keyed by masked_results_key_fn and removed when they are used
+_MASKED_RESULTS_CACHE = {}
+
+# number of buffered band result rows (summed over all bands) held in memory before they are spilled to disk.
+SPILL_ROWS = 2000000
+
+
+def read_site_features_fn(shape, uid):
+    """ Read the 1ha site polygons from the shapefile once.
+
+    @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+    @param uid: string object containing the unique identifier feature name.
+    @return site_features: list of tuples (geometry, uid, site_name) in shapefile order.
+    """
+
+    site_features = []
+    with fiona.open(shape) as src:
+        for i in src:
+            # extract shapefile records
+            table_attributes = i['properties']
+            site_features.append((i['geometry'], table_attributes[uid], table_attributes['site_name']))
+
+    return site_features
+
+
+def geometry_window_fn(geometry, affine, height, width):
+    """ Calculate the pixel window covering the bounds of a site polygon (rasterstats bounds_window equivalent).
+
+    @param geometry: geojson like geometry of the site polygon.
+    @param affine: affine transform of the raster grid.
+    @param height: integer object containing the number of rows in the raster grid.
+    @param width: integer object containing the number of columns in the raster grid.
+    @return window: rasterio Window object clipped to the raster grid.
+    """
+
+    geom_shape = features.bounds(geometry)
+    west, south, east, north = geom_shape
+    row_start, col_start = rowcol(affine, west, north, op=math.floor)
+    row_stop, col_stop = rowcol(affine, east, south, op=math.ceil)
+
+    row_start, row_stop = max(row_start, 0), min(max(row_stop, 0), height)
+    col_start, col_stop = max(col_start, 0), min(max(col_stop, 0), width)
+
+    return Window(col_start, row_start, max(col_stop - col_start, 0), max(row_stop - row_start, 0))
+
+
+def site_pixel_mask_fn(geometry, window, affine, all_touched=False):
+    """ Rasterise a site polygon into a boolean mask over its pixel window.
+
+    @param geometry: geojson like geometry of the site polygon.
+    @param window: rasterio Window object covering the site polygon.
+    @param affine: affine transform of the raster grid.
+    @param all_touched: boolean object, True includes every pixel touched by the polygon (rasterstats default False).
+    @return mask: boolean numpy array (window rows, window cols), True for pixels inside the polygon.
+    """
+
+    height, width = int(window.height), int(window.width)
+    if height == 0 or width == 0:
+        return np.zeros((height, width), dtype=bool)
+
+    win_affine = rasterio.windows.transform(window, affine)
+    mask = features.rasterize([(geometry, 1)], out_shape=(height, width), transform=win_affine, fill=0,
+                              all_touched=all_touched, dtype='uint8')
+
+    return mask.astype(bool)
+
+
+def zonal_stats_kernel_fn(values):
+    """ Calculate the zonal statistics of every zone in one call from a stacked masked array.
+
+    Masked pixels are pushed to the end of each row and zones are grouped by their valid pixel count, so one
+    np.partition call per group places only the order statistics the kernel reads (min, max and the neighbours either
+    side of each percentile) instead of sorting every row. Percentiles use linear interpolation, matching
+    numpy.percentile, and the median is the 50th percentile.
+
+    @param values: numpy masked array (n_zones, n_pixels), masked pixels are excluded from the statistics.
+    @return zone_stats: dictionary object of columnar numpy arrays (n_zones) keyed by STAT_COLUMNS, zones without
+    valid pixels return a count of 0 and NaN for every other statistic.
+    """
+
+    data = np.ma.getdata(values).astype(np.float64)
+    valid = ~np.ma.getmaskarray(values) & ~np.isnan(data)
+    n_zones = data.shape[0]
+
+    count = valid.sum(axis=1)
+    empty = count == 0
+    safe_count = np.where(empty, 1, count)
+
+    padded = np.where(valid, data, np.inf)
+    quantiles = sorted(set(PERCENTILES) | {50})
+    order_stats = {q: np.full(n_zones, np.nan) for q in quantiles}
+    v_min = np.full(n_zones, np.nan)
+    v_max = np.full(n_zones, np.nan)
+
+    for n_valid in np.unique(count[~empty]):
+        group = np.flatnonzero(count == n_valid)
+        positions = {q: (q / 100.0) * (n_valid - 1) for q in quantiles}
+        kth = {0, int(n_valid) - 1}
+        for position in positions.values():
+            kth.update((int(np.floor(position)), int(np.ceil(position))))
+        ordered = np.partition(padded[group], sorted(kth), axis=1)
+
+        v_min[group] = ordered[:, 0]
+        v_max[group] = ordered[:, n_valid - 1]
+        for q, position in positions.items():
+            lower = int(np.floor(position))
+            upper = int(np.ceil(position))
+            order_stats[q][group] = ordered[:, lower] + (ordered[:, upper] - ordered[:, lower]) * (position - lower)
+
+    mean = np.where(valid, data, 0.0).sum(axis=1) / safe_count
+    std = np.sqrt(np.where(valid, (data - mean[:, None]) ** 2, 0.0).sum(axis=1) / safe_count)
+
+    zone_stats = {'min': v_min, 'max': v_max, 'mean': mean, 'count': count, 'std': std,
+                  'median': order_stats[50], 'range': v_max - v_min}
+    for q in PERCENTILES:
+        zone_stats['p{0}'.format(q)] = order_stats[q]
+
+    for stat in zone_stats:
+        if stat != 'count':
+            zone_stats[stat] = np.where(empty, np.nan, zone_stats[stat])
+
+    return zone_stats
+
+
+def union_window_fn(windows):
+    """ Calculate the smallest pixel window containing every site window.
+
+    @param windows: list object containing the rasterio Window objects of each site polygon.
+    @return window: rasterio Window object covering the union bounding box of the site windows.
+    """
+
+    windows = [w for w in windows if w.height > 0 and w.width > 0]
+    if not windows:
+        return Window(0, 0, 0, 0)
+
+    row_start = min(int(w.row_off) for w in windows)
+    col_start = min(int(w.col_off) for w in windows)
+    row_stop = max(int(w.row_off + w.height) for w in windows)
+    col_stop = max(int(w.col_off + w.width) for w in windows)
+
+    return Window(col_start, row_start, col_stop - col_start, row_stop - row_start)
+
+
+def build_site_pixel_index_fn(site_features, affine, height, width, all_touched=False):
+    """ Rasterise the site polygons once and store the flat pixel offsets of each site.
+
+    @param site_features: list of tuples (geometry, uid, site_name) returned by read_site_features_fn.
+    @param affine: affine transform of the raster grid.
+    @param height: integer object containing the number of rows in the raster grid.
+    @param width: integer object containing the number of columns in the raster grid.
+    @param all_touched: boolean object, True includes every pixel touched by a polygon.
+    @return pixel_index: dictionary object containing the site uids and names, the union window, the flat pixel
+    offsets of every site within the union window ('offsets'), within its own site window ('site_offsets') and the
+    padded (n_sites, max site pixels) gather index ('padded_offsets', 'padded_valid').
+    """
+
+    windows = [geometry_window_fn(geometry, affine, height, width) for geometry, uid_, site in site_features]
+    union = union_window_fn(windows)
+
+    offsets = []
+    site_offsets = []
+    for (geometry, uid_, site), w in zip(site_features, windows):
+        mask = site_pixel_mask_fn(geometry, w, affine, all_touched)
+        rows, cols = np.nonzero(mask)
+        site_offsets.append((rows * int(w.width) + cols).astype(np.int64))
+
+        rows = rows + int(w.row_off) - int(union.row_off)
+        cols = cols + int(w.col_off) - int(union.col_off)
+        offsets.append((rows * int(union.width) + cols).astype(np.int64))
+
+    # one padded (n_sites, max site pixels) index so the pixels of every site are gathered with a single fancy index
+    max_pixels = max([len(o) for o in offsets] + [1])
+    padded_offsets = np.zeros((len(offsets), max_pixels), dtype=np.int64)
+    padded_valid = np.zeros((len(offsets), max_pixels), dtype=bool)
+    for n, o in enumerate(offsets):
+        padded_offsets[n, :len(o)] = o
+        padded_valid[n, :len(o)] = True
+
+    return {'uid': [f[1] for f in site_features],
+            'site': [f[2] for f in site_features],
+            'window': union,
+            'site_windows': windows,
+            'offsets': offsets,
+            'site_offsets': site_offsets,
+            'padded_offsets': padded_offsets,
+            'padded_valid': padded_valid}
+
+
+def site_pixel_index_fn(shape, uid, affine, height, width, all_touched=False):
+    """ Return the site pixel index for a raster grid, rasterising the site polygons only the first time a
+    (shapefile, grid transform, grid shape, all_touched) combination is seen.
+
+    @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+    @param uid: string object containing the unique identifier feature name.
+    @param affine: affine transform of the raster grid.
+    @param height: integer object containing the number of rows in the raster grid.
+    @param width: integer object containing the number of columns in the raster grid.
+    @param all_touched: boolean object, True includes every pixel touched by a polygon.
+    @return pixel_index: dictionary object returned by build_site_pixel_index_fn.
+    """
+
+    key = (shape, uid, tuple(affine)[:6], int(height), int(width), bool(all_touched))
+    if key not in _PIXEL_INDEX_CACHE:
+        site_features = read_site_features_fn(shape, uid)
+        _PIXEL_INDEX_CACHE[key] = build_site_pixel_index_fn(site_features, affine, height, width, all_touched)
+
+    return _PIXEL_INDEX_CACHE[key]
+
+
+def gather_site_values_fn(srci, bands, pixel_index, read_mode):
+    """ Read the requested bands and gather the pixels under each site polygon into one stacked array.
+
+    @param srci: open rasterio dataset.
+    @param bands: list object containing the band numbers (GDAL numbering) to be processed.
+    @param pixel_index: dictionary object returned by site_pixel_index_fn.
+    @param read_mode: string object, 'union' reads one window bounding all sites, 'site' reads one small window per
+    site and 'full' reads the whole scene.
+    @return site_values: numpy array (bands, n_sites, max site pixels), padding is flagged by
+    pixel_index['padded_valid'].
+    """
+
+    n_bands = len(bands)
+    padded_valid = pixel_index['padded_valid']
+
+    if read_mode == 'site':
+        site_values = np.zeros((n_bands,) + padded_valid.shape, dtype=srci.dtypes[0])
+        for n, (w, off) in enumerate(zip(pixel_index['site_windows'], pixel_index['site_offsets'])):
+            site_values[:, n, :len(off)] = srci.read(bands, window=w).reshape(n_bands, -1)[:, off]
+        return site_values
+
+    union = pixel_index['window']
+    if read_mode == 'full':
+        row_slice, col_slice = union.toslices()
+        block = srci.read(bands)[:, row_slice, col_slice]
+    elif read_mode == 'union':
+        block = srci.read(bands, window=union)
+    else:
+        raise ValueError("Unknown read_mode: {0}".format(read_mode))
+
+    flat = block.reshape(n_bands, -1)
+    if flat.shape[1] == 0:
+        return np.zeros((n_bands,) + padded_valid.shape, dtype=block.dtype)
+
+    return flat[:, pixel_index['padded_offsets']]
+
+
+def site_fire_mask_fn(srci, pixel_index, fire_mask):
+    """ Flag the site pixels burnt on or before the cutoff month, the fire scar raster is resampled (nearest neighbour)
+    onto the window bounding the sites only and the resampled window is cached (fire_footprint_cache) for every other
+    image on the tile masked with the same fire scar raster.
+
+    @param srci: open rasterio dataset of the image.
+    @param pixel_index: dictionary object returned by site_pixel_index_fn.
+    @param fire_mask: tuple object containing the fire scar raster path and the cutoff month (1 - 12).
+    @return burnt: boolean numpy array (n_sites, max site pixels), True for the pixels to be masked.
+    """
+
+    fire_path, cutoff_month = fire_mask
+    union = pixel_index['window']
+    if union.height == 0 or union.width == 0:
+        return np.zeros(pixel_index['padded_valid'].shape, dtype=bool)
+
+    grid = fire_footprint_cache.window_grid_fn(srci.transform, union, srci.crs)
+    footprint = fire_footprint_cache.get_grid_footprint_fn(fire_path, grid)
+
+    return fire_month_mask.fire_month_mask_fn(footprint.reshape(-1)[pixel_index['padded_offsets']],
+                                              fire_month_mask.month_lut_fn(cutoff_month))
+
+
+def read_site_pixels_fn(image_s, no_data, bands, shape, uid, all_touched=False, read_mode='union', fire_mask=None):
+    """ Read the pixels under every site polygon of a raster file in a single read of the image.
+
+        @param image_s: string object containing the path to the image.
+        @param no_data: integer object containing the raster no data value.
+        @param bands: list object containing the band numbers (GDAL numbering) to be processed.
+        @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+        @param uid: unique identifier number.
+        @param all_touched: boolean object, True includes every pixel touched by a polygon.
+        @param read_mode: string object passed to gather_site_values_fn.
+        @param fire_mask: tuple object containing the fire scar raster path and cutoff month (or None).
+        @return pixel_index: dictionary object returned by site_pixel_index_fn.
+        @return site_values: numpy array (bands, n_sites, max site pixels).
+        @return invalid: boolean numpy array (bands, n_sites, max site pixels), True for padding and no data pixels.
+        @return burnt: boolean numpy array (n_sites, max site pixels) of the fire masked pixels, None without a
+        fire_mask. """
+
+    burnt = None
+    with rasterio.open(image_s, nodata=no_data) as srci:
+        # the site polygons are only rasterised once per grid, every other image on the tile reuses the index
+        pixel_index = site_pixel_index_fn(shape, uid, srci.transform, srci.height, srci.width, all_touched)
+        site_values = gather_site_values_fn(srci, bands, pixel_index, read_mode)
+        if fire_mask is not None:
+            burnt = site_fire_mask_fn(srci, pixel_index, fire_mask)
+
+    invalid = ~pixel_index['padded_valid'][None, :, :] | (site_values == no_data)
+
+    return pixel_index, site_values, invalid, burnt
+
+
+def site_band_results_fn(pixel_index, bands, zone_stats, first_row=0):
+    """ Split the kernel statistics into one DataFrame per band.
+
+        @param pixel_index: dictionary object returned by site_pixel_index_fn.
+        @param bands: list object containing the band numbers (GDAL numbering) processed.
+        @param zone_stats: dictionary object returned by zonal_stats_kernel_fn, rows ordered by band then site.
+        @param first_row: integer object containing the kernel row of the first site of the first band.
+        @return band_results: dictionary object (band: DataFrame) containing the uid, site and STAT_COLUMNS. """
+
+    n_sites = len(pixel_index['uid'])
+
+    band_results = {}
+    for n, band in enumerate(bands):
+        start = first_row + n * n_sites
+        band_df = pd.DataFrame({'uid': pixel_index['uid'], 'site': pixel_index['site']})
+        for stat in STAT_COLUMNS:
+            band_df[stat] = zone_stats[stat][start:start + n_sites]
+        band_results[band] = band_df
+
+    return band_results
+
+
+def site_name_fn(pixel_index):
+    """ Return the site name of the last site polygon ('' if there are no sites). """
+
+    return str(pixel_index['site'][-1]) if pixel_index['site'] else ''
+
+
+def apply_multi_band_zonal_stats_fn(image_s, no_data, bands, shape, uid, all_touched=False, read_mode='union',
+                                    fire_mask=None):
+    """ Collect the zonal statistical information for every requested band of a raster file in a single read of the
+    image, the statistics of every site and band are calculated in one call to zonal_stats_kernel_fn.
+
+        @param image_s: string object containing an individual path for each image as it loops through the
+        cleaned imagery list.
+        @param no_data: integer object containing the raster no data value.
+        @param bands: list object containing the band numbers (GDAL numbering) to be processed.
+        @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+        @param uid: unique identifier number.
+        @param all_touched: boolean object, True includes every pixel touched by a polygon.
+        @param read_mode: string object, 'union' (default) reads only the window bounding all of the site polygons,
+        'site' reads one window per site and 'full' reads the whole Landsat scene.
+        @param fire_mask: tuple object containing the fire scar raster path and cutoff month, the burnt pixels are
+        excluded in memory (the statistics match those of the fire masked image). None calculates unmasked statistics.
+        @return band_results: dictionary object (band: DataFrame), each DataFrame contains the uid and site columns
+        followed by STAT_COLUMNS with one row per site.
+        @return site_name: string object containing the site name of the last site polygon. """
+
+    pixel_index, site_values, invalid, burnt = read_site_pixels_fn(image_s, no_data, bands, shape, uid, all_touched,
+                                                                   read_mode, fire_mask)
+
+    n_bands, n_sites, n_pixels = site_values.shape
+    if burnt is not None:
+        invalid |= burnt[None, :, :]
+
+    # every band and site is scored in a single kernel call
+    zone_stats = zonal_stats_kernel_fn(
+        np.ma.masked_array(site_values, mask=invalid).reshape(n_bands * n_sites, n_pixels))
+
+    return site_band_results_fn(pixel_index, bands, zone_stats), site_name_fn(pixel_index)
+
+
+def apply_dual_zonal_stats_fn(image_s, no_data, bands, shape, uid, fire_mask, all_touched=False, read_mode='union'):
+    """ Collect the unmasked and the fire masked zonal statistics of a raster file from a single read of the image,
+    both sets of statistics are calculated in one call to zonal_stats_kernel_fn.
+
+        @param image_s: string object containing the path to the image.
+        @param no_data: integer object containing the raster no data value.
+        @param bands: list object containing the band numbers (GDAL numbering) to be processed.
+        @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+        @param uid: unique identifier number.
+        @param fire_mask: tuple object containing the fire scar raster path and cutoff month.
+        @param all_touched: boolean object, True includes every pixel touched by a polygon.
+        @param read_mode: string object passed to gather_site_values_fn.
+        @return band_results: dictionary object (band: DataFrame) of the unmasked statistics.
+        @return mask_band_results: dictionary object (band: DataFrame) of the fire masked statistics.
+        @return site_name: string object containing the site name of the last site polygon. """
+
+    pixel_index, site_values, invalid, burnt = read_site_pixels_fn(image_s, no_data, bands, shape, uid, all_touched,
+                                                                   read_mode, fire_mask)
+
+    n_bands, n_sites, n_pixels = site_values.shape
+    rows = n_bands * n_sites
+
+    # the unmasked rows are followed by the fire masked rows of the same pixels
+    values = np.ma.masked_array(np.concatenate([site_values, site_values]).reshape(2 * rows, n_pixels),
+                                mask=np.concatenate([invalid, invalid | burnt[None, :, :]]).reshape(2 * rows,
+                                                                                                    n_pixels))
+    zone_stats = zonal_stats_kernel_fn(values)
+
+    band_results = site_band_results_fn(pixel_index, bands, zone_stats)
+    mask_band_results = site_band_results_fn(pixel_index, bands, zone_stats, rows)
+
+    return band_results, mask_band_results, site_name_fn(pixel_index)
+
+
+def image_task_zonal_stats_fn(zonal_stats_fn, dual_zonal_stats_fn, image_task):
+    """ Score a single (image path, fire_mask, dual) task with a partial of apply_multi_band_zonal_stats_fn, or of
+    apply_dual_zonal_stats_fn when dual is True.
+
+        @param zonal_stats_fn: partial object of apply_multi_band_zonal_stats_fn.
+        @param dual_zonal_stats_fn: partial object of apply_dual_zonal_stats_fn.
+        @param image_task: tuple object containing the image path, its fire_mask (or None) and dual (boolean).
+        @return: tuple object returned by apply_multi_band_zonal_stats_fn, or by apply_dual_zonal_stats_fn. """
+
+    image_s, fire_mask, dual = image_task
+
+    if dual:
+        return dual_zonal_stats_fn(image_s, fire_mask=fire_mask)
+
+    return zonal_stats_fn(image_s, fire_mask=fire_mask)
+
+
+def masked_results_key_fn(image_s, fire_mask, no_data, bands, shape, uid, all_touched, read_mode):
+    """ Return the key of the fire masked results of an image calculated in dual mode.
+
+        @param image_s: string object containing the path to the image.
+        @param fire_mask: tuple object containing the fire scar raster path and cutoff month.
+        @return key: tuple object containing the normalised image and fire scar paths and the scoring arguments. """
+
+    fire_path, cutoff_month = fire_mask
+
+    return (os.path.normcase(os.path.abspath(image_s)), os.path.normcase(os.path.abspath(fire_path)),
+            int(cutoff_month), float(no_data), tuple(bands), shape, uid, all_touched, read_mode)
+
+
+def map_multi_band_zonal_stats_fn(image_list, no_data, bands, shape, uid, workers=1, all_touched=False,
+                                  read_mode='union', fire_masks=None, dual_fire_masks=None):
+    """ Run apply_multi_band_zonal_stats_fn over a list of images, each image is scored independently in a worker
+    process when workers is greater than 1.
+
+        @param image_list: list object containing the image paths to be processed.
+        @param no_data: integer object containing the raster no data value.
+        @param bands: list object containing the band numbers (GDAL numbering) to be processed.
+        @param shape: string object containing the path to the odk shapefile containing the 1ha site polygons.
+        @param uid: unique identifier number.
+        @param workers: integer object containing the number of worker processes (1 runs serially in this process).
+        @param all_touched: boolean object, True includes every pixel touched by a polygon.
+        @param read_mode: string object passed to apply_multi_band_zonal_stats_fn.
+        @param fire_masks: list object containing the fire_mask (apply_multi_band_zonal_stats_fn) of each image, None
+        calculates unmasked statistics for every image. Results already calculated in dual mode are not recalculated.
+        @param dual_fire_masks: list object containing the fire_mask (or None) of each image, the unmasked statistics
+        are returned and the fire masked statistics are calculated from the same read of the image and kept for a
+        later call with fire_masks (dual mode). Cannot be combined with fire_masks.
+        @return image_band_results: list object containing the (band_results, site_name) of each image, in the same
+        order as image_list so the output csv files are deterministic. """
+
+    if fire_masks is not None and dual_fire_masks is not None:
+        raise ValueError("fire_masks and dual_fire_masks cannot be combined")
+
+    def key_fn(image_s, fire_mask):
+        return masked_results_key_fn(image_s, fire_mask, no_data, bands, shape, uid, all_touched, read_mode)
+
+    image_band_results = [None] * len(image_list)
+    if dual_fire_masks is not None:
+        image_tasks = [(image_s, fire_mask, fire_mask is not None)
+                       for image_s, fire_mask in zip(image_list, dual_fire_masks)]
+    else:
+        if fire_masks is None:
+            fire_masks = [None] * len(image_list)
+        image_tasks = []
+        for n, (image_s, fire_mask) in enumerate(zip(image_list, fire_masks)):
+            if fire_mask is not None:
+                # the fire masked results of the image were calculated with its unmasked results
+                image_band_results[n] = _MASKED_RESULTS_CACHE.pop(key_fn(image_s, fire_mask), None)
+            image_tasks.append((image_s, fire_mask, False))
+
+    pending = [n for n, results in enumerate(image_band_results) if results is None]
+    if len(pending) < len(image_list):
+        print("Fire masked zonal stats calculated in dual mode: {0}, to calculate: {1}".format(
+            len(image_list) - len(pending), len(pending)))
+
+    zonal_stats_fn = partial(apply_multi_band_zonal_stats_fn, no_data=no_data, bands=bands, shape=shape, uid=uid,
+                             all_touched=all_touched, read_mode=read_mode)
+    dual_zonal_stats_fn = partial(apply_dual_zonal_stats_fn, no_data=no_data, bands=bands, shape=shape, uid=uid,
+                                  all_touched=all_touched, read_mode=read_mode)
+    task_fn = partial(image_task_zonal_stats_fn, zonal_stats_fn, dual_zonal_stats_fn)
+    pending_tasks = [image_tasks[n] for n in pending]
+
+    workers = max(1, min(int(workers), len(pending_tasks)))
+    if workers == 1:
+        task_results = [task_fn(image_task) for image_task in pending_tasks]
+    else:
+        # each worker process builds its own site pixel index on its first image and reuses it for the rest of its
+        # chunk
+        chunk_size = max(1, len(pending_tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            task_results = list(executor.map(task_fn, pending_tasks, chunksize=chunk_size))
+
+    for n, (image_s, fire_mask, dual), results in zip(pending, pending_tasks, task_results):
+        if dual:
+            band_results, mask_band_results, site_name = results
+            _MASKED_RESULTS_CACHE[key_fn(image_s, fire_mask)] = (mask_band_results, site_name)
+            results = (band_results, site_name)
+        image_band_results[n] = results
+
+    return image_band_results
+
+
+def decode_image_dates_fn(dates):
+    """ Decode the image date codes, seasonal 'YYYYMMYYYYMM' (with or without the leading 'm') or single date
+    'YYYYMMDD', into start and end dates. Each unique code is decoded once with integer arithmetic and the results are
+    broadcast back to every row.
+
+        @param dates: series object containing the image date code of each row.
+        @return date_df: dataframe object (same index as dates) containing the s_date, e_date (datetime64) and s_year,
+        s_month, s_day, e_year, e_month, e_day (integer) columns. The season end is the last day of the end month, single
+        dates have the same start and end. """
+
+    dates = pd.Series(dates)
+    codes, uniques = pd.factorize(dates.astype(str))
+    values = pd.to_numeric(pd.Index(uniques).str.lstrip('m')).values.astype(np.int64)
+
+    seasonal = values >= 10 ** 10
+    s_year = np.where(seasonal, values // 10 ** 8, values // 10 ** 4)
+    s_month = np.where(seasonal, values // 10 ** 6 % 100, values // 100 % 100)
+    s_day = np.where(seasonal, 1, values % 100)
+    e_year = np.where(seasonal, values // 100 % 10 ** 4, s_year)
+    e_month = np.where(seasonal, values % 100, s_month)
+
+    s_date = pd.to_datetime(pd.DataFrame({'year': s_year, 'month': s_month, 'day': s_day}))
+    e_date = pd.to_datetime(pd.DataFrame({'year': e_year, 'month': e_month, 'day': 1})) + pd.offsets.MonthEnd(0)
+    e_date = e_date.where(seasonal, s_date)
+
+    date_df = pd.DataFrame({'s_date': s_date.values[codes],
+                            's_year': s_year[codes].astype(np.int16),
+                            's_month': s_month[codes].astype(np.int8),
+                            's_day': s_day[codes].astype(np.int8),
+                            'e_date': e_date.values[codes],
+                            'e_year': e_year[codes].astype(np.int16),
+                            'e_month': e_month[codes].astype(np.int8),
+                            'e_day': e_date.dt.day.values[codes].astype(np.int8)},
+                           index=dates.index)
+
+    return date_df
+
+
+def new_band_buffer_fn(bands, spill_dir, spill_rows=SPILL_ROWS):
+    """ Create an in-memory buffer to collect the per image, per band zonal stats results of a tile.
+
+        @param bands: list object containing the band numbers being processed.
+        @param spill_dir: string object containing the path to the temp individual bands directory, buffered results
+        are written to its band sub-directories (i.e. band1) when spill_rows is exceeded.
+        @param spill_rows: integer object containing the number of buffered rows (all bands) to hold before spilling.
+        @return band_buffer: dictionary object containing the buffered band result frames and spill files. """
+
+    band_buffer = {'bands': list(bands),
+                   'spill_dir': spill_dir,
+                   'spill_rows': spill_rows,
+                   'rows': 0,
+                   'frames': dict((band, []) for band in bands),
+                   'spill_files': dict((band, []) for band in bands)}
+
+    return band_buffer
+
+
+def spill_band_buffer_fn(band_buffer):
+    """ Write the buffered band results to one csv per band and release them from memory.
+
+        @param band_buffer: dictionary object created by new_band_buffer_fn. """
+
+    for band in band_buffer['bands']:
+        frames = band_buffer['frames'][band]
+        if frames:
+            spill_path = os.path.join(band_buffer['spill_dir'], 'band{0}'.format(str(band)),
+                                      'spill_{0}.csv'.format(str(len(band_buffer['spill_files'][band]))))
+            print("spill band results to: ", spill_path)
+            pd.concat(frames, ignore_index=True, sort=False).to_csv(spill_path, index=False)
+            band_buffer['spill_files'][band].append(spill_path)
+            band_buffer['frames'][band] = []
+
+    band_buffer['rows'] = 0
+
+
+def append_band_results_fn(band_buffer, band, df):
+    """ Add the zonal stats results of a single image and band to the buffer, spilling to disk above the threshold.
+
+        @param band_buffer: dictionary object created by new_band_buffer_fn.
+        @param band: integer object containing the band number of the results.
+        @param df: dataframe object containing the zonal stats results of the image and band. """
+
+    band_buffer['frames'][band].append(df)
+    band_buffer['rows'] += len(df.index)
+
+    if band_buffer['rows'] >= band_buffer['spill_rows']:
+        spill_band_buffer_fn(band_buffer)
+
+
+def band_results_fn(band_buffer, band):
+    """ Concatenate the spilled and in-memory results of a band into a single dataframe.
+
+        @param band_buffer: dictionary object created by new_band_buffer_fn.
+        @param band: integer object containing the band number to return.
+        @return band_df: dataframe object containing the results of every image for the band. """
+
+    # the date is read back as a string so that spilled and in-memory rows share the same dtype
+    frames = [pd.read_csv(spill_path, dtype={'date': str}) for spill_path in band_buffer['spill_files'][band]]
+    frames.extend(band_buffer['frames'][band])
+
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def pivot_band_results_fn(band_buffer, product):
+    """ Pivot the long (uid, site, image, date, band) results of every band into one wide row per site and image,
+    joining the bands on their key so that missing band results become NaN rather than shifting rows.
+
+        @param band_buffer: dictionary object created by new_band_buffer_fn.
+        @param product: string object containing the product name used in the column names (i.e. 'dp1', 'dp1fm').
+        @return output_zonal_stats: dataframe object containing the uid, site, image and date columns followed by the
+        statistics of each band (i.e. b1_dp1_min ... b1_dp1_p99, b2_dp1_min ...). """
+
+    long_df = pd.concat([band_results_fn(band_buffer, band) for band in band_buffer['bands']], ignore_index=True,
+                        sort=False)
+
+    output_zonal_stats = long_df.set_index(['uid', 'site', 'image', 'date', 'band'])[STAT_COLUMNS].unstack('band')
+
+    # band major column order, bands without any results are kept as NaN columns
+    band_columns = [(stat, band) for band in band_buffer['bands'] for stat in STAT_COLUMNS]
+    output_zonal_stats = output_zonal_stats.reindex(columns=pd.MultiIndex.from_tuples(band_columns))
+    output_zonal_stats.columns = ['b{0}_{1}_{2}'.format(str(band), product, HEADER_STATS.get(stat, stat))
+                                  for stat, band in band_columns]
+
+    return output_zonal_stats.reset_index()